@@ -0,0 +1,61 @@
+# blogs/management/commands/generate_image_derivatives.py
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blogs.models import BlogPost
+from boletines.models import Boletin
+from plataforma_cursos.image_derivatives import job_args, render_derivatives, store_manifest
+
+
+class Command(BaseCommand):
+    help = 'Genera los derivados responsivos (WebP/JPEG) de las imágenes de blog y boletines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Reprocesar todas las imágenes, no solo las que no tienen derivados'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.IMAGE_DERIVATIVES_WORKERS,
+            help='Procesos en paralelo'
+        )
+
+    def pending(self, model, reprocess):
+        objects = model.objects.exclude(imagen_destacada='').exclude(
+            imagen_destacada__isnull=True
+        ).only('id', 'imagen_destacada', 'imagen_derivadas')
+        for obj in objects.iterator(chunk_size=200):
+            if reprocess or obj.imagen_derivadas.get('source') != obj.imagen_destacada.name:
+                yield obj
+
+    def handle(self, *args, **options):
+        processed = 0
+        errors = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            jobs = {}
+            for model in (BlogPost, Boletin):
+                for obj in self.pending(model, options['all']):
+                    future = pool.submit(render_derivatives, *job_args(obj.imagen_destacada))
+                    jobs[future] = (model, obj.pk)
+
+            for future in as_completed(jobs):
+                model, pk = jobs[future]
+                try:
+                    manifest = future.result()
+                except Exception as e:
+                    errors += 1
+                    self.stdout.write(
+                        self.style.WARNING(f'⚠️ {model.__name__} {pk}: no se pudo procesar la imagen ({e})')
+                    )
+                    continue
+                store_manifest(model, pk, 'imagen_destacada', 'imagen_derivadas', manifest)
+                processed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Imágenes procesadas: {processed} (errores: {errors})')
+        )
@@ -89,6 +89,8 @@ class BlogPost(models.Model):
         verbose_name="Imagen destacada",
         validators=[validate_image_size, validate_image_extension]
     )
+    # Manifiesto de derivados responsivos (plataforma_cursos.image_derivatives)
+    imagen_derivadas = models.JSONField(default=dict, blank=True, editable=False)
     categoria = models.CharField(
         max_length=20, 
         choices=CATEGORIA_CHOICES, 
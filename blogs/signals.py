@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from plataforma_cursos.image_derivatives import schedule_derivatives
+from .models import BlogPost
+
+
+@receiver(post_save, sender=BlogPost)
+def generar_derivados_imagen(sender, instance, **kwargs):
+    """Generar versiones responsivas de la imagen destacada al subirla"""
+    schedule_derivatives(instance)
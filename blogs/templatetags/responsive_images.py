@@ -0,0 +1,68 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+def _srcset(variants, base_url=""):
+    return ", ".join(
+        f"{base_url}{default_storage.url(name)} {width}w" for width, name in variants
+    )
+
+
+def _pick(variants, width):
+    """Variante más grande que no supera ``width`` (o la más chica)."""
+    fitting = [variant for variant in variants if variant[0] <= width]
+    return fitting[-1] if fitting else variants[0]
+
+
+@register.simple_tag
+def responsive_image(image, manifest, alt="", sizes="100vw", css_class="", loading="lazy"):
+    """
+    <picture> con fuente WebP y <img> JPEG con srcset. Sin derivados
+    generados todavía, emite un <img> con la imagen original.
+
+    Uso: {% responsive_image post.imagen_destacada post.imagen_derivadas alt=post.titulo sizes="50vw" css_class="w-full" %}
+    """
+    if not image:
+        return ""
+    manifest = manifest or {}
+    if not manifest.get("jpeg") or manifest.get("source") != image.name:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+            image.url, alt, css_class, loading,
+        )
+
+    fallback = manifest["jpeg"][-1]
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" '
+        'class="{}" loading="{}" decoding="async">'
+        '</picture>',
+        _srcset(manifest["webp"]), sizes,
+        default_storage.url(fallback[1]), _srcset(manifest["jpeg"]), sizes,
+        manifest["width"], manifest["height"], alt, css_class, loading,
+    )
+
+
+@register.simple_tag
+def image_srcset(image, manifest, base_url="", width=640):
+    """
+    Atributos ``src`` y ``srcset`` JPEG con URLs absolutas, para correos
+    (muchos clientes de correo no soportan WebP ni <picture>).
+
+    Uso: <img {% image_srcset boletin.imagen_destacada boletin.imagen_derivadas base_url=site_url %} alt="...">
+    """
+    if not image:
+        return ""
+    manifest = manifest or {}
+    if not manifest.get("jpeg") or manifest.get("source") != image.name:
+        return format_html('src="{}{}"', base_url, image.url)
+
+    src = _pick(manifest["jpeg"], int(width))
+    return format_html(
+        'src="{}{}" srcset="{}"',
+        base_url, default_storage.url(src[1]), _srcset(manifest["jpeg"], base_url),
+    )
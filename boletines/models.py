@@ -65,6 +65,8 @@ class Boletin(models.Model):
         null=True,
         help_text="Imagen opcional para el boletín"
     )
+    # Manifiesto de derivados responsivos (plataforma_cursos.image_derivatives)
+    imagen_derivadas = models.JSONField(default=dict, blank=True, editable=False)
     
     # Relaciones opcionales
     blog_relacionado = models.ForeignKey(
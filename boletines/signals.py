@@ -3,6 +3,7 @@ from django.dispatch import receiver
 from django.utils.text import slugify
 from blogs.models import BlogPost
 from cursos.models import Course
+from plataforma_cursos.image_derivatives import schedule_derivatives
 from .models import Boletin
 
 
@@ -99,3 +100,11 @@ def crear_boletin_curso_automatico(sender, instance, created, **kwargs):
             
         except Exception as e:
             print(f"❌ Error al crear boletín de curso automático: {str(e)}")
+
+
+@receiver(post_save, sender=Boletin)
+def generar_derivados_imagen(sender, instance, **kwargs):
+    """
+    Generar versiones responsivas de la imagen destacada al subirla
+    """
+    schedule_derivatives(instance)
@@ -434,7 +434,8 @@ class AdminEnviarView(TemplateView):
             context = {
                 'boletin': boletin,
                 'usuario': self.request.user,
-                'es_prueba': True
+                'es_prueba': True,
+                'site_url': self.request.build_absolute_uri('/').rstrip('/'),
             }
             
             html_content = render_to_string('boletines/email/boletin.html', context)
@@ -515,7 +516,8 @@ class AdminEnviarView(TemplateView):
                 'usuario': usuario,
                 'tracking_url': self.request.build_absolute_uri(
                     reverse('boletines:tracking_abrir', kwargs={'slug': boletin.slug})
-                )
+                ),
+                'site_url': self.request.build_absolute_uri('/').rstrip('/'),
             }
             
             html_content = render_to_string('boletines/email/boletin.html', context)
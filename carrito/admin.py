@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cart, CartItem
+from .models import Cart, CartItem, CartItemSummary
 
 
 @admin.register(Cart)
@@ -23,3 +23,19 @@ class CartItemAdmin(admin.ModelAdmin):
     )
     list_filter = ("item_type", "added_at")
     search_fields = ("cart__user__email", "course__title", "membership_plan__name")
+
+
+@admin.register(CartItemSummary)
+class CartItemSummaryAdmin(admin.ModelAdmin):
+    list_display = (
+        "month",
+        "item_type",
+        "course",
+        "membership_plan",
+        "sold_count",
+        "revenue",
+        "abandoned_count",
+    )
+    list_filter = ("item_type", "month")
+    search_fields = ("course__title", "membership_plan__name")
+    readonly_fields = list_display + ("updated_at",)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class CarritoConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "carrito"
+    verbose_name = "Carrito"
+
+    def ready(self):
+        import carrito.signals  # noqa
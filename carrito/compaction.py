@@ -0,0 +1,144 @@
+# carrito/compaction.py
+"""
+Compactación de carritos.
+
+Cada compra cierra el carrito (``is_active=False``) y la siguiente visita abre
+otro, así que ``Cart`` y ``CartItem`` acumulaban filas muertas para siempre.
+``compact_carts`` recorre por lotes:
+
+- los carritos cerrados hace más de ``CART_ARCHIVE_AFTER_DAYS`` días, y
+- los carritos activos sin cambios hace más de ``CART_ABANDONED_AFTER_DAYS``
+  días (abandonados),
+
+suma sus ítems a ``CartItemSummary`` (vendidos, ingresos y abandonos por mes
+y producto) y los borra. El resumen y el borrado van en la misma transacción,
+por lo que los ingresos del panel (``cursos.admin_listing``), que suman
+carritos cerrados más el resumen, nunca cuentan un ítem dos veces ni lo
+pierden.
+
+Los ingresos son netos: ``net_price`` descuenta de cada ítem la parte del
+cupón del carrito (``Cart.discount_amount``) proporcional a su precio.
+
+Varias ejecuciones pueden correr a la vez: los carritos se reparten con
+``SKIP LOCKED`` y el resumen se suma sobre filas bloqueadas, creadas antes
+con ``ON CONFLICT DO NOTHING`` si faltaban.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateField, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, TruncMonth
+from django.utils import timezone
+
+from .models import Cart, CartItem, CartItemSummary
+
+CHUNK_SIZE = 1000
+
+
+def net_price():
+    """
+    Expresión sobre ``CartItem``: ``price_applied`` menos la parte del
+    descuento del carrito que le corresponde según su peso en el subtotal.
+    """
+    money = DecimalField(max_digits=14, decimal_places=2)
+    subtotal = (
+        CartItem.objects.filter(cart_id=OuterRef("cart_id"))
+        .order_by()
+        .values("cart_id")
+        .annotate(total=Sum("price_applied"))
+        .values("total")
+    )
+    share = F("cart__discount_amount") * F("price_applied") / NullIf(
+        Subquery(subtotal, output_field=money), Value(0), output_field=money
+    )
+    return F("price_applied") - Coalesce(share, Value(0), output_field=money)
+
+
+def _merge_summary(rows, abandoned):
+    """Suma las filas agregadas ``(mes, tipo, curso, plan)`` a ``CartItemSummary``."""
+    incoming = {
+        (row["month"], row["item_type"], row["course_id"], row["membership_plan_id"]): row
+        for row in rows
+    }
+    if not incoming:
+        return
+    # Crear primero las filas que falten, vacías: ON CONFLICT DO NOTHING no
+    # falla si otro proceso crea la misma (mes, producto) al mismo tiempo
+    CartItemSummary.objects.bulk_create(
+        [
+            CartItemSummary(month=key[0], item_type=key[1], course_id=key[2], membership_plan_id=key[3])
+            for key in incoming
+        ],
+        ignore_conflicts=True,
+    )
+
+    # Ya existen todas: bloquearlas (en orden de id, sin interbloqueos) y sumar
+    months = {key[0] for key in incoming}
+    course_ids = {key[2] for key in incoming if key[2]}
+    plan_ids = {key[3] for key in incoming if key[3]}
+    summaries = [
+        summary
+        for summary in CartItemSummary.objects.select_for_update()
+        .filter(Q(course_id__in=course_ids) | Q(membership_plan_id__in=plan_ids), month__in=months)
+        .order_by("id")
+        if (summary.month, summary.item_type, summary.course_id, summary.membership_plan_id) in incoming
+    ]
+
+    now = timezone.now()
+    for summary in summaries:
+        row = incoming[(summary.month, summary.item_type, summary.course_id, summary.membership_plan_id)]
+        if abandoned:
+            summary.abandoned_count += row["quantity"]
+        else:
+            summary.sold_count += row["quantity"]
+            summary.revenue += row["revenue"] or 0
+        summary.updated_at = now
+    CartItemSummary.objects.bulk_update(
+        summaries, ["sold_count", "revenue", "abandoned_count", "updated_at"]
+    )
+
+
+def _compact_chunk(abandoned, cutoff, chunk_size):
+    with transaction.atomic():
+        cart_ids = list(
+            Cart.objects.filter(is_active=abandoned, updated_at__lt=cutoff)
+            .order_by("updated_at")
+            .select_for_update(skip_locked=True)
+            .values_list("id", flat=True)[:chunk_size]
+        )
+        if not cart_ids:
+            return 0
+
+        rows = (
+            CartItem.objects.filter(cart_id__in=cart_ids)
+            .annotate(month=TruncMonth("cart__updated_at", output_field=DateField()))
+            .values("month", "item_type", "course_id", "membership_plan_id")
+            .annotate(quantity=Count("id"), revenue=Sum(net_price()))
+            .order_by()
+        )
+        _merge_summary(rows, abandoned)
+        # Sin señales en CartItem, el borrado en cascada es un DELETE por tabla
+        Cart.objects.filter(id__in=cart_ids).delete()
+    return len(cart_ids)
+
+
+def compact_carts(now=None, chunk_size=CHUNK_SIZE):
+    """
+    Resume y borra los carritos cerrados y abandonados. Retorna un dict con
+    la cantidad de carritos ``closed`` y ``abandoned`` compactados.
+    """
+    now = now or timezone.now()
+    cutoffs = {
+        "closed": (False, now - timedelta(days=settings.CART_ARCHIVE_AFTER_DAYS)),
+        "abandoned": (True, now - timedelta(days=settings.CART_ABANDONED_AFTER_DAYS)),
+    }
+    totals = {}
+    for name, (abandoned, cutoff) in cutoffs.items():
+        totals[name] = 0
+        while True:
+            compacted = _compact_chunk(abandoned, cutoff, chunk_size)
+            totals[name] += compacted
+            if compacted < chunk_size:
+                break
+    return totals
@@ -0,0 +1,23 @@
+# carrito/management/commands/compact_carts.py
+from django.core.management.base import BaseCommand
+from carrito.compaction import CHUNK_SIZE, compact_carts
+
+
+class Command(BaseCommand):
+    help = 'Resume en CartItemSummary y borra los carritos cerrados y abandonados antiguos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Carritos compactados por transacción'
+        )
+
+    def handle(self, *args, **options):
+        totals = compact_carts(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Carritos compactados: {totals['closed']} cerrados, {totals['abandoned']} abandonados"
+            )
+        )
@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models import F, Q
 from django.conf import settings
+from django.utils import timezone
 from cursos.models import Course
 from membresias.models import MembershipPlan
 
@@ -18,26 +20,51 @@ class Cart(models.Model):
         blank=True,
         verbose_name="ID del código de descuento aplicado"
     )
+    applied_campaign_id = models.IntegerField(
+        null=True,
+        blank=True,
+        verbose_name="ID de la campaña de descuento aplicada"
+    )
     discount_amount = models.DecimalField(
         max_digits=10, 
         decimal_places=2, 
         default=0,
         verbose_name="Monto de descuento aplicado"
     )
+    # Se incrementa con cada cambio de ítems o descuentos (clave del resumen cacheado)
+    version = models.PositiveIntegerField(default=0, verbose_name="Versión")
+
+    class Meta:
+        constraints = [
+            # Como máximo un carrito activo por usuario
+            models.UniqueConstraint(
+                fields=["user"], condition=Q(is_active=True), name="unique_active_cart_per_user"
+            ),
+        ]
+        indexes = [
+            # Compactación de carritos cerrados y abandonados (carrito.compaction)
+            models.Index(fields=["is_active", "updated_at"]),
+        ]
 
     def __str__(self):
         return f"Carrito de {self.user.email} ({'Activo' if self.is_active else 'Cerrado'})"
     
     def get_applied_discount_code(self):
-        """Obtiene el código de descuento aplicado"""
+        """Obtiene el código o la campaña de descuento aplicada"""
+        from cursos.models import DiscountCampaign, DiscountCode
         if self.applied_discount_code_id:
-            try:
-                from cursos.models import DiscountCode
-                return DiscountCode.objects.get(id=self.applied_discount_code_id)
-            except DiscountCode.DoesNotExist:
-                return None
+            return DiscountCode.objects.filter(id=self.applied_discount_code_id).first()
+        if self.applied_campaign_id:
+            return DiscountCampaign.objects.filter(id=self.applied_campaign_id).first()
         return None
     
+    def bump_version(self):
+        """Invalida el resumen cacheado del carrito (carrito.summary)."""
+        now = timezone.now()
+        Cart.objects.filter(pk=self.pk).update(version=F("version") + 1, updated_at=now)
+        self.version += 1
+        self.updated_at = now
+
     def get_subtotal(self):
         """Calcula el subtotal sin descuentos"""
         return sum(item.price_applied for item in self.items.all())
@@ -48,42 +75,42 @@ class Cart(models.Model):
         return max(subtotal - self.discount_amount, 0)
     
     def apply_discount_code(self, code):
-        """Aplica un código de descuento al carrito"""
+        """Aplica un código de descuento o de campaña al carrito (ver cursos.discounts)"""
+        from cursos.discounts import DiscountError, find_discount
+        from cursos.models import DiscountCampaign
+
         try:
-            from cursos.models import DiscountCode
-            discount_code = DiscountCode.objects.get(code__iexact=code)
-            
-            # Verificar que el código es válido para al menos un curso en el carrito
-            course_items = self.items.filter(item_type='course')
-            valid_courses = []
-            
-            for item in course_items:
-                if item.course == discount_code.course:
-                    valid_courses.append(item)
-            
-            if not valid_courses:
-                return False, "Este código de descuento no es válido para ningún curso en tu carrito."
-            
-            # Calcular el descuento
-            discount_amount = 0
-            for item in valid_courses:
-                item_discount = (item.price_applied * discount_code.discount_percentage) / 100
-                discount_amount += item_discount
-            
-            self.applied_discount_code_id = discount_code.id
-            self.discount_amount = discount_amount
-            self.save()
-            
-            return True, f"Código aplicado. Descuento de ${discount_amount:,.0f} CLP"
-            
-        except Exception as e:
-            return False, "El código de descuento no existe."
+            discount = find_discount(code, self.user)
+        except DiscountError as e:
+            return False, e.message
+
+        # Verificar que el código es válido para al menos un ítem del carrito
+        valid_items = [item for item in self.items.all() if discount.applies_to(item)]
+        if not valid_items:
+            return False, "Este código de descuento no es válido para ningún ítem en tu carrito."
+
+        # Calcular el descuento
+        discount_amount = 0
+        for item in valid_items:
+            item_discount = (item.price_applied * discount.discount_percentage) / 100
+            discount_amount += item_discount
+
+        is_campaign = isinstance(discount, DiscountCampaign)
+        self.applied_discount_code_id = None if is_campaign else discount.id
+        self.applied_campaign_id = discount.id if is_campaign else None
+        self.discount_amount = discount_amount
+        self.save()
+        self.bump_version()
+
+        return True, f"Código aplicado. Descuento de ${discount_amount:,.0f} CLP"
     
     def remove_discount(self):
         """Remueve el descuento aplicado"""
         self.applied_discount_code_id = None
+        self.applied_campaign_id = None
         self.discount_amount = 0
         self.save()
+        self.bump_version()
 
 
 class CartItem(models.Model):
@@ -108,5 +135,55 @@ class CartItem(models.Model):
             return f"Membresía: {self.membership_plan.name}"
         return "Item desconocido"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.cart.bump_version()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.cart.bump_version()
+        return result
+
     class Meta:
         unique_together = [("cart", "course", "membership_plan", "item_type")]
+
+
+class CartItemSummary(models.Model):
+    """
+    Ventas y abandonos por mes y producto de los carritos ya compactados
+    (``manage.py compact_carts``).
+    """
+
+    month = models.DateField(verbose_name="Mes")
+    item_type = models.CharField(max_length=20, choices=CartItem.CART_ITEM_TYPE)
+    course = models.ForeignKey(Course, null=True, blank=True, on_delete=models.CASCADE)
+    membership_plan = models.ForeignKey(
+        MembershipPlan, null=True, blank=True, on_delete=models.CASCADE
+    )
+    sold_count = models.PositiveIntegerField(default=0, verbose_name="Vendidos")
+    revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name="Ingresos"
+    )
+    abandoned_count = models.PositiveIntegerField(default=0, verbose_name="Abandonados")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumen de carritos"
+        verbose_name_plural = "Resúmenes de carritos"
+        ordering = ["-month"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["month", "course"],
+                condition=Q(item_type="course"),
+                name="unique_cart_summary_course_month",
+            ),
+            models.UniqueConstraint(
+                fields=["month", "membership_plan"],
+                condition=Q(item_type="membership"),
+                name="unique_cart_summary_plan_month",
+            ),
+        ]
+
+    def __str__(self):
+        product = self.course or self.membership_plan
+        return f"{product} - {self.month:%Y-%m}"
@@ -0,0 +1,132 @@
+# carrito/session_cart.py
+"""
+Carrito anónimo guardado en la sesión.
+
+Antes el carrito exigía iniciar sesión y ``get_or_create_cart`` creaba una fila
+``Cart`` apenas se abría la página. Ahora los visitantes anónimos guardan su
+carrito en la sesión (solo IDs de cursos y del plan) y recorrerlo no escribe
+en la base de datos. Al iniciar sesión (``carrito.signals``) se materializa en
+``Cart``/``CartItem`` con un solo ``bulk_create``, combinándose con el carrito
+activo que el usuario ya tuviera.
+"""
+from django.db import transaction
+
+from cursos.models import Course, UserCourse
+from cursos.pricing import get_prices
+from membresias.models import MembershipPlan
+from .models import Cart, CartItem
+from .summary import CartSummary
+
+SESSION_KEY = "cart"
+
+
+class SessionCart:
+    """IDs de cursos y plan de membresía guardados en ``request.session``."""
+
+    def __init__(self, session):
+        self.session = session
+        data = session.get(SESSION_KEY) or {}
+        self.course_ids = list(data.get("courses", []))
+        self.membership_plan_id = data.get("membership_plan")
+
+    def __len__(self):
+        return len(self.course_ids) + (1 if self.membership_plan_id else 0)
+
+    def _save(self):
+        if len(self):
+            self.session[SESSION_KEY] = {
+                "courses": self.course_ids,
+                "membership_plan": self.membership_plan_id,
+            }
+        else:
+            self.session.pop(SESSION_KEY, None)
+
+    def add_course(self, course_id):
+        """Retorna False si el curso ya estaba en el carrito."""
+        if course_id in self.course_ids:
+            return False
+        self.course_ids.append(course_id)
+        self._save()
+        return True
+
+    def add_membership(self, plan_id):
+        """Solo se permite una membresía; retorna False si ya hay una."""
+        if self.membership_plan_id:
+            return False
+        self.membership_plan_id = plan_id
+        self._save()
+        return True
+
+    def remove(self, item_type, object_id):
+        if item_type == "course" and object_id in self.course_ids:
+            self.course_ids.remove(object_id)
+        elif item_type == "membership" and object_id == self.membership_plan_id:
+            self.membership_plan_id = None
+        self._save()
+
+    def clear(self):
+        self.course_ids = []
+        self.membership_plan_id = None
+        self._save()
+
+    def _items(self, plan=None):
+        """``CartItem`` sin guardar con el precio vigente para ``plan``, y los precios usados."""
+        courses = Course.objects.in_bulk(self.course_ids)
+        courses = [courses[course_id] for course_id in self.course_ids if course_id in courses]
+        prices = get_prices(courses, plan) if courses else {}
+
+        items = [
+            CartItem(item_type="course", course=course, price_applied=prices[course.id][1])
+            for course in courses
+        ]
+        if self.membership_plan_id:
+            membership_plan = MembershipPlan.objects.filter(id=self.membership_plan_id).first()
+            if membership_plan:
+                items.append(
+                    CartItem(
+                        item_type="membership",
+                        membership_plan=membership_plan,
+                        price_applied=membership_plan.price,
+                    )
+                )
+        return items, prices
+
+    def summary(self):
+        items, prices = self._items()
+        return CartSummary(items, prices=prices)
+
+    def materialize(self, user, plan=None):
+        """
+        Pasa los ítems al carrito activo de ``user`` (creándolo si hace falta)
+        y vacía la sesión. Omite los cursos que el usuario ya posee o ya tenía
+        en el carrito y la membresía si el carrito ya tenía una.
+        """
+        if not len(self):
+            return None
+        items, _prices = self._items(plan)
+        owned = set(
+            UserCourse.objects.filter(user=user, course_id__in=self.course_ids).values_list(
+                "course_id", flat=True
+            )
+        )
+
+        with transaction.atomic():
+            cart, _created = Cart.objects.get_or_create(user=user, is_active=True)
+            existing = set(cart.items.values_list("item_type", "course_id"))
+            has_membership = any(item_type == "membership" for item_type, _id in existing)
+
+            new_items = []
+            for item in items:
+                if item.item_type == "course":
+                    if item.course_id in owned or ("course", item.course_id) in existing:
+                        continue
+                elif has_membership:
+                    continue
+                item.cart = cart
+                new_items.append(item)
+            if new_items:
+                CartItem.objects.bulk_create(new_items, ignore_conflicts=True)
+                cart.bump_version()
+
+        self.clear()
+        return cart
@@ -0,0 +1,20 @@
+# carrito/signals.py
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from plataforma_cursos.middleware.user_context import UserContext
+from .session_cart import SessionCart
+
+
+@receiver(user_logged_in)
+def merge_session_cart(sender, request, user, **kwargs):
+    """Materializa el carrito anónimo de la sesión en el carrito del usuario."""
+    session = getattr(request, "session", None)
+    if session is None:
+        return
+    session_cart = SessionCart(session)
+    if len(session_cart):
+        # El contexto del request se creó para el usuario anónimo
+        request.user_context = UserContext(user, session)
+        session_cart.materialize(user, request.user_context.active_plan)
+        request.user_context.invalidate()
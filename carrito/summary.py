@@ -0,0 +1,120 @@
+# carrito/summary.py
+"""
+Resumen del carrito calculado en una sola pasada.
+
+``cart_detail`` recorría ``cart.items.all()`` una vez y ``get_subtotal()`` /
+``get_total()`` lo recorrían de nuevo, cargando ``item.course`` o
+``item.membership_plan`` uno por uno. ``CartSummary`` lee los ítems con
+``select_related``, los precios del libro de precios en bloque y el cupón
+aplicado, y calcula subtotal, descuentos especiales, descuento del cupón,
+total y cantidad de ítems.
+
+El resumen se cachea con la versión del carrito (``Cart.version``, que sube al
+cambiar ítems o descuentos), la versión del catálogo y el plan del usuario en
+la clave; cualquier cambio produce una clave nueva. La página del carrito, el
+inicio del pago y el contador del encabezado leen el mismo resumen.
+
+El carrito anónimo de la sesión (``carrito.session_cart``) usa la misma clase
+con ítems sin guardar.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from cursos.catalog import get_catalog_version
+from cursos.models import DiscountCampaign, DiscountCode
+from cursos.pricing import get_prices
+
+SUMMARY_KEY = "carrito:summary:{cart_id}:{version}:{catalog_version}:{plan_id}"
+
+
+class CartSummary:
+    """Totales e ítems de un carrito."""
+
+    def __init__(
+        self,
+        items,
+        plan=None,
+        discount_amount=0,
+        applied_discount_code_id=None,
+        prices=None,
+        applied_campaign_id=None,
+    ):
+        self.items = list(items)
+        self.item_count = len(self.items)
+        self.subtotal = sum(item.price_applied for item in self.items)
+        self.coupon_discount = discount_amount or 0
+        self.total = max(self.subtotal - self.coupon_discount, 0)
+
+        self.applied_discount_code = None
+        if applied_discount_code_id:
+            self.applied_discount_code = DiscountCode.objects.filter(
+                id=applied_discount_code_id
+            ).first()
+        elif applied_campaign_id:
+            self.applied_discount_code = DiscountCampaign.objects.filter(
+                id=applied_campaign_id
+            ).first()
+
+        courses = [item.course for item in self.items if item.item_type == "course"]
+        if prices is None:
+            # Precios de todos los cursos del carrito en una sola consulta
+            prices = get_prices(courses, plan) if courses else {}
+
+        self.special_discounts = []
+        self.original_price_total = 0
+        for item in self.items:
+            if item.item_type == "course":
+                original_price = item.course.base_price
+                percentage, final_price = prices[item.course.id]
+                if final_price < original_price:
+                    self.special_discounts.append({
+                        "course": item.course,
+                        "percentage": percentage,
+                        "amount": original_price - final_price,
+                        "description": f"({percentage}%)",
+                    })
+            elif item.item_type == "membership":
+                original_price = item.membership_plan.price
+            else:
+                continue
+            self.original_price_total += original_price
+
+        self.total_special_discount = sum(discount["amount"] for discount in self.special_discounts)
+        self.total_all_discounts = self.total_special_discount + self.coupon_discount
+
+    @classmethod
+    def for_cart(cls, cart, plan=None):
+        items = cart.items.select_related("course", "membership_plan").order_by("added_at")
+        return cls(
+            items,
+            plan,
+            discount_amount=cart.discount_amount,
+            applied_discount_code_id=cart.applied_discount_code_id,
+            applied_campaign_id=cart.applied_campaign_id,
+        )
+
+    @property
+    def description(self):
+        """Descripción del pago con los ítems del carrito."""
+        items_desc = []
+        for item in self.items:
+            if item.item_type == "course" and item.course:
+                items_desc.append(f"Curso: {item.course.title}")
+            elif item.item_type == "membership" and item.membership_plan:
+                items_desc.append(f"Membresía: {item.membership_plan.name}")
+        return "Compra de " + ", ".join(items_desc)
+
+
+def get_cart_summary(cart, plan=None):
+    """``CartSummary`` de ``cart`` para el plan dado, desde la caché si está vigente."""
+    key = SUMMARY_KEY.format(
+        cart_id=cart.id,
+        version=cart.version,
+        catalog_version=get_catalog_version(),
+        plan_id=plan.id if plan else 0,
+    )
+    summary = cache.get(key)
+    if summary is None:
+        summary = CartSummary.for_cart(cart, plan)
+        cache.set(key, summary, settings.CATALOG_CACHE_TIMEOUT)
+    return summary
@@ -20,6 +20,11 @@ urlpatterns = [
         views.remove_item_from_cart,
         name="remove_item_from_cart",
     ),
+    path(
+        "eliminar/<str:item_type>/<int:object_id>/",
+        views.remove_session_item,
+        name="remove_session_item",
+    ),
     path("vaciar/", views.clear_cart, name="clear_cart"),
     path("aplicar-descuento/", views.apply_discount_code, name="apply_discount_code"),
     path("remover-descuento/", views.remove_discount_code, name="remove_discount_code"),
@@ -3,8 +3,11 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from cursos.models import Course
+from plataforma_cursos.middleware.user_context import get_user_context
+from cursos.pricing import get_price
 from membresias.models import MembershipPlan
 from .models import Cart, CartItem
+from .summary import CartSummary
 
 
 def get_or_create_cart(user):
@@ -12,49 +15,30 @@ def get_or_create_cart(user):
     return cart
 
 
-@login_required
+def get_user_plan(request):
+    """Plan de la membresía activa del usuario (o None) para el libro de precios."""
+    return get_user_context(request).active_plan
+
+
 def cart_detail(request):
-    cart = get_or_create_cart(request.user)
-    applied_discount_code = cart.get_applied_discount_code()
-    
-    # Calcular precios originales y descuentos
-    special_discounts = []
-    original_price_total = 0
-    
-    for item in cart.items.all():
-        if item.item_type == 'course':
-            # Usar el precio base original
-            original_price = item.course.base_price
-            original_price_total += original_price
-            
-            if hasattr(item.course, 'special_discount_percentage') and item.course.special_discount_percentage > 0:
-                discount_value = (original_price * item.course.special_discount_percentage) / 100
-                special_discounts.append({
-                    'course': item.course,
-                    'percentage': item.course.special_discount_percentage,
-                    'amount': discount_value,
-                    'description': f'({item.course.special_discount_percentage}%)'
-                })
-        elif item.item_type == 'membership':
-            original_price = item.membership_plan.price
-            original_price_total += original_price    # Calcular el total de descuentos especiales
-    total_special_discount = sum(discount['amount'] for discount in special_discounts)
-    
-    # Calcular el total de todos los descuentos (especiales + cupón)
-    total_all_discounts = total_special_discount
-    if cart.discount_amount:
-        total_all_discounts += cart.discount_amount
-    
+    user_context = get_user_context(request)
+    # Ítems, precios y descuentos en una sola pasada (cacheada por versión del
+    # carrito). Ver el carrito no crea filas: sin carrito el resumen está vacío.
+    summary = user_context.cart_summary or CartSummary([])
+
     context = {
-        "cart": cart,
-        "subtotal": cart.get_subtotal(),
-        "total": cart.get_total(),
-        "discount_amount": cart.discount_amount,
-        "applied_discount_code": applied_discount_code,
-        "special_discounts": special_discounts,
-        "total_special_discount": total_special_discount,
-        "total_all_discounts": total_all_discounts,
-        "original_price_total": original_price_total,
+        "cart": user_context.cart,
+        "summary": summary,
+        "items": summary.items,
+        "item_count": summary.item_count,
+        "subtotal": summary.subtotal,
+        "total": summary.total,
+        "discount_amount": summary.coupon_discount,
+        "applied_discount_code": summary.applied_discount_code,
+        "special_discounts": summary.special_discounts,
+        "total_special_discount": summary.total_special_discount,
+        "total_all_discounts": summary.total_all_discounts,
+        "original_price_total": summary.original_price_total,
     }
     return render(request, "carrito/cart_detail.html", context)
 
@@ -69,7 +53,7 @@ def apply_discount_code(request):
         if not code:
             messages.error(request, "Por favor, ingresa un código de descuento.")
             return redirect("carrito:cart_detail")        # Remover descuento anterior si existe
-        if cart.applied_discount_code_id:
+        if cart.applied_discount_code_id or cart.applied_campaign_id:
             cart.remove_discount()
 
         # Aplicar nuevo descuento
@@ -87,23 +71,25 @@ def apply_discount_code(request):
 def remove_discount_code(request):
     """Vista para remover códigos de descuento"""
     cart = get_or_create_cart(request.user)
-    if cart.applied_discount_code_id:
+    if cart.applied_discount_code_id or cart.applied_campaign_id:
         cart.remove_discount()
         messages.success(request, "Código de descuento removido.")
 
     return redirect("carrito:cart_detail")
 
 
-@login_required
 def add_course_to_cart(request, course_id):
-    cart = get_or_create_cart(request.user)
     course = get_object_or_404(Course, pk=course_id)
-    item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        item_type="course",
-        course=course,
-        defaults={"price_applied": course.get_final_price()},
-    )
+    if not request.user.is_authenticated:
+        created = get_user_context(request).session_cart.add_course(course.id)
+    else:
+        cart = get_or_create_cart(request.user)
+        item, created = CartItem.objects.get_or_create(
+            cart=cart,
+            item_type="course",
+            course=course,
+            defaults={"price_applied": get_price(course, get_user_plan(request))[1]},
+        )
     if not created:
         messages.info(request, "El curso ya está en tu carrito.")
     else:
@@ -111,10 +97,19 @@ def add_course_to_cart(request, course_id):
     return redirect("carrito:cart_detail")
 
 
-@login_required
 def add_membership_to_cart(request, plan_id):
-    cart = get_or_create_cart(request.user)
     plan = get_object_or_404(MembershipPlan, pk=plan_id)
+    if not request.user.is_authenticated:
+        if get_user_context(request).session_cart.add_membership(plan.id):
+            messages.success(request, "Membresía agregada al carrito.")
+        else:
+            messages.warning(
+                request,
+                "Ya tienes una membresía en tu carrito. Elimina esa membresía para agregar otra.",
+            )
+        return redirect("carrito:cart_detail")
+
+    cart = get_or_create_cart(request.user)
     # Solo permitir una membresía por carrito
     existing_item = cart.items.filter(item_type="membership").first()
     if existing_item:
@@ -142,9 +137,20 @@ def remove_item_from_cart(request, item_id):
     return redirect("carrito:cart_detail")
 
 
-@login_required
+def remove_session_item(request, item_type, object_id):
+    """Quita un ítem del carrito anónimo de la sesión."""
+    get_user_context(request).session_cart.remove(item_type, object_id)
+    messages.success(request, "Ítem eliminado del carrito.")
+    return redirect("carrito:cart_detail")
+
+
 def clear_cart(request):
-    cart = get_or_create_cart(request.user)
-    cart.items.all().delete()
+    if not request.user.is_authenticated:
+        get_user_context(request).session_cart.clear()
+    else:
+        cart = get_user_context(request).cart
+        if cart:
+            cart.items.all().delete()
+            cart.bump_version()
     messages.success(request, "Carrito vaciado.")
     return redirect("carrito:cart_detail")
@@ -1,6 +1,6 @@
 #cursos/admin.py
 from django.contrib import admin
-from .models import Category, Course, Tag, CourseResource, UserCourse, DiscountCode
+from .models import Category, Course, Tag, CourseResource, UserCourse, DiscountCode, CoursePrice, CourseReview, PlanCourseAccess, DiscountCampaign, DiscountRedemption
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -14,6 +14,7 @@ class CourseAdmin(admin.ModelAdmin):
     list_filter = ('is_free', 'is_available', 'is_visible', 'category', 'created_by')
     search_fields = ('title', 'description')
     filter_horizontal = ('tags',)
+    readonly_fields = ('rating',)
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -36,4 +37,40 @@ class UserCourseAdmin(admin.ModelAdmin):
 class DiscountCodeAdmin(admin.ModelAdmin):
     list_display = ('course', 'code', 'discount_percentage', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('course__title', 'code')
\ No newline at end of file
+    search_fields = ('course__title', 'code')
+
+
+@admin.register(CoursePrice)
+class CoursePriceAdmin(admin.ModelAdmin):
+    list_display = ('course', 'membership_plan', 'discount_code', 'discount_percentage', 'final_price', 'updated_at')
+    list_filter = ('membership_plan',)
+    search_fields = ('course__title', 'discount_code__code')
+    readonly_fields = ('course', 'membership_plan', 'discount_code', 'discount_percentage', 'final_price', 'updated_at')
+
+@admin.register(CourseReview)
+class CourseReviewAdmin(admin.ModelAdmin):
+    list_display = ('course', 'user', 'score', 'created_at')
+    list_filter = ('score', 'created_at')
+    search_fields = ('course__title', 'user__email', 'comment')
+
+@admin.register(PlanCourseAccess)
+class PlanCourseAccessAdmin(admin.ModelAdmin):
+    list_display = ('plan', 'course', 'access_kind')
+    list_filter = ('plan', 'access_kind')
+    search_fields = ('course__title',)
+    readonly_fields = ('plan', 'course', 'access_kind')
+
+@admin.register(DiscountCampaign)
+class DiscountCampaignAdmin(admin.ModelAdmin):
+    list_display = ('name', 'code', 'discount_percentage', 'starts_at', 'ends_at', 'redemption_count', 'max_redemptions', 'is_active')
+    list_filter = ('is_active', 'starts_at')
+    search_fields = ('name', 'code')
+    filter_horizontal = ('courses', 'membership_plans')
+    readonly_fields = ('redemption_count', 'created_at')
+
+@admin.register(DiscountRedemption)
+class DiscountRedemptionAdmin(admin.ModelAdmin):
+    list_display = ('campaign', 'user', 'payment', 'discount_amount', 'created_at', 'released_at')
+    list_filter = ('campaign',)
+    search_fields = ('campaign__code', 'user__email')
+    readonly_fields = ('campaign', 'user', 'payment', 'discount_amount', 'created_at', 'released_at')
@@ -0,0 +1,249 @@
+# cursos/admin_listing.py
+"""
+Listado de cursos del panel de administración.
+
+Cada fila se anota en la misma consulta con inscripciones, tasa de
+finalización, cantidad de recursos e ingresos. Las anotaciones son
+subconsultas correlacionadas (no ``GROUP BY`` sobre joins), así que se pueden
+combinar sin multiplicar filas y usar tanto en ``WHERE`` como en
+``ORDER BY``. La paginación es keyset sobre ``(valor de orden, id)`` con un
+cursor opaco: pedir la página 200 cuesta lo mismo que la primera.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    DecimalField,
+    FloatField,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from carrito.compaction import net_price
+from carrito.models import CartItem, CartItemSummary
+from .models import Course, CourseResource, UserCourse
+
+PAGE_SIZE = 25
+
+# clave -> (campo u anotación, descendente, conversión del valor del cursor)
+SORTS = {
+    "created": ("created_at", True, datetime.fromisoformat),
+    "title": ("title", False, str),
+    "enrollments": ("enrollment_count", True, int),
+    "completion": ("completion_rate", True, float),
+    "resources": ("resource_count", True, int),
+    "revenue": ("revenue", True, Decimal),
+}
+DEFAULT_SORT = "created"
+
+STATUS_FILTERS = {
+    "available": Q(is_available=True),
+    "unavailable": Q(is_available=False),
+    "free": Q(is_free=True),
+    "paid": Q(is_free=False),
+}
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _count_subquery(queryset):
+    """COUNT(*) correlacionado con el curso de la consulta externa."""
+    counts = (
+        queryset.filter(course=OuterRef("pk"))
+        .order_by()
+        .values("course")
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def annotate_course_stats(queryset):
+    """Agrega enrollment_count, completion_rate, resource_count y revenue."""
+    # Porcentaje de inscripciones completadas, en la misma pasada que el conteo
+    completion = (
+        UserCourse.objects.filter(course=OuterRef("pk"))
+        .order_by()
+        .values("course")
+        .annotate(
+            rate=Avg(
+                Case(
+                    When(completed=True, then=Value(100.0)),
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                )
+            )
+        )
+        .values("rate")
+    )
+    # Ingresos: cursos vendidos en carritos ya pagados (cerrados), netos del
+    # cupón del carrito, más los de carritos ya compactados (carrito.compaction)
+    revenue = (
+        CartItem.objects.filter(
+            course=OuterRef("pk"), item_type="course", cart__is_active=False
+        )
+        .order_by()
+        .values("course")
+        .annotate(total=Sum(net_price()))
+        .values("total")
+    )
+    archived_revenue = (
+        CartItemSummary.objects.filter(course=OuterRef("pk"), item_type="course")
+        .order_by()
+        .values("course")
+        .annotate(total=Sum("revenue"))
+        .values("total")
+    )
+    money = DecimalField(max_digits=14, decimal_places=2)
+
+    return queryset.annotate(
+        enrollment_count=_count_subquery(UserCourse.objects.all()),
+        completion_rate=Coalesce(
+            Subquery(completion, output_field=FloatField()), Value(0.0)
+        ),
+        resource_count=_count_subquery(CourseResource.objects.all()),
+        revenue=Coalesce(
+            Subquery(revenue, output_field=money), Value(Decimal("0")), output_field=money
+        )
+        + Coalesce(
+            Subquery(archived_revenue, output_field=money),
+            Value(Decimal("0")),
+            output_field=money,
+        ),
+    )
+
+
+def _number(params, name, parse):
+    value = (params.get(name) or "").strip()
+    if not value:
+        return None
+    try:
+        return parse(value)
+    except (ValueError, InvalidOperation):
+        return None
+
+
+def filter_courses(queryset, params):
+    """
+    Aplica los filtros del formulario: ``q``, ``category``, ``status``,
+    ``min_enrollments``, ``min_completion`` y ``min_revenue``. Los valores
+    inválidos se ignoran. Retorna (queryset, filtros limpios).
+    """
+    filters = {
+        "q": (params.get("q") or "").strip(),
+        "category": _number(params, "category", int),
+        "status": params.get("status") if params.get("status") in STATUS_FILTERS else "",
+        "min_enrollments": _number(params, "min_enrollments", int),
+        "min_completion": _number(params, "min_completion", float),
+        "min_revenue": _number(params, "min_revenue", Decimal),
+    }
+    if filters["q"]:
+        queryset = queryset.filter(title__icontains=filters["q"])
+    if filters["category"]:
+        queryset = queryset.filter(category_id=filters["category"])
+    if filters["status"]:
+        queryset = queryset.filter(STATUS_FILTERS[filters["status"]])
+    if filters["min_enrollments"] is not None:
+        queryset = queryset.filter(enrollment_count__gte=filters["min_enrollments"])
+    if filters["min_completion"] is not None:
+        queryset = queryset.filter(completion_rate__gte=filters["min_completion"])
+    if filters["min_revenue"] is not None:
+        queryset = queryset.filter(revenue__gte=filters["min_revenue"])
+    return queryset, filters
+
+
+def encode_cursor(course, sort):
+    field = SORTS[sort][0]
+    value = getattr(course, field)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([value, course.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    parse = SORTS[sort][2]
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, course_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return parse(value), int(course_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, InvalidOperation):
+        raise InvalidCursor(cursor)
+
+
+def paginate(queryset, sort, cursor=None, page_size=PAGE_SIZE):
+    """
+    Ordena por ``(valor, id)`` y retorna (página, cursor siguiente o None).
+    El cursor ya fue validado con ``decode_cursor``.
+    """
+    field, descending, _parse = SORTS[sort]
+    if descending:
+        queryset = queryset.order_by(f"-{field}", "-id")
+    else:
+        queryset = queryset.order_by(field, "id")
+
+    if cursor is not None:
+        value, course_id = cursor
+        op = "lt" if descending else "gt"
+        queryset = queryset.filter(
+            Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"id__{op}": course_id})
+        )
+
+    page = list(queryset[:page_size + 1])
+    has_next = len(page) > page_size
+    page = page[:page_size]
+    return page, encode_cursor(page[-1], sort) if has_next else None
+
+
+def course_totals():
+    """Totales del panel en una sola consulta agregada."""
+    return Course.objects.aggregate(
+        total=Count("id"),
+        available=Count("id", filter=Q(is_available=True)),
+        free=Count("id", filter=Q(is_free=True)),
+        visible=Count("id", filter=Q(is_visible=True)),
+    )
+
+
+def admin_course_page(params):
+    """
+    Arma el contexto del listado: página anotada, cursor siguiente, filtros,
+    orden y totales. Un cursor inválido vuelve a la primera página.
+    """
+    sort = params.get("sort") if params.get("sort") in SORTS else DEFAULT_SORT
+    cursor = None
+    if params.get("cursor"):
+        try:
+            cursor = decode_cursor(params["cursor"], sort)
+        except InvalidCursor:
+            cursor = None
+
+    courses = annotate_course_stats(
+        Course.objects.select_related("category", "created_by")
+    )
+    courses, filters = filter_courses(courses, params)
+    page, next_cursor = paginate(courses, sort, cursor)
+    return {
+        "courses": page,
+        "next_cursor": next_cursor,
+        "is_first_page": cursor is None,
+        "filters": filters,
+        "sort": sort,
+        "totals": course_totals(),
+    }
@@ -0,0 +1,254 @@
+# cursos/api.py
+"""
+API JSON de solo lectura del catálogo (v1).
+
+Expone cursos, categorías, etiquetas y planes de membresía. Todas las
+respuestas llevan un ETag fuerte derivado de la versión del catálogo
+(``cursos.catalog``) y de la URL pedida, por lo que un cliente que envía
+``If-None-Match`` recibe un 304 consultando solo la caché, sin tocar la base
+de datos. El listado de cursos usa paginación keyset sobre
+``(created_at, id)`` con un cursor opaco y admite selección de campos con
+``?fields=``.
+"""
+import base64
+import binascii
+import hashlib
+from datetime import datetime
+
+from django.db.models import Q
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import condition, require_GET
+
+from .catalog import get_catalog_snapshot, get_catalog_version, get_ratings_version
+from .models import Course
+from .pricing import get_prices
+
+API_VERSION = "v1"
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+COURSE_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "category",
+    "tags",
+    "base_price",
+    "final_price",
+    "is_free",
+    "membership_required",
+    "duration_minutes",
+    "rating",
+    "rating_count",
+    "created_at",
+    "updated_at",
+    "url",
+)
+
+
+class APIError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _error(message, status=400):
+    return JsonResponse({"error": message}, status=status)
+
+
+def catalog_etag(request, *args, **kwargs):
+    """ETag fuerte: versiones del catálogo y de las calificaciones + ruta y parámetros normalizados."""
+    query = "&".join(
+        f"{key}={value}"
+        for key, values in sorted(request.GET.lists())
+        for value in values
+    )
+    digest = hashlib.sha1(f"{request.path}?{query}".encode()).hexdigest()[:16]
+    return f"{API_VERSION}-{get_catalog_version()}-{get_ratings_version()}-{digest}"
+
+
+def api_view(view):
+    """GET + ETag del catálogo (304 antes de consultar la base de datos)."""
+    view = condition(etag_func=catalog_etag)(view)
+    return require_GET(view)
+
+
+# --------------------------
+# Serialización
+# --------------------------
+
+
+def _parse_fields(request):
+    fields = request.GET.get("fields")
+    if not fields:
+        return COURSE_FIELDS
+    requested = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = sorted(set(requested) - set(COURSE_FIELDS))
+    if unknown:
+        raise APIError(f"Campos desconocidos: {', '.join(unknown)}")
+    return requested
+
+
+def _serialize_course(course, fields, prices):
+    values = {
+        "id": lambda: course.id,
+        "title": lambda: course.title,
+        "description": lambda: course.description,
+        "category": lambda: {"id": course.category_id, "name": course.category.name},
+        "tags": lambda: [{"id": tag.id, "name": tag.name} for tag in course.tags.all()],
+        "base_price": lambda: course.base_price,
+        "final_price": lambda: prices[course.id][1],
+        "is_free": lambda: course.is_free,
+        "membership_required": lambda: course.membership_required,
+        "duration_minutes": lambda: course.duration_minutes,
+        "rating": lambda: course.rating,
+        "rating_count": lambda: course.rating_count,
+        "created_at": lambda: course.created_at.isoformat(),
+        "updated_at": lambda: course.updated_at.isoformat(),
+        "url": lambda: reverse("cursos:course_detail", args=[course.id]),
+    }
+    return {field: values[field]() for field in fields}
+
+
+def _encode_cursor(course):
+    raw = f"{course.created_at.isoformat()}|{course.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, course_id = (
+            base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        )
+        return datetime.fromisoformat(created_at), int(course_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise APIError("Cursor inválido")
+
+
+def _int_param(request, name):
+    value = request.GET.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise APIError(f"{name} debe ser un número entero")
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise APIError("limit debe ser un número entero")
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+
+# --------------------------
+# Vistas
+# --------------------------
+
+
+@api_view
+def course_list(request):
+    """Cursos disponibles, del más reciente al más antiguo."""
+    try:
+        fields = _parse_fields(request)
+        limit = _page_size(request)
+        cursor = request.GET.get("cursor")
+        position = _decode_cursor(cursor) if cursor else None
+        category_id = _int_param(request, "category")
+        tag_id = _int_param(request, "tag")
+    except APIError as e:
+        return _error(e.message, e.status)
+
+    courses = Course.objects.filter(is_available=True).order_by("-created_at", "-id")
+    if "category" in fields:
+        courses = courses.select_related("category")
+    if "tags" in fields:
+        courses = courses.prefetch_related("tags")
+    if category_id:
+        courses = courses.filter(category_id=category_id)
+    if tag_id:
+        courses = courses.filter(tags__id=tag_id)
+    if position:
+        created_at, course_id = position
+        # Keyset: (created_at, id) estrictamente menor que el último entregado
+        courses = courses.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=course_id)
+        )
+
+    page = list(courses[:limit + 1])
+    has_next = len(page) > limit
+    page = page[:limit]
+    prices = get_prices(page) if "final_price" in fields else {}
+
+    next_cursor = _encode_cursor(page[-1]) if has_next else None
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params["cursor"] = next_cursor
+        next_url = f"{request.path}?{params.urlencode()}"
+
+    return JsonResponse({
+        "results": [_serialize_course(course, fields, prices) for course in page],
+        "next_cursor": next_cursor,
+        "next": next_url,
+    })
+
+
+@api_view
+def course_detail(request, pk):
+    try:
+        fields = _parse_fields(request)
+    except APIError as e:
+        return _error(e.message, e.status)
+    course = get_object_or_404(
+        Course.objects.select_related("category").prefetch_related("tags"),
+        pk=pk,
+        is_available=True,
+    )
+    prices = get_prices([course]) if "final_price" in fields else {}
+    return JsonResponse(_serialize_course(course, fields, prices))
+
+
+@api_view
+def category_list(request):
+    categories = get_catalog_snapshot()["categories"]
+    return JsonResponse({
+        "results": [
+            {"id": category.id, "name": category.name, "description": category.description}
+            for category in categories
+        ]
+    })
+
+
+@api_view
+def tag_list(request):
+    tags = get_catalog_snapshot()["tags"]
+    return JsonResponse({"results": [{"id": tag.id, "name": tag.name} for tag in tags]})
+
+
+@api_view
+def plan_list(request):
+    plans = get_catalog_snapshot()["plans"]
+    return JsonResponse({
+        "results": [
+            {
+                "id": plan.id,
+                "name": plan.name,
+                "slug": plan.slug,
+                "price": int(plan.price),
+                "courses_per_month": plan.courses_per_month,
+                "discount_percentage": plan.discount_percentage,
+                "consultations": plan.consultations,
+                "telegram_level": plan.telegram_level,
+                "description": plan.description,
+                "features": plan.features,
+            }
+            for plan in plans
+        ]
+    })
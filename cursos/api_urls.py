@@ -0,0 +1,13 @@
+# cursos/api_urls.py
+from django.urls import path
+from . import api
+
+app_name = 'api_v1'
+
+urlpatterns = [
+    path('courses/', api.course_list, name='course_list'),
+    path('courses/<int:pk>/', api.course_detail, name='course_detail'),
+    path('categories/', api.category_list, name='category_list'),
+    path('tags/', api.tag_list, name='tag_list'),
+    path('plans/', api.plan_list, name='plan_list'),
+]
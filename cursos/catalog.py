@@ -0,0 +1,108 @@
+# cursos/catalog.py
+"""
+Caché versionada del catálogo público de cursos.
+
+La instantánea del catálogo (cursos, precios, categorías, etiquetas y planes) se guarda
+en la caché compartida bajo una clave que incluye la versión del catálogo.
+Los signals de ``cursos.signals`` incrementan la versión cada vez que cambia
+un curso, categoría, etiqueta o plan, de modo que la siguiente visita
+reconstruye la instantánea y las anteriores simplemente expiran.
+
+Las calificaciones de la instantánea pueden estar desactualizadas: las
+reseñas solo incrementan la versión de calificaciones, y quien ordena por
+calificación las lee en vivo (``live_ratings``).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from membresias.models import MembershipPlan
+from .models import Category, Course, Tag
+from .pricing import get_prices
+
+CATALOG_VERSION_KEY = "cursos:catalog:version"
+CATALOG_SNAPSHOT_KEY = "cursos:catalog:snapshot:{version}"
+RATINGS_VERSION_KEY = "cursos:ratings:version"
+
+
+def _initial_version():
+    # Basada en el reloj para que, si la caché pierde la clave de versión,
+    # nunca se vuelva a una versión con una instantánea antigua aún guardada.
+    return int(time.time() * 1000)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def get_catalog_version():
+    """Retorna la versión actual del catálogo (sin consultar la base de datos)."""
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalida la instantánea actual incrementando la versión del catálogo."""
+    return _bump_version(CATALOG_VERSION_KEY)
+
+
+def get_ratings_version():
+    """
+    Versión de las calificaciones, separada de la del catálogo: una reseña no
+    invalida la instantánea, los resúmenes de carrito ni los accesos por plan,
+    solo los ETags de la API.
+    """
+    return _get_version(RATINGS_VERSION_KEY)
+
+
+def bump_ratings_version():
+    return _bump_version(RATINGS_VERSION_KEY)
+
+
+def build_catalog_snapshot():
+    """Construye la instantánea del catálogo público desde la base de datos."""
+    courses = list(
+        Course.objects.filter(is_available=True)
+        .select_related("category")
+        .prefetch_related("tags")
+        .order_by("id")
+    )
+    return {
+        # Precios sin plan ni código, leídos en bloque desde el libro de precios
+        "prices": get_prices(courses),
+        "free_courses": [course for course in courses if course.is_free],
+        "general_courses": [course for course in courses if not course.is_free],
+        "categories": list(Category.objects.order_by("name")),
+        "tags": list(Tag.objects.order_by("name")),
+        "plans": list(MembershipPlan.objects.filter(is_active=True)),
+    }
+
+
+def get_catalog_snapshot():
+    """Retorna la instantánea del catálogo para la versión vigente."""
+    version = get_catalog_version()
+    key = CATALOG_SNAPSHOT_KEY.format(version=version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_catalog_snapshot()
+        snapshot["version"] = version
+        cache.set(key, snapshot, settings.CATALOG_CACHE_TIMEOUT)
+    return snapshot
+
+
+def live_ratings(course_ids):
+    """Calificación actual de cada curso por ID, en una sola consulta."""
+    return dict(Course.objects.filter(id__in=course_ids).values_list("id", "rating"))
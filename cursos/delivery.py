@@ -0,0 +1,171 @@
+# cursos/delivery.py
+"""
+Entrega protegida de archivos de recursos de cursos.
+
+Los archivos se sirven solo después de validar el acceso del usuario. Según
+``PROTECTED_MEDIA_SERVER`` se delega el envío al servidor frontal
+(``X-Accel-Redirect`` de nginx o ``X-Sendfile`` de Apache) o se transmiten
+desde Django por bloques, con soporte de peticiones ``Range`` para que los
+visores de PDF y video puedan saltar a cualquier posición sin cargar el
+archivo completo en memoria.
+
+Los archivos se guardan en ``PROTECTED_MEDIA_ROOT`` (``protected_storage``),
+fuera de ``MEDIA_ROOT``: ni ``/media/`` en desarrollo ni el servidor frontal
+los publican, así que la única forma de obtenerlos es ``access_resource``.
+"""
+import logging
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de cada bloque leído del almacenamiento al transmitir
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def protected_storage():
+    """Almacenamiento no público de los archivos de recursos de cursos."""
+    return FileSystemStorage(location=settings.PROTECTED_MEDIA_ROOT)
+
+
+def _file_stat(field_file):
+    """Retorna (tamaño, timestamp de modificación o None) del archivo."""
+    storage = field_file.storage
+    size = storage.size(field_file.name)
+    try:
+        modified = storage.get_modified_time(field_file.name).timestamp()
+    except NotImplementedError:
+        modified = None
+    return size, modified
+
+
+def _parse_range(header, size):
+    """
+    Interpreta una cabecera ``Range`` de un solo rango.
+
+    Retorna (inicio, fin) inclusivos, None si la cabecera no aplica (se envía
+    el archivo completo) o False si el rango no es satisfacible.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Rangos múltiples o unidades desconocidas: responder con el archivo completo
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Sufijo: los últimos N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _iter_range(field_file, start, length):
+    """Lee ``length`` bytes desde ``start`` en bloques de ``CHUNK_SIZE``."""
+    with field_file.storage.open(field_file.name, "rb") as handle:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _offload_response(field_file, content_type):
+    """Respuesta vacía que delega el envío del archivo al servidor frontal."""
+    response = HttpResponse(content_type=content_type)
+    if settings.PROTECTED_MEDIA_SERVER == "nginx":
+        response["X-Accel-Redirect"] = settings.PROTECTED_MEDIA_INTERNAL_URL + quote(
+            field_file.name
+        )
+    else:
+        response["X-Sendfile"] = field_file.path
+    return response
+
+
+def serve_protected_file(request, field_file, as_attachment=False):
+    """
+    Sirve un ``FieldFile`` ya autorizado con ETag, Last-Modified y Range.
+
+    La vista que llama es responsable de validar el acceso del usuario. Si el
+    archivo no está en el almacenamiento (por ejemplo, una subida antigua que
+    ``move_resource_files`` aún no movió) lanza ``Http404``.
+    """
+    try:
+        size, modified = _file_stat(field_file)
+    except OSError as e:
+        logger.warning("Archivo de recurso no disponible %s: %s", field_file.name, e)
+        raise Http404("El archivo no está disponible.")
+    etag = quote_etag(
+        f"{size:x}-{int(modified):x}" if modified is not None else f"{size:x}"
+    )
+
+    # 304 / 412 antes de abrir el archivo
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=int(modified) if modified else None
+    )
+    if conditional is not None:
+        return conditional
+
+    filename = field_file.name.rsplit("/", 1)[-1]
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    if settings.PROTECTED_MEDIA_SERVER:
+        # El servidor frontal maneja Range y cabeceras condicionales por su cuenta
+        response = _offload_response(field_file, content_type)
+    else:
+        byte_range = None
+        range_header = request.META.get("HTTP_RANGE")
+        if_range = request.META.get("HTTP_IF_RANGE")
+        if range_header and (not if_range or if_range == etag):
+            byte_range = _parse_range(range_header, size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        if byte_range is None:
+            response = FileResponse(
+                field_file.storage.open(field_file.name, "rb"),
+                content_type=content_type,
+            )
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _iter_range(field_file, start, length),
+                status=206,
+                content_type=content_type,
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response["Content-Length"] = str(length)
+
+        response["Accept-Ranges"] = "bytes"
+
+    response["ETag"] = etag
+    if modified is not None:
+        response["Last-Modified"] = http_date(modified)
+    response["Content-Disposition"] = content_disposition_header(
+        as_attachment, filename
+    )
+    # Contenido protegido: nunca en cachés compartidas
+    patch_cache_control(response, private=True)
+    return response
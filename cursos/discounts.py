@@ -0,0 +1,215 @@
+# cursos/discounts.py
+"""
+Búsqueda y canje de códigos de descuento.
+
+Hay dos tipos de código:
+
+- ``DiscountCode``: de un solo curso y sin vencimiento; alimenta el libro de
+  precios (``cursos.pricing``).
+- ``DiscountCampaign``: de campaña, para varios cursos y/o planes, con ventana
+  de vigencia y cupos global y por usuario.
+
+La búsqueda normaliza el texto (``strip().upper()``) y consulta por igualdad
+las columnas ``code`` (guardadas en mayúsculas, con índice único), en lugar de
+``code__iexact``, que no usa el índice. Los códigos inexistentes se recuerdan
+en la caché (``DISCOUNT_MISS_CACHE_TIMEOUT``), así que repetirlos no consulta
+la base de datos, y cada usuario tiene un límite de intentos por ventana
+(``DISCOUNT_MAX_ATTEMPTS`` cada ``DISCOUNT_ATTEMPT_WINDOW`` segundos).
+
+El cupo de una campaña se descuenta al iniciar el pago (``redeem_campaign``)
+con ``UPDATE`` condicionados sobre los contadores, nunca leyendo y escribiendo
+por separado; dos canjes simultáneos no pueden exceder el cupo. Cada canje
+queda en ``DiscountRedemption`` y, si el pago falla o se cancela,
+``release_redemptions`` lo devuelve al cupo. Un nuevo intento de pago del
+mismo carrito cancela sus pagos pendientes anteriores y libera sus canjes, y
+``pagos.expiry`` vence los pagos pendientes abandonados y libera los suyos.
+Si Webpay aprueba después uno de esos pagos, la entrega vuelve a descontar el
+cupo con ``reclaim_redemptions`` y no entrega nada si ya no queda.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import DiscountCampaign, DiscountCampaignUsage, DiscountCode, DiscountRedemption
+
+MISS_KEY = "cursos:discount:miss:{code}"
+ATTEMPTS_KEY = "cursos:discount:attempts:{user_id}"
+
+
+class DiscountError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def normalize_code(code):
+    return (code or "").strip().upper()
+
+
+def forget_code(code):
+    """Olvida un código inexistente cacheado (al crear o renombrar un código)."""
+    cache.delete(MISS_KEY.format(code=normalize_code(code)))
+
+
+def _check_attempts(user):
+    key = ATTEMPTS_KEY.format(user_id=user.pk)
+    cache.add(key, 0, settings.DISCOUNT_ATTEMPT_WINDOW)
+    try:
+        attempts = cache.incr(key)
+    except ValueError:
+        # La clave expiró entre add e incr
+        cache.set(key, 1, settings.DISCOUNT_ATTEMPT_WINDOW)
+        attempts = 1
+    if attempts > settings.DISCOUNT_MAX_ATTEMPTS:
+        raise DiscountError("Demasiados intentos. Espera unos minutos antes de probar otro código.")
+
+
+def _active_campaigns(now):
+    return DiscountCampaign.objects.filter(
+        Q(ends_at__isnull=True) | Q(ends_at__gt=now),
+        is_active=True,
+        starts_at__lte=now,
+    )
+
+
+def find_discount(code, user):
+    """
+    Retorna el ``DiscountCode`` o ``DiscountCampaign`` vigente para ``code``,
+    o lanza ``DiscountError``. No descuenta cupos.
+    """
+    code = normalize_code(code)
+    if not code:
+        raise DiscountError("Por favor, ingresa un código de descuento.")
+    _check_attempts(user)
+
+    miss_key = MISS_KEY.format(code=code)
+    if cache.get(miss_key):
+        raise DiscountError("El código de descuento no existe.")
+
+    discount = DiscountCode.objects.select_related("course").filter(code=code).first()
+    if discount is not None:
+        return discount
+
+    campaign = DiscountCampaign.objects.filter(code=code).first()
+    if campaign is None:
+        cache.set(miss_key, True, settings.DISCOUNT_MISS_CACHE_TIMEOUT)
+        raise DiscountError("El código de descuento no existe.")
+
+    now = timezone.now()
+    if not campaign.is_active or campaign.starts_at > now or (campaign.ends_at and campaign.ends_at <= now):
+        raise DiscountError("Este código de descuento no está vigente.")
+    if campaign.max_redemptions is not None and campaign.redemption_count >= campaign.max_redemptions:
+        raise DiscountError("Este código de descuento ya alcanzó su límite de usos.")
+    used = (
+        DiscountCampaignUsage.objects.filter(campaign=campaign, user=user)
+        .values_list("uses", flat=True)
+        .first()
+    ) or 0
+    if used >= campaign.max_redemptions_per_user:
+        raise DiscountError("Ya usaste este código de descuento el máximo de veces permitido.")
+    return campaign
+
+
+def redeem_campaign(campaign_id, user, payment, discount_amount):
+    """
+    Descuenta un uso del cupo global y del cupo de ``user`` y registra el
+    canje. Debe llamarse dentro de la transacción que crea el pago; si no
+    queda cupo lanza ``DiscountError`` y la transacción se revierte.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        updated = (
+            _active_campaigns(now)
+            .filter(pk=campaign_id)
+            .filter(Q(max_redemptions__isnull=True) | Q(redemption_count__lt=F("max_redemptions")))
+            .update(redemption_count=F("redemption_count") + 1)
+        )
+        if not updated:
+            raise DiscountError("Este código de descuento ya no está disponible.")
+
+        per_user = DiscountCampaign.objects.filter(pk=campaign_id).values_list(
+            "max_redemptions_per_user", flat=True
+        ).get()
+        try:
+            with transaction.atomic():
+                DiscountCampaignUsage.objects.create(campaign_id=campaign_id, user=user)
+        except IntegrityError:
+            pass
+        updated = DiscountCampaignUsage.objects.filter(
+            campaign_id=campaign_id, user=user, uses__lt=per_user
+        ).update(uses=F("uses") + 1)
+        if not updated:
+            raise DiscountError("Ya usaste este código de descuento el máximo de veces permitido.")
+
+        return DiscountRedemption.objects.create(
+            campaign_id=campaign_id,
+            user=user,
+            payment=payment,
+            discount_amount=discount_amount,
+        )
+
+
+def release_redemptions(payment):
+    """Devuelve al cupo los canjes del pago (fallido o cancelado). Retorna cuántos."""
+    return release_payment_redemptions([payment.pk])
+
+
+def release_payment_redemptions(payment_ids):
+    """Como ``release_redemptions``, para varios pagos a la vez (IDs)."""
+    released = 0
+    with transaction.atomic():
+        redemptions = list(
+            DiscountRedemption.objects.select_for_update().filter(
+                payment_id__in=payment_ids, released_at__isnull=True
+            )
+        )
+        for redemption in redemptions:
+            DiscountCampaign.objects.filter(pk=redemption.campaign_id).update(
+                redemption_count=F("redemption_count") - 1
+            )
+            DiscountCampaignUsage.objects.filter(
+                campaign_id=redemption.campaign_id, user_id=redemption.user_id
+            ).update(uses=F("uses") - 1)
+            released += 1
+        if redemptions:
+            DiscountRedemption.objects.filter(
+                pk__in=[redemption.pk for redemption in redemptions]
+            ).update(released_at=timezone.now())
+    return released
+
+
+def reclaim_redemptions(payment):
+    """
+    Vuelve a descontar del cupo los canjes liberados de ``payment`` (pago
+    reemplazado o vencido que Webpay aprobó después), con los mismos
+    ``UPDATE`` condicionados de ``redeem_campaign``. Si ya no queda cupo
+    lanza ``DiscountError`` y no recupera ninguno. Retorna cuántos recuperó.
+    """
+    with transaction.atomic():
+        redemptions = list(
+            DiscountRedemption.objects.select_for_update().filter(
+                payment_id=payment.pk, released_at__isnull=False
+            )
+        )
+        for redemption in redemptions:
+            updated = (
+                DiscountCampaign.objects.filter(pk=redemption.campaign_id)
+                .filter(Q(max_redemptions__isnull=True) | Q(redemption_count__lt=F("max_redemptions")))
+                .update(redemption_count=F("redemption_count") + 1)
+            )
+            if not updated:
+                raise DiscountError("Este código de descuento ya no está disponible.")
+            updated = DiscountCampaignUsage.objects.filter(
+                campaign_id=redemption.campaign_id,
+                user_id=redemption.user_id,
+                uses__lt=F("campaign__max_redemptions_per_user"),
+            ).update(uses=F("uses") + 1)
+            if not updated:
+                raise DiscountError("Ya usaste este código de descuento el máximo de veces permitido.")
+        if redemptions:
+            DiscountRedemption.objects.filter(
+                pk__in=[redemption.pk for redemption in redemptions]
+            ).update(released_at=None)
+    return len(redemptions)
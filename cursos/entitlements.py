@@ -0,0 +1,104 @@
+# cursos/entitlements.py
+"""
+Resolución de accesos a cursos por usuario.
+
+Carga de una sola vez las compras del usuario, su membresía activa (con su
+plan) y la relación plan→curso, para responder en memoria si el usuario puede
+acceder a cualquier cantidad de cursos y, si no puede, por qué.
+"""
+from collections import defaultdict
+
+from django.utils.functional import cached_property
+
+from .models import Course, UserCourse
+
+
+class CourseEntitlements:
+    """
+    Índice en memoria de los accesos de un usuario a los cursos.
+
+    Cada dato se carga de forma perezosa y una sola vez (2-3 consultas en
+    total), sin importar cuántos cursos se verifiquen después.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def purchased_course_ids(self):
+        """IDs de los cursos con registro UserCourse (comprados o reclamados)."""
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            UserCourse.objects.filter(user=self.user).values_list("course_id", flat=True)
+        )
+
+    @cached_property
+    def active_membership(self):
+        """Membresía activa del usuario con su plan ya cargado."""
+        if not self.user.is_authenticated:
+            return None
+        return (
+            self.user.memberships.filter(status="active")
+            .select_related("plan")
+            .order_by("-end_date")
+            .first()
+        )
+
+    @cached_property
+    def plan_ids_by_course(self):
+        """Planes habilitados para cada curso que requiere membresía."""
+        through = Course.available_membership_plans.through
+        plan_ids = defaultdict(set)
+        rows = through.objects.filter(course__membership_required=True).values_list(
+            "course_id", "membershipplan_id"
+        )
+        for course_id, plan_id in rows:
+            plan_ids[course_id].add(plan_id)
+        return plan_ids
+
+    @cached_property
+    def claimed_course_ids(self):
+        """IDs de los cursos reclamados como recompensa en la membresía activa."""
+        if not self.active_membership:
+            return frozenset()
+        return frozenset(
+            self.active_membership.welcome_courses_claimed.values_list("id", flat=True)
+        )
+
+    @property
+    def owned_course_ids(self):
+        """Cursos que el usuario ya posee (comprados o reclamados)."""
+        return self.purchased_course_ids | self.claimed_course_ids
+
+    def check(self, course):
+        """
+        Verifica si el usuario puede acceder a un curso y sus recursos.
+        Retorna una tupla (puede_acceder, razon_denegacion)
+        """
+        # Si el curso es gratuito, cualquiera puede acceder
+        if course.is_free:
+            return True, None
+
+        # Si el usuario ya compró este curso específico
+        if course.id in self.purchased_course_ids:
+            return True, None
+
+        # Si el curso requiere membresía, verificar membresía activa
+        if course.membership_required:
+            if not self.active_membership:
+                return False, "membership_required"
+
+            # Verificar si la membresía puede acceder a este curso
+            allowed_plans = self.plan_ids_by_course.get(course.id)
+            if allowed_plans and self.active_membership.plan_id not in allowed_plans:
+                return False, "membership_plan_insufficient"
+
+            return True, None
+
+        # Para cursos de pago sin membresía requerida, necesita haberlo comprado
+        return False, "payment_required"
+
+    def can_access(self, course):
+        """Atajo que retorna solo si el usuario puede acceder al curso."""
+        return self.check(course)[0]
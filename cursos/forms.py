@@ -1,7 +1,7 @@
 #cursos/forms.py
 from django import forms
 from django.core.exceptions import ValidationError
-from .models import Course, CourseResource, DiscountCode
+from .models import Course, CourseResource, CourseReview, DiscountCode
 
 class CourseForm(forms.ModelForm):
     duration_minutes = forms.IntegerField(
@@ -106,4 +106,14 @@ class DiscountCodeForm(forms.ModelForm):
             raise ValidationError("El porcentaje de descuento es obligatorio.")
         if discount_percentage < 0 or discount_percentage > 100:
             raise ValidationError("El porcentaje de descuento debe estar entre 0 y 100.")
-        return discount_percentage
\ No newline at end of file
+        return discount_percentage
+
+
+class CourseReviewForm(forms.ModelForm):
+    class Meta:
+        model = CourseReview
+        fields = ['score', 'comment']
+        widgets = {
+            'score': forms.Select(choices=[(i, f'{i} ★') for i in range(5, 0, -1)], attrs={'class': 'mt-1 border-gray-400 rounded-md shadow-sm focus:ring-indigo-500 focus:border-indigo-500'}),
+            'comment': forms.Textarea(attrs={'rows': 3, 'placeholder': 'Cuéntanos qué te pareció el curso', 'class': 'mt-1 block w-full border-gray-400 rounded-md shadow-sm focus:ring-indigo-500 focus:border-indigo-500'}),
+        }
@@ -0,0 +1,140 @@
+# cursos/ingest.py
+"""
+Extracción de metadatos de recursos de cursos.
+
+Al guardar un ``CourseResource`` (o desde el comando ``ingest_resources``) se
+calculan y guardan el ID y miniatura de YouTube, el tamaño, el SHA-256, el
+tipo MIME y la cantidad de páginas de los PDF. Así las páginas de detalle se
+renderizan desde columnas guardadas y las subidas duplicadas se detectan con
+una consulta por ``checksum_sha256``.
+"""
+import hashlib
+import mimetypes
+import re
+from urllib.parse import parse_qs, urlparse
+
+from django.utils import timezone
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # pypdf es opcional: sin él no se calcula page_count
+    PdfReader = None
+
+CHUNK_SIZE = 64 * 1024
+
+YOUTUBE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+YOUTUBE_THUMBNAIL_URL = "https://i.ytimg.com/vi/{youtube_id}/hqdefault.jpg"
+
+# Columnas de CourseResource que completa ingest_resource
+METADATA_FIELDS = [
+    "youtube_id",
+    "thumbnail_url",
+    "file_size",
+    "checksum_sha256",
+    "mime_type",
+    "page_count",
+    "processed_at",
+]
+
+
+def extract_youtube_id(url):
+    """Retorna el ID de un video de YouTube a partir de su URL, o None."""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    candidate = None
+    if host.endswith("youtu.be"):
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif host.endswith("youtube.com") or host.endswith("youtube-nocookie.com"):
+        if parsed.path == "/watch":
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        else:
+            parts = parsed.path.strip("/").split("/")
+            if len(parts) >= 2 and parts[0] in ("embed", "shorts", "live", "v"):
+                candidate = parts[1]
+    if candidate and YOUTUBE_ID_RE.match(candidate):
+        return candidate
+    return None
+
+
+def _file_digest_and_size(field_file):
+    """Calcula SHA-256 y tamaño leyendo el archivo por bloques."""
+    digest = hashlib.sha256()
+    size = 0
+    field_file.open("rb")
+    try:
+        field_file.seek(0)
+        for chunk in field_file.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+        field_file.seek(0)
+    finally:
+        if field_file._committed:
+            field_file.close()
+    return digest.hexdigest(), size
+
+
+def _pdf_page_count(field_file):
+    if PdfReader is None:
+        return None
+    field_file.open("rb")
+    try:
+        field_file.seek(0)
+        return len(PdfReader(field_file).pages)
+    except Exception:
+        # PDF dañado o cifrado: se deja sin conteo de páginas
+        return None
+    finally:
+        field_file.seek(0)
+        if field_file._committed:
+            field_file.close()
+
+
+def ingest_resource(resource):
+    """
+    Completa los metadatos de ``resource`` en memoria (no llama a ``save``).
+
+    Funciona tanto con archivos recién subidos (aún no guardados en el
+    almacenamiento) como con archivos ya guardados.
+    """
+    resource.youtube_id = extract_youtube_id(resource.url) or ""
+    resource.thumbnail_url = (
+        YOUTUBE_THUMBNAIL_URL.format(youtube_id=resource.youtube_id)
+        if resource.youtube_id
+        else ""
+    )
+
+    if resource.file:
+        resource.checksum_sha256, resource.file_size = _file_digest_and_size(
+            resource.file
+        )
+        resource.mime_type = (
+            mimetypes.guess_type(resource.file.name)[0] or "application/octet-stream"
+        )
+        resource.page_count = (
+            _pdf_page_count(resource.file)
+            if resource.mime_type == "application/pdf"
+            else None
+        )
+    else:
+        resource.checksum_sha256 = ""
+        resource.file_size = None
+        resource.mime_type = ""
+        resource.page_count = None
+
+    resource.processed_at = timezone.now()
+    return resource
+
+
+def find_duplicates(resource):
+    """Otros recursos con el mismo contenido de archivo (mismo SHA-256)."""
+    from .models import CourseResource
+
+    if not resource.checksum_sha256:
+        return CourseResource.objects.none()
+    return (
+        CourseResource.objects.filter(checksum_sha256=resource.checksum_sha256)
+        .exclude(pk=resource.pk)
+        .select_related("course")
+    )
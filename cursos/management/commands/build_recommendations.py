@@ -0,0 +1,39 @@
+# cursos/management/commands/build_recommendations.py
+from django.core.management.base import BaseCommand
+from cursos.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Calcula las recomendaciones de cursos por co-inscripción ("los estudiantes también tomaron")'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=10,
+            help='Cursos similares guardados por curso'
+        )
+        parser.add_argument(
+            '--user-top-k',
+            type=int,
+            default=10,
+            help='Cursos recomendados guardados por usuario'
+        )
+        parser.add_argument(
+            '--min-common',
+            type=int,
+            default=1,
+            help='Mínimo de estudiantes en común para considerar dos cursos similares'
+        )
+
+    def handle(self, *args, **options):
+        course_rows, user_rows = build_recommendations(
+            top_k=options['top_k'],
+            user_top_k=options['user_top_k'],
+            min_common=options['min_common'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Recomendaciones generadas: {course_rows} por curso, {user_rows} por usuario'
+            )
+        )
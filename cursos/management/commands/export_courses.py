@@ -0,0 +1,35 @@
+# cursos/management/commands/export_courses.py
+import sys
+
+from django.core.management.base import BaseCommand
+from cursos.transfer import FORMATS, export_courses
+
+
+class Command(BaseCommand):
+    help = 'Exporta el catálogo de cursos a CSV o JSONL (compatible con import_courses)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo de salida ("-" para la salida estándar)')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Formato del archivo (por defecto según la extensión)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Cursos leídos por consulta'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+
+        if path == '-':
+            export_courses(sys.stdout, fmt, options['chunk_size'])
+            return
+
+        with open(path, 'w', newline='', encoding='utf-8') as stream:
+            count = export_courses(stream, fmt, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {count} cursos exportados a {path}'))
@@ -0,0 +1,85 @@
+# cursos/management/commands/import_courses.py
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from cursos.transfer import FORMATS, CourseImporter, read_records
+
+
+class Command(BaseCommand):
+    help = 'Importa (crea o actualiza) cursos desde un archivo CSV o JSONL en bloques'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo a importar ("-" para la entrada estándar)')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Formato del archivo (por defecto según la extensión)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Registros escritos por transacción'
+        )
+        parser.add_argument(
+            '--created-by',
+            help='Email del usuario staff asignado como creador de los cursos nuevos'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validar y simular la importación sin guardar cambios'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+
+        created_by = None
+        if options['created_by']:
+            created_by = get_user_model().objects.filter(
+                email=options['created_by'], is_staff=True
+            ).first()
+            if created_by is None:
+                raise CommandError(f"No existe un usuario staff con email {options['created_by']}")
+
+        importer = CourseImporter(
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+            created_by=created_by,
+        )
+        start = time.monotonic()
+
+        def report(importer):
+            elapsed = time.monotonic() - start
+            self.stdout.write(
+                self.style.HTTP_INFO(
+                    f'⚡ {importer.processed} registros '
+                    f'({importer.created} creados, {importer.updated} actualizados, '
+                    f'{len(importer.errors)} errores) - {importer.processed / max(elapsed, 0.001):.0f} reg/s'
+                )
+            )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('⚠️ Modo simulación: no se guardarán cambios'))
+
+        if path == '-':
+            importer.run(read_records(sys.stdin, fmt), on_chunk=report)
+        else:
+            with open(path, newline='', encoding='utf-8') as stream:
+                importer.run(read_records(stream, fmt), on_chunk=report)
+
+        for line, message in importer.errors[:50]:
+            self.stdout.write(self.style.ERROR(f'❌ Registro {line}: {message}'))
+        if len(importer.errors) > 50:
+            self.stdout.write(self.style.ERROR(f'❌ ... y {len(importer.errors) - 50} errores más'))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Importación {"simulada" if options["dry_run"] else "completada"}: '
+                f'{importer.created} creados, {importer.updated} actualizados, '
+                f'{len(importer.errors)} errores'
+            )
+        )
@@ -0,0 +1,38 @@
+# cursos/management/commands/ingest_resources.py
+from django.core.management.base import BaseCommand
+from cursos.ingest import METADATA_FIELDS, ingest_resource
+from cursos.models import CourseResource
+
+
+class Command(BaseCommand):
+    help = 'Extrae los metadatos (YouTube, tamaño, SHA-256, MIME, páginas) de los recursos de cursos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Reprocesar todos los recursos, no solo los pendientes'
+        )
+
+    def handle(self, *args, **options):
+        resources = CourseResource.objects.order_by('id')
+        if not options['all']:
+            resources = resources.filter(processed_at__isnull=True)
+
+        processed = 0
+        errors = 0
+        for resource in resources.iterator(chunk_size=200):
+            try:
+                ingest_resource(resource)
+            except OSError as e:
+                errors += 1
+                self.stdout.write(
+                    self.style.WARNING(f'⚠️ Recurso {resource.id}: no se pudo leer el archivo ({e})')
+                )
+                continue
+            resource.save(update_fields=METADATA_FIELDS)
+            processed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Recursos procesados: {processed} (errores: {errors})')
+        )
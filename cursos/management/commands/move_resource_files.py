@@ -0,0 +1,37 @@
+# cursos/management/commands/move_resource_files.py
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from cursos.models import CourseResource
+
+
+class Command(BaseCommand):
+    help = 'Mueve los archivos de recursos subidos antes a MEDIA_ROOT hacia PROTECTED_MEDIA_ROOT'
+
+    def handle(self, *args, **options):
+        public = FileSystemStorage()
+        resources = CourseResource.objects.exclude(file="").exclude(file__isnull=True).order_by('id')
+
+        moved = 0
+        errors = 0
+        for resource in resources.iterator(chunk_size=200):
+            name = resource.file.name
+            protected = resource.file.storage
+            if protected.exists(name) or not public.exists(name):
+                continue
+            try:
+                with public.open(name, 'rb') as source:
+                    saved = protected.save(name, source)
+            except OSError as e:
+                errors += 1
+                self.stdout.write(
+                    self.style.WARNING(f'⚠️ Recurso {resource.id}: no se pudo mover el archivo ({e})')
+                )
+                continue
+            if saved != name:
+                CourseResource.objects.filter(pk=resource.pk).update(file=saved)
+            public.delete(name)
+            moved += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Archivos movidos: {moved} (errores: {errors})')
+        )
@@ -0,0 +1,13 @@
+# cursos/management/commands/rebuild_plan_access.py
+from django.core.management.base import BaseCommand
+from cursos.plan_access import rebuild_plan_access
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla de accesos de cada plan de membresía a los cursos'
+
+    def handle(self, *args, **options):
+        total = rebuild_plan_access()
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Accesos por plan reconstruidos: {total} filas')
+        )
@@ -0,0 +1,13 @@
+# cursos/management/commands/rebuild_price_book.py
+from django.core.management.base import BaseCommand
+from cursos.pricing import rebuild_price_book
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el libro de precios de cursos por plan y código de descuento'
+
+    def handle(self, *args, **options):
+        total = rebuild_price_book()
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Libro de precios reconstruido: {total} precios')
+        )
@@ -0,0 +1,28 @@
+# cursos/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from cursos.models import Course
+from cursos.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el vector de búsqueda full-text de todos los cursos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Cantidad de cursos actualizados por consulta'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        ids = list(Course.objects.order_by('id').values_list('id', flat=True))
+        updated = 0
+
+        for start in range(0, len(ids), chunk_size):
+            updated += update_search_vectors(ids[start:start + chunk_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Vector de búsqueda actualizado para {updated} cursos')
+        )
@@ -0,0 +1,15 @@
+# cursos/management/commands/repair_course_ratings.py
+from django.core.management.base import BaseCommand
+from cursos.ratings import repair_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los agregados de calificación de los cursos desde las reseñas y corrige desviaciones'
+
+    def handle(self, *args, **options):
+        repaired = repair_ratings()
+        if repaired:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️ Agregados corregidos en {repaired} cursos')
+            )
+        self.stdout.write(self.style.SUCCESS('✅ Calificaciones de cursos consistentes'))
@@ -1,8 +1,17 @@
 # cursos/models.py
+import logging
+
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from datetime import timedelta
+from .delivery import protected_storage
+from .ingest import extract_youtube_id, ingest_resource
+
+logger = logging.getLogger(__name__)
 
 
 class Category(models.Model):
@@ -42,6 +51,9 @@ class Tag(models.Model):
         ]
 
 
+RATING_FIELDS = ("rating", "rating_count", "rating_sum", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5")
+
+
 class Course(models.Model):
     id = models.BigAutoField(primary_key=True)
     title = models.CharField(max_length=200, verbose_name="Título")
@@ -83,7 +95,20 @@ class Course(models.Model):
     tags = models.ManyToManyField(
         Tag, blank=True, related_name="courses", verbose_name="Etiquetas"
     )
+    # Promedio bayesiano de las reseñas; junto con los agregados siguientes lo
+    # mantiene cursos.ratings con actualizaciones F() (no editar a mano)
     rating = models.FloatField(default=0.0, verbose_name="Calificación", blank=True)
+    rating_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Cantidad de Reseñas"
+    )
+    rating_sum = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Suma de Calificaciones"
+    )
+    rating_1 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Reseñas 1★")
+    rating_2 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Reseñas 2★")
+    rating_3 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Reseñas 3★")
+    rating_4 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Reseñas 4★")
+    rating_5 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Reseñas 5★")
     special_discount_percentage = models.DecimalField(
         max_digits=5,
         decimal_places=2,
@@ -110,6 +135,11 @@ class Course(models.Model):
         verbose_name="Disponible como recompensa para estos planes",
         help_text="Planes que pueden reclamar este curso como recompensa de bienvenida",
     )
+    # Mantenido por cursos.search.update_search_vectors (título, descripción,
+    # categoría y etiquetas) para la búsqueda del catálogo
+    search_vector = SearchVectorField(
+        null=True, editable=False, verbose_name="Vector de búsqueda"
+    )
 
     def clean(self):
         # Asegurarnos de que base_price no sea None
@@ -143,28 +173,21 @@ class Course(models.Model):
         if self.duration_minutes < 0:
             raise ValidationError("La duración no puede ser negativa.")
 
+    def save(self, *args, **kwargs):
+        # Los agregados de calificación solo los escribe cursos.ratings con F();
+        # guardar la fila completa pisaría los incrementos hechos desde que se cargó
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def duration(self):
         return timedelta(minutes=self.duration_minutes)
 
-    def get_final_discount(self, discount_code=None):
-        special_discount = self.special_discount_percentage or 0
-        code_discount = 0
-        if discount_code:
-            try:
-                code = self.discount_codes.get(code__iexact=discount_code)
-                code_discount = code.discount_percentage or 0
-            except DiscountCode.DoesNotExist:
-                pass
-        return max(special_discount, code_discount)
-
-    def get_final_price(self, discount_code=None):
-        if self.is_free:
-            return 0
-        discount_percentage = self.get_final_discount(discount_code)
-        discount_amount = (self.base_price * discount_percentage) / 100
-        return int(self.base_price - discount_amount)
-
     def can_user_access(self, user):
         """Verifica si un usuario puede acceder al curso."""
         # Si el curso es gratuito, cualquier usuario puede acceder
@@ -188,6 +211,18 @@ class Course(models.Model):
 
         return True
 
+    @property
+    def average_rating(self):
+        """Promedio simple de las reseñas (sin ajuste bayesiano)."""
+        if not self.rating_count:
+            return 0.0
+        return self.rating_sum / self.rating_count
+
+    @property
+    def rating_histogram(self):
+        """Lista [(estrellas, cantidad)] de 5 a 1 estrellas."""
+        return [(stars, getattr(self, f"rating_{stars}")) for stars in range(5, 0, -1)]
+
     def get_available_membership_plans(self):
         """Retorna los planes de membresía que pueden acceder al curso."""
         if not self.membership_required:
@@ -204,6 +239,9 @@ class Course(models.Model):
             models.Index(fields=["title"]),
             models.Index(fields=["category"]),
             models.Index(fields=["membership_required"]),
+            models.Index(fields=["-rating", "id"]),
+            models.Index(fields=["-created_at", "-id"]),
+            GinIndex(fields=["search_vector"]),
         ]
 
 
@@ -218,14 +256,72 @@ class CourseResource(models.Model):
         Course, on_delete=models.CASCADE, related_name="resources", verbose_name="Curso"
     )
     title = models.CharField(max_length=200, verbose_name="Título")
+    # Fuera de MEDIA_ROOT: solo se entrega a través de access_resource (cursos.delivery)
     file = models.FileField(
-        upload_to="course_resources/", blank=True, null=True, verbose_name="Archivo"
+        upload_to="course_resources/",
+        storage=protected_storage,
+        blank=True,
+        null=True,
+        verbose_name="Archivo",
     )
     url = models.URLField(blank=True, null=True, verbose_name="URL")
     type = models.CharField(max_length=20, choices=RESOURCE_TYPES, verbose_name="Tipo")
     created_at = models.DateTimeField(
         auto_now_add=True, verbose_name="Fecha de Creación"
     )
+    # Metadatos extraídos al guardar (ver cursos.ingest)
+    youtube_id = models.CharField(
+        max_length=20, blank=True, editable=False, verbose_name="ID de YouTube"
+    )
+    thumbnail_url = models.URLField(
+        blank=True, editable=False, verbose_name="URL de Miniatura"
+    )
+    file_size = models.BigIntegerField(
+        null=True, blank=True, editable=False, verbose_name="Tamaño (bytes)"
+    )
+    checksum_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name="SHA-256",
+    )
+    mime_type = models.CharField(
+        max_length=100, blank=True, editable=False, verbose_name="Tipo MIME"
+    )
+    page_count = models.PositiveIntegerField(
+        null=True, blank=True, editable=False, verbose_name="Páginas"
+    )
+    processed_at = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name="Fecha de Procesamiento"
+    )
+
+    def metadata_is_stale(self):
+        """Indica si cambió el archivo o la URL desde la última extracción."""
+        if self.processed_at is None:
+            return True
+        if self.file and not self.file._committed:
+            return True
+        if bool(self.file) != bool(self.checksum_sha256):
+            return True
+        return (extract_youtube_id(self.url) or "") != self.youtube_id
+
+    def save(self, *args, **kwargs):
+        if self.metadata_is_stale():
+            if settings.RESOURCE_INGEST_ON_SAVE:
+                try:
+                    ingest_resource(self)
+                except OSError as e:
+                    # Archivo ilegible (p. ej. aún no movido con move_resource_files):
+                    # se guarda igual y queda pendiente, como en ingest_resources
+                    logger.warning(
+                        "Recurso %s: no se pudo leer el archivo (%s)", self.pk, e
+                    )
+                    self.processed_at = None
+            else:
+                # Queda pendiente para el comando ingest_resources
+                self.processed_at = None
+        super().save(*args, **kwargs)
 
     def clean(self):
         if not self.file and not self.url:
@@ -265,6 +361,21 @@ class UserCourse(models.Model):
     )
     progress = models.FloatField(default=0.0, verbose_name="Progreso (%)")
     completed = models.BooleanField(default=False, verbose_name="Completado")
+    # Último punto de avance reportado (ver cursos.progress)
+    last_resource = models.ForeignKey(
+        CourseResource,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Último Recurso",
+    )
+    last_position = models.FloatField(
+        null=True, blank=True, verbose_name="Última Posición"
+    )
+    last_activity_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Última Actividad"
+    )
     created_at = models.DateTimeField(
         auto_now_add=True, verbose_name="Fecha de Creación"
     )
@@ -278,6 +389,111 @@ class UserCourse(models.Model):
         unique_together = ["user", "course"]
         indexes = [
             models.Index(fields=["user", "course"]),
+            # Conteos por curso del listado de administración
+            models.Index(fields=["course", "completed"]),
+        ]
+
+
+class CourseReview(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="course_reviews",
+        verbose_name="Usuario",
+    )
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="reviews",
+        verbose_name="Curso",
+    )
+    score = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(5)],
+        verbose_name="Calificación",
+    )
+    comment = models.TextField(blank=True, verbose_name="Comentario")
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Fecha de Creación"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Fecha de Actualización"
+    )
+
+    def __str__(self):
+        return f"{self.user.email} - {self.course.title} ({self.score}★)"
+
+    class Meta:
+        verbose_name = "Reseña de Curso"
+        verbose_name_plural = "Reseñas de Cursos"
+        unique_together = ["user", "course"]
+        indexes = [
+            models.Index(fields=["course", "-created_at"]),
+        ]
+
+
+class CourseRecommendation(models.Model):
+    """
+    "Los estudiantes también tomaron": cursos similares por co-inscripción.
+    Generado por el comando build_recommendations (cursos.recommendations).
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="recommendations",
+        verbose_name="Curso",
+    )
+    recommended = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Curso Recomendado",
+    )
+    score = models.FloatField(verbose_name="Similitud")
+    rank = models.PositiveSmallIntegerField(verbose_name="Posición")
+
+    def __str__(self):
+        return f"{self.course_id} → {self.recommended_id} ({self.score:.3f})"
+
+    class Meta:
+        verbose_name = "Recomendación de Curso"
+        verbose_name_plural = "Recomendaciones de Cursos"
+        unique_together = ["course", "recommended"]
+        indexes = [
+            models.Index(fields=["course", "rank"]),
+        ]
+
+
+class UserRecommendation(models.Model):
+    """Cursos recomendados a un usuario, excluyendo los que ya posee."""
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="course_recommendations",
+        verbose_name="Usuario",
+    )
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Curso",
+    )
+    score = models.FloatField(verbose_name="Puntaje")
+    rank = models.PositiveSmallIntegerField(verbose_name="Posición")
+
+    def __str__(self):
+        return f"{self.user_id} → {self.course_id} ({self.score:.3f})"
+
+    class Meta:
+        verbose_name = "Recomendación para Usuario"
+        verbose_name_plural = "Recomendaciones para Usuarios"
+        unique_together = ["user", "course"]
+        indexes = [
+            models.Index(fields=["user", "rank"]),
         ]
 
 
@@ -315,12 +531,16 @@ class DiscountCode(models.Model):
             raise ValidationError("No se pueden aplicar descuentos a cursos gratuitos.")
 
     def save(self, *args, **kwargs):
-        self.code = self.code.upper()
+        self.code = self.code.strip().upper()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.code} ({self.discount_percentage}%) para {self.course.title}"
 
+    def applies_to(self, item):
+        """Indica si el código descuenta el ítem de carrito ``item``."""
+        return item.item_type == "course" and item.course_id == self.course_id
+
     class Meta:
         verbose_name = "Código de Descuento"
         verbose_name_plural = "Códigos de Descuento"
@@ -330,4 +550,243 @@ class DiscountCode(models.Model):
         ]
 
 
+class CoursePrice(models.Model):
+    """
+    Libro de precios: precio final precalculado de un curso para cada plan de
+    membresía y código de descuento (``None`` = sin plan / sin código).
+    Se mantiene desde cursos.pricing; no editar manualmente.
+    """
 
+    id = models.BigAutoField(primary_key=True)
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="prices", verbose_name="Curso"
+    )
+    membership_plan = models.ForeignKey(
+        "membresias.MembershipPlan",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="course_prices",
+        verbose_name="Plan de Membresía",
+    )
+    discount_code = models.ForeignKey(
+        DiscountCode,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="course_prices",
+        verbose_name="Código de Descuento",
+    )
+    discount_percentage = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=0.00,
+        verbose_name="Descuento Aplicado (%)",
+    )
+    final_price = models.IntegerField(default=0, verbose_name="Precio Final (CLP)")
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Fecha de Actualización"
+    )
+
+    def __str__(self):
+        return f"{self.course_id} / {self.membership_plan_id} / {self.discount_code_id}: {self.final_price}"
+
+    class Meta:
+        verbose_name = "Precio de Curso"
+        verbose_name_plural = "Libro de Precios"
+        indexes = [
+            models.Index(fields=["course", "membership_plan", "discount_code"]),
+            models.Index(fields=["membership_plan", "discount_code"]),
+        ]
+
+
+class PlanCourseAccess(models.Model):
+    """
+    Tabla desnormalizada "qué cursos ve cada plan": una fila por curso
+    disponible incluido en el plan o reclamable como recompensa.
+    Se mantiene desde cursos.plan_access; no editar manualmente.
+    """
+
+    ACCESS_INCLUDED = "included"
+    ACCESS_REWARD = "reward"
+    ACCESS_KIND_CHOICES = [
+        (ACCESS_INCLUDED, "Incluido en el plan"),
+        (ACCESS_REWARD, "Recompensa"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    plan = models.ForeignKey(
+        "membresias.MembershipPlan",
+        on_delete=models.CASCADE,
+        related_name="course_access",
+        verbose_name="Plan de Membresía",
+    )
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="plan_access",
+        verbose_name="Curso",
+    )
+    access_kind = models.CharField(
+        max_length=10, choices=ACCESS_KIND_CHOICES, verbose_name="Tipo de Acceso"
+    )
+
+    def __str__(self):
+        return f"{self.plan_id} / {self.course_id}: {self.access_kind}"
+
+    class Meta:
+        verbose_name = "Acceso de Plan a Curso"
+        verbose_name_plural = "Accesos de Planes a Cursos"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["plan", "access_kind", "course"], name="unique_plan_course_access"
+            ),
+        ]
+
+
+class DiscountCampaign(models.Model):
+    """
+    Código de campaña: descuenta varios cursos y/o planes durante una ventana
+    de vigencia, con cupo global y por usuario (ver cursos.discounts).
+    Sin cursos ni planes asignados, aplica a todo el carrito.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100, verbose_name="Nombre")
+    code = models.CharField(
+        max_length=50, unique=True, verbose_name="Código de Descuento",
+        help_text="Se guarda en mayúsculas",
+    )
+    discount_percentage = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        verbose_name="Porcentaje de Descuento (%)",
+    )
+    courses = models.ManyToManyField(
+        Course, blank=True, related_name="discount_campaigns", verbose_name="Cursos"
+    )
+    membership_plans = models.ManyToManyField(
+        "membresias.MembershipPlan",
+        blank=True,
+        related_name="discount_campaigns",
+        verbose_name="Planes de Membresía",
+    )
+    starts_at = models.DateTimeField(verbose_name="Inicio de Vigencia")
+    ends_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin de Vigencia")
+    max_redemptions = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name="Usos Máximos",
+        help_text="Vacío = sin límite",
+    )
+    max_redemptions_per_user = models.PositiveIntegerField(
+        default=1, verbose_name="Usos Máximos por Usuario"
+    )
+    redemption_count = models.PositiveIntegerField(default=0, verbose_name="Usos")
+    is_active = models.BooleanField(default=True, verbose_name="Activa")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+
+    def clean(self):
+        if self.ends_at and self.starts_at and self.ends_at <= self.starts_at:
+            raise ValidationError("El fin de vigencia debe ser posterior al inicio.")
+        if self.code and DiscountCode.objects.filter(code=self.code.strip().upper()).exists():
+            raise ValidationError("Ya existe un código de descuento de curso con ese código.")
+
+    def save(self, *args, **kwargs):
+        self.code = self.code.strip().upper()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.code} ({self.discount_percentage}%) - {self.name}"
+
+    def applies_to(self, item):
+        """Indica si la campaña descuenta el ítem de carrito ``item``."""
+        course_ids, plan_ids = self.target_ids
+        if not course_ids and not plan_ids:
+            return True
+        if item.item_type == "course":
+            return item.course_id in course_ids
+        return item.membership_plan_id in plan_ids
+
+    @property
+    def target_ids(self):
+        """(IDs de cursos, IDs de planes) de la campaña, cargados una sola vez."""
+        if not hasattr(self, "_target_ids"):
+            self._target_ids = (
+                set(self.courses.values_list("id", flat=True)),
+                set(self.membership_plans.values_list("id", flat=True)),
+            )
+        return self._target_ids
+
+    class Meta:
+        verbose_name = "Campaña de Descuento"
+        verbose_name_plural = "Campañas de Descuento"
+        ordering = ["-starts_at"]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(max_redemptions__isnull=True)
+                | models.Q(redemption_count__lte=models.F("max_redemptions")),
+                name="discount_campaign_within_cap",
+            ),
+        ]
+
+
+class DiscountCampaignUsage(models.Model):
+    """Contador de usos de una campaña por usuario."""
+
+    id = models.BigAutoField(primary_key=True)
+    campaign = models.ForeignKey(
+        DiscountCampaign, on_delete=models.CASCADE, related_name="usages"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="discount_usages"
+    )
+    uses = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.campaign.code} / {self.user_id}: {self.uses}"
+
+    class Meta:
+        verbose_name = "Uso de Campaña por Usuario"
+        verbose_name_plural = "Usos de Campañas por Usuario"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["campaign", "user"], name="unique_discount_campaign_usage"
+            ),
+        ]
+
+
+class DiscountRedemption(models.Model):
+    """
+    Registro de cada canje de una campaña, con el pago en el que se aplicó.
+    ``released_at`` marca los canjes devueltos al cupo (pago fallido o cancelado).
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    campaign = models.ForeignKey(
+        DiscountCampaign, on_delete=models.CASCADE, related_name="redemptions",
+        verbose_name="Campaña",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="discount_redemptions",
+        verbose_name="Usuario",
+    )
+    payment = models.ForeignKey(
+        "pagos.Payment", null=True, blank=True, on_delete=models.SET_NULL,
+        related_name="discount_redemptions", verbose_name="Pago",
+    )
+    discount_amount = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Monto Descontado"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Canje")
+    released_at = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Liberación")
+
+    def __str__(self):
+        return f"{self.campaign.code} - {self.user_id} ({self.discount_amount})"
+
+    class Meta:
+        verbose_name = "Canje de Descuento"
+        verbose_name_plural = "Canjes de Descuento"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["campaign", "-created_at"]),
+        ]
@@ -0,0 +1,105 @@
+# cursos/plan_access.py
+"""
+Tabla materializada de accesos plan → curso (``PlanCourseAccess``).
+
+"Qué cursos ve el plan P" antes era un ``OR`` sobre el M2M
+``available_membership_plans`` más un ``~Q(..isnull=False)`` con
+``.distinct()`` (y otra subconsulta para recompensas), recalculado en cada
+página. Ahora es una búsqueda por el índice único ``(plan, access_kind,
+course)``, y los IDs resultantes se cachean por plan con la versión del
+catálogo en la clave: los mismos signals que invalidan el catálogo invalidan
+esta caché.
+
+- ``included``: curso que requiere membresía y lista el plan en
+  ``available_membership_plans`` (o no restringe planes).
+- ``reward``: curso disponible marcado como recompensa para el plan
+  (``reward_for_plans``).
+
+Los signals de ``cursos.signals`` reconstruyen las filas de cada curso al
+guardarlo o cambiar sus M2M; ``rebuild_plan_access`` reconstruye todo.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from membresias.models import MembershipPlan
+from .catalog import get_catalog_version
+from .models import Course, PlanCourseAccess
+
+PLAN_ACCESS_KEY = "cursos:plan-access:{version}:{plan_id}:{kind}"
+
+
+def _access_rows(course_ids=None):
+    courses = Course.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(id__in=course_ids)
+    courses = list(
+        courses.values("id", "membership_required", "is_membership_reward", "is_available")
+    )
+
+    ids = [course["id"] for course in courses]
+    restricted = {}
+    for course_id, plan_id in Course.available_membership_plans.through.objects.filter(
+        course_id__in=ids
+    ).values_list("course_id", "membershipplan_id"):
+        restricted.setdefault(course_id, []).append(plan_id)
+    rewards = {}
+    for course_id, plan_id in Course.reward_for_plans.through.objects.filter(
+        course_id__in=ids
+    ).values_list("course_id", "membershipplan_id"):
+        rewards.setdefault(course_id, []).append(plan_id)
+    all_plan_ids = list(MembershipPlan.objects.values_list("id", flat=True))
+
+    rows = []
+    for course in courses:
+        if course["membership_required"]:
+            # Sin planes asignados, el curso está incluido en todos
+            for plan_id in restricted.get(course["id"], all_plan_ids):
+                rows.append(
+                    PlanCourseAccess(
+                        plan_id=plan_id,
+                        course_id=course["id"],
+                        access_kind=PlanCourseAccess.ACCESS_INCLUDED,
+                    )
+                )
+        if course["is_membership_reward"] and course["is_available"]:
+            for plan_id in rewards.get(course["id"], []):
+                rows.append(
+                    PlanCourseAccess(
+                        plan_id=plan_id,
+                        course_id=course["id"],
+                        access_kind=PlanCourseAccess.ACCESS_REWARD,
+                    )
+                )
+    return rows
+
+
+def rebuild_plan_access(course_ids=None):
+    """
+    Reemplaza las filas de ``course_ids`` (o de todos los cursos).
+    Retorna la cantidad de filas escritas.
+    """
+    stale = PlanCourseAccess.objects.all()
+    if course_ids is not None:
+        course_ids = list(course_ids)
+        stale = stale.filter(course_id__in=course_ids)
+
+    with transaction.atomic():
+        rows = _access_rows(course_ids)
+        stale.delete()
+        PlanCourseAccess.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+def plan_course_ids(plan_id, kind=PlanCourseAccess.ACCESS_INCLUDED):
+    """IDs de los cursos a los que accede el plan, cacheados por versión del catálogo."""
+    key = PLAN_ACCESS_KEY.format(version=get_catalog_version(), plan_id=plan_id, kind=kind)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(
+            PlanCourseAccess.objects.filter(plan_id=plan_id, access_kind=kind).values_list(
+                "course_id", flat=True
+            )
+        )
+        cache.set(key, course_ids, settings.CATALOG_CACHE_TIMEOUT)
+    return course_ids
@@ -0,0 +1,127 @@
+# cursos/pricing.py
+"""
+Libro de precios de cursos.
+
+Precalcula en ``CoursePrice`` el precio final de cada curso para cada plan de
+membresía y cada código de descuento, aplicando el mayor descuento disponible
+(especial del curso, del plan o del código). Los catálogos, el carrito y el
+detalle leen los precios en bloque en vez de recalcularlos por ítem.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+from membresias.models import MembershipPlan
+from .models import Course, CoursePrice, DiscountCode
+
+
+def compute_price(course, plan=None, discount_code=None):
+    """Retorna (porcentaje_descuento, precio_final) sin consultar la base de datos."""
+    if course.is_free:
+        return Decimal("0.00"), 0
+
+    percentages = [Decimal(course.special_discount_percentage or 0)]
+    if plan is not None:
+        percentages.append(Decimal(plan.discount_percentage or 0))
+    if discount_code is not None:
+        percentages.append(Decimal(discount_code.discount_percentage or 0))
+
+    discount_percentage = max(percentages)
+    discount_amount = (course.base_price * discount_percentage) / 100
+    return discount_percentage, int(course.base_price - discount_amount)
+
+
+def rebuild_price_book(course_ids=None, plan_ids=None):
+    """
+    Reconstruye las filas del libro de precios afectadas por un cambio.
+
+    - ``course_ids``: recalcula todos los precios de esos cursos.
+    - ``plan_ids``: recalcula los precios de esos planes para todos los cursos.
+    - Sin argumentos: reconstruye el libro completo.
+    """
+    courses = Course.objects.only(
+        "id", "base_price", "is_free", "special_discount_percentage"
+    )
+    plans = list(MembershipPlan.objects.only("id", "discount_percentage"))
+    stale = CoursePrice.objects.all()
+
+    if course_ids is not None:
+        courses = courses.filter(id__in=course_ids)
+        stale = stale.filter(course_id__in=course_ids)
+        plan_options = [None] + plans
+    elif plan_ids is not None:
+        plan_ids = set(plan_ids)
+        plans = [plan for plan in plans if plan.id in plan_ids]
+        stale = stale.filter(membership_plan_id__in=plan_ids)
+        plan_options = plans
+    else:
+        plan_options = [None] + plans
+
+    courses = list(courses)
+    codes_by_course = {}
+    for code in DiscountCode.objects.filter(course__in=courses).only(
+        "id", "course_id", "discount_percentage"
+    ):
+        codes_by_course.setdefault(code.course_id, []).append(code)
+
+    rows = []
+    for course in courses:
+        for plan in plan_options:
+            for code in [None] + codes_by_course.get(course.id, []):
+                discount_percentage, final_price = compute_price(course, plan, code)
+                rows.append(
+                    CoursePrice(
+                        course_id=course.id,
+                        membership_plan_id=plan.id if plan else None,
+                        discount_code_id=code.id if code else None,
+                        discount_percentage=discount_percentage,
+                        final_price=final_price,
+                    )
+                )
+
+    with transaction.atomic():
+        stale.delete()
+        CoursePrice.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def get_prices(courses, plan=None, discount_code=None):
+    """
+    Retorna {course_id: (porcentaje_descuento, precio_final)} para varios cursos
+    con una sola consulta.
+
+    ``plan`` es un MembershipPlan (o None) y ``discount_code`` el texto del
+    código ingresado (o None). Si se indica un código, solo aparecen los cursos
+    para los que ese código es válido.
+    """
+    courses = list(courses)
+    rows = CoursePrice.objects.filter(
+        course_id__in=[course.id for course in courses],
+        membership_plan_id=plan.id if plan else None,
+    )
+    if discount_code:
+        rows = rows.filter(discount_code__code=discount_code.strip().upper())
+    else:
+        rows = rows.filter(discount_code__isnull=True)
+
+    prices = {
+        course_id: (discount_percentage, final_price)
+        for course_id, discount_percentage, final_price in rows.values_list(
+            "course_id", "discount_percentage", "final_price"
+        )
+    }
+
+    if not discount_code:
+        # Cursos aún sin filas en el libro (p. ej. antes del primer rebuild)
+        for course in courses:
+            if course.id not in prices:
+                prices[course.id] = compute_price(course, plan)
+    return prices
+
+
+def get_price(course, plan=None, discount_code=None):
+    """
+    Retorna (porcentaje_descuento, precio_final) de un curso, o None si el
+    código de descuento indicado no es válido para el curso.
+    """
+    return get_prices([course], plan, discount_code).get(course.id)
@@ -0,0 +1,198 @@
+# cursos/progress.py
+"""
+Registro de progreso con escritura diferida (write-behind).
+
+Los heartbeats de progreso (recurso, posición y porcentaje) se acumulan en un
+buffer en memoria del proceso, conservando solo el último evento por
+(usuario, curso). El buffer se vuelca a ``UserCourse`` con un único
+``bulk_update`` cada ``PROGRESS_FLUSH_INTERVAL`` segundos o al alcanzar
+``PROGRESS_BUFFER_MAX_SIZE`` entradas, en vez de una actualización por
+heartbeat.
+
+Un hilo en segundo plano vuelca el buffer por tiempo aunque no lleguen más
+heartbeats al proceso, así que un worker inactivo pierde como máximo un
+intervalo si muere sin pasar por ``atexit`` (SIGKILL). Si la escritura
+falla, los eventos vuelven al buffer y se reintentan en el siguiente volcado.
+
+El progreso se guarda solo en filas ``UserCourse`` existentes. Los usuarios
+que ven un curso gratuito o incluido en su membresía sin haberlo comprado ni
+reclamado no tienen esa fila, y el volcado no la crea: ``UserCourse`` también
+otorga el acceso al curso (``cursos.entitlements``). Sus eventos se descartan
+y cada volcado registra cuántos descartó.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import CourseResource, UserCourse
+
+logger = logging.getLogger(__name__)
+
+UPDATE_FIELDS = [
+    "progress",
+    "completed",
+    "last_resource",
+    "last_position",
+    "last_activity_at",
+]
+
+
+class ProgressBuffer:
+    """Buffer de eventos de progreso, seguro entre hilos del mismo proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def __len__(self):
+        return len(self._events)
+
+    def record(self, user_id, course_id, resource_id=None, position=None, percent=None):
+        """Guarda un heartbeat y vuelca el buffer si corresponde."""
+        now = timezone.now()
+        with self._lock:
+            event = self._events.get((user_id, course_id))
+            if event is None:
+                event = self._events[(user_id, course_id)] = {"percent": 0.0}
+            if percent is not None:
+                # El progreso nunca retrocede dentro de una ventana
+                event["percent"] = max(event["percent"], percent)
+            if resource_id is not None:
+                event["resource_id"] = resource_id
+                event["position"] = position
+            event["at"] = now
+            self._ensure_timer()
+
+            due = (
+                time.monotonic() - self._last_flush >= settings.PROGRESS_FLUSH_INTERVAL
+                or len(self._events) >= settings.PROGRESS_BUFFER_MAX_SIZE
+            )
+        if due:
+            try:
+                self.flush()
+            except Exception:
+                # Un fallo de escritura no debe romper el heartbeat del alumno
+                logger.exception("Error al volcar el buffer de progreso")
+
+    def _ensure_timer(self):
+        # Se inicia con el primer heartbeat, ya dentro del worker (después del fork)
+        if self._timer is None or not self._timer.is_alive():
+            self._timer = threading.Thread(
+                target=self._run_timer, name="progress-flush", daemon=True
+            )
+            self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(settings.PROGRESS_FLUSH_INTERVAL)
+            if not self._events:
+                continue
+            if time.monotonic() - self._last_flush < settings.PROGRESS_FLUSH_INTERVAL:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error al volcar el buffer de progreso")
+            finally:
+                # Sin conexión ociosa abierta entre volcados
+                connection.close()
+
+    def _drain(self):
+        with self._lock:
+            events, self._events = self._events, {}
+            self._last_flush = time.monotonic()
+        return events
+
+    def _restore(self, events):
+        """Devuelve al buffer eventos no escritos, combinándolos con los nuevos."""
+        with self._lock:
+            for key, old in events.items():
+                new = self._events.get(key)
+                if new is None:
+                    self._events[key] = old
+                    continue
+                new["percent"] = max(new["percent"], old["percent"])
+                if "resource_id" not in new and "resource_id" in old:
+                    new["resource_id"] = old["resource_id"]
+                    new["position"] = old["position"]
+
+    def flush(self):
+        """Escribe los eventos acumulados en UserCourse. Retorna filas actualizadas."""
+        events = self._drain()
+        if not events:
+            return 0
+        try:
+            return self._write(events)
+        except Exception:
+            self._restore(events)
+            raise
+
+    def _write(self, events):
+        user_ids = {user_id for user_id, _course_id in events}
+        course_ids = {course_id for _user_id, course_id in events}
+        user_courses = UserCourse.objects.filter(
+            user_id__in=user_ids, course_id__in=course_ids
+        ).only("id", "user_id", "course_id", "last_resource_id", "last_position")
+
+        # Solo se aceptan recursos que pertenecen al curso reportado
+        resource_ids = {
+            event["resource_id"] for event in events.values() if event.get("resource_id")
+        }
+        resource_course = dict(
+            CourseResource.objects.filter(id__in=resource_ids).values_list("id", "course_id")
+        )
+
+        rows = []
+        for user_course in user_courses:
+            event = events.get((user_course.user_id, user_course.course_id))
+            if event is None:
+                continue
+            # Expresiones evaluadas en la base de datos: el progreso nunca
+            # retrocede aunque otro proceso haya escrito entre medio
+            user_course.progress = Greatest(
+                F("progress"), Value(event["percent"], output_field=FloatField())
+            )
+            user_course.completed = (
+                Value(True) if event["percent"] >= 100 else F("completed")
+            )
+            resource_id = event.get("resource_id")
+            if resource_id and resource_course.get(resource_id) == user_course.course_id:
+                user_course.last_resource_id = resource_id
+                user_course.last_position = event["position"]
+            user_course.last_activity_at = event["at"]
+            rows.append(user_course)
+
+        UserCourse.objects.bulk_update(rows, UPDATE_FIELDS, batch_size=500)
+        if len(rows) < len(events):
+            logger.info(
+                "Progreso descartado: %d eventos sin UserCourse (acceso gratuito o por membresía)",
+                len(events) - len(rows),
+            )
+        return len(rows)
+
+
+progress_buffer = ProgressBuffer()
+
+
+def record_progress(user_id, course_id, resource_id=None, position=None, percent=None):
+    """Encola un heartbeat de progreso en el buffer del proceso."""
+    progress_buffer.record(user_id, course_id, resource_id, position, percent)
+
+
+@atexit.register
+def _flush_on_exit():
+    # Al apagar el worker, no perder la última ventana de heartbeats
+    try:
+        close_old_connections()
+        progress_buffer.flush()
+    except Exception:
+        logger.exception("No se pudo volcar el buffer de progreso al salir")
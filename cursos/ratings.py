@@ -0,0 +1,112 @@
+# cursos/ratings.py
+"""
+Agregados incrementales de calificaciones de cursos.
+
+Cada alta, edición o baja de una ``CourseReview`` ajusta en ``Course`` el
+conteo, la suma y el histograma con expresiones ``F()`` atómicas, y luego
+recalcula ``rating`` (promedio bayesiano) desde esas columnas. Ordenar el
+catálogo por calificación nunca necesita un ``GROUP BY`` sobre las reseñas;
+``repair_course_ratings`` corrige cualquier desviación.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+
+from .models import Course, CourseReview
+
+SCORES = range(1, 6)
+
+
+def bayesian_rating_expression():
+    """
+    Expresión SQL del promedio bayesiano a partir de las columnas agregadas:
+    (C * m + suma) / (C + cantidad), o 0 si el curso no tiene reseñas.
+    """
+    weight = float(settings.COURSE_RATING_PRIOR_WEIGHT)
+    mean = float(settings.COURSE_RATING_PRIOR_MEAN)
+    return Case(
+        When(rating_count=0, then=Value(0.0)),
+        default=(
+            (Value(weight * mean) + Cast("rating_sum", FloatField()))
+            / (Value(weight) + Cast("rating_count", FloatField()))
+        ),
+        output_field=FloatField(),
+    )
+
+
+def apply_review_change(course_id, old_score=None, new_score=None):
+    """
+    Ajusta los agregados de un curso por una reseña creada (solo
+    ``new_score``), eliminada (solo ``old_score``) o editada (ambos).
+    """
+    if old_score == new_score:
+        return
+
+    updates = {}
+    count_delta = (new_score is not None) - (old_score is not None)
+    sum_delta = (new_score or 0) - (old_score or 0)
+    if count_delta:
+        updates["rating_count"] = F("rating_count") + count_delta
+    if sum_delta:
+        updates["rating_sum"] = F("rating_sum") + sum_delta
+    if old_score is not None:
+        updates[f"rating_{old_score}"] = F(f"rating_{old_score}") - 1
+    if new_score is not None:
+        updates[f"rating_{new_score}"] = F(f"rating_{new_score}") + 1
+
+    courses = Course.objects.filter(pk=course_id)
+    with transaction.atomic():
+        # El primer UPDATE bloquea la fila; el segundo ya ve los agregados nuevos
+        courses.update(**updates)
+        courses.update(rating=bayesian_rating_expression())
+
+
+def repair_ratings(course_ids=None):
+    """
+    Recalcula los agregados desde las reseñas y corrige los cursos desviados.
+    Retorna la cantidad de cursos corregidos.
+    """
+    aggregates = {
+        "count": Count("id"),
+        "total": Sum("score"),
+    }
+    for score in SCORES:
+        aggregates[f"r{score}"] = Count("id", filter=Q(score=score))
+
+    reviews = CourseReview.objects.all()
+    courses = Course.objects.only(
+        "id", "rating_count", "rating_sum", *[f"rating_{score}" for score in SCORES]
+    )
+    if course_ids is not None:
+        reviews = reviews.filter(course_id__in=course_ids)
+        courses = courses.filter(id__in=course_ids)
+
+    actual = {
+        row["course"]: row
+        for row in reviews.values("course").annotate(**aggregates).order_by()
+    }
+
+    fields = ["rating_count", "rating_sum"] + [f"rating_{score}" for score in SCORES]
+    drifted = []
+    for course in courses.iterator(chunk_size=1000):
+        row = actual.get(course.id, {})
+        expected = {
+            "rating_count": row.get("count", 0),
+            "rating_sum": row.get("total") or 0,
+        }
+        for score in SCORES:
+            expected[f"rating_{score}"] = row.get(f"r{score}", 0)
+        if any(getattr(course, field) != value for field, value in expected.items()):
+            for field, value in expected.items():
+                setattr(course, field, value)
+            drifted.append(course)
+
+    with transaction.atomic():
+        Course.objects.bulk_update(drifted, fields, batch_size=500)
+        # El promedio también depende de la configuración del prior
+        target = Course.objects.all()
+        if course_ids is not None:
+            target = target.filter(id__in=course_ids)
+        target.update(rating=bayesian_rating_expression())
+    return len(drifted)
@@ -0,0 +1,147 @@
+# cursos/recommendations.py
+"""
+Recomendaciones "los estudiantes también tomaron" por co-inscripción.
+
+Proceso offline (comando ``build_recommendations``):
+
+1. Se arma una matriz dispersa usuarios × cursos con las compras
+   (``UserCourse``) y los cursos de bienvenida reclamados por membresía.
+2. La co-ocurrencia cursos × cursos es ``Xᵀ·X``; se normaliza con similitud
+   coseno para no favorecer solo a los cursos más populares.
+3. Se guardan los top-k similares de cada curso en ``CourseRecommendation``
+   y los top-k de cada usuario (``X·S`` sin los cursos que ya posee) en
+   ``UserRecommendation``.
+
+Las vistas leen las recomendaciones ya calculadas con una consulta indexada.
+"""
+import numpy as np
+from scipy import sparse
+
+from django.db import transaction
+
+from membresias.models import Membership
+from .models import Course, CourseRecommendation, UserCourse, UserRecommendation
+
+# Usuarios procesados por bloque al calcular recomendaciones personales
+USER_CHUNK_SIZE = 5000
+
+
+def load_enrollments():
+    """Pares (user_id, course_id) de compras y cursos reclamados como recompensa."""
+    pairs = set(UserCourse.objects.values_list("user_id", "course_id").iterator())
+    claimed = Membership.welcome_courses_claimed.through.objects.values_list(
+        "membership__user_id", "course_id"
+    )
+    pairs.update(claimed.iterator())
+    return pairs
+
+
+def build_enrollment_matrix(pairs):
+    """Retorna (X binaria usuarios × cursos en CSR, user_ids, course_ids)."""
+    user_ids = np.array(sorted({user_id for user_id, _course_id in pairs}), dtype=np.int64)
+    course_ids = np.array(sorted({course_id for _user_id, course_id in pairs}), dtype=np.int64)
+    if not len(pairs):
+        return sparse.csr_matrix((0, 0)), user_ids, course_ids
+
+    users, courses = np.array(list(pairs), dtype=np.int64).T
+    rows = np.searchsorted(user_ids, users)
+    cols = np.searchsorted(course_ids, courses)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(user_ids), len(course_ids)),
+    )
+    return matrix, user_ids, course_ids
+
+
+def course_similarity(matrix, min_common=1):
+    """
+    Similitud coseno entre cursos a partir de la co-ocurrencia ``Xᵀ·X``.
+    Se descartan pares con menos de ``min_common`` estudiantes en común.
+    """
+    cooccurrence = (matrix.T @ matrix).tocsr()
+    enrollments = cooccurrence.diagonal()
+    cooccurrence.setdiag(0)
+    if min_common > 1:
+        cooccurrence.data[cooccurrence.data < min_common] = 0
+    cooccurrence.eliminate_zeros()
+
+    with np.errstate(divide="ignore"):
+        inverse_norm = np.where(enrollments > 0, 1.0 / np.sqrt(enrollments), 0.0)
+    norm = sparse.diags(inverse_norm.astype(np.float32))
+    return (norm @ cooccurrence @ norm).tocsr()
+
+
+def top_k_per_row(scores, k, allowed, exclude=None):
+    """
+    Genera (fila, columnas, puntajes) con los ``k`` mayores puntajes de cada
+    fila de una matriz CSR, considerando solo columnas con ``allowed[col]`` y
+    omitiendo las columnas de ``exclude`` (otra matriz CSR con igual forma).
+    """
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        cols = scores.indices[start:end]
+        values = scores.data[start:end]
+
+        keep = allowed[cols] & (values > 0)
+        if exclude is not None:
+            owned = exclude.indices[exclude.indptr[row]:exclude.indptr[row + 1]]
+            keep &= ~np.isin(cols, owned)
+        cols, values = cols[keep], values[keep]
+        if not len(cols):
+            continue
+
+        if len(cols) > k:
+            best = np.argpartition(-values, k - 1)[:k]
+            cols, values = cols[best], values[best]
+        order = np.lexsort((cols, -values))
+        yield row, cols[order], values[order]
+
+
+def build_recommendations(top_k=10, user_top_k=10, min_common=1):
+    """
+    Recalcula y reemplaza todas las recomendaciones.
+    Retorna (filas CourseRecommendation, filas UserRecommendation).
+    """
+    matrix, user_ids, course_ids = build_enrollment_matrix(load_enrollments())
+
+    available_ids = set(
+        Course.objects.filter(is_available=True).values_list("id", flat=True)
+    )
+    allowed = np.array([course_id in available_ids for course_id in course_ids], dtype=bool)
+
+    course_rows = []
+    user_rows = []
+    if len(course_ids):
+        similarity = course_similarity(matrix, min_common)
+
+        for row, cols, values in top_k_per_row(similarity, top_k, allowed):
+            course_rows.extend(
+                CourseRecommendation(
+                    course_id=int(course_ids[row]),
+                    recommended_id=int(course_ids[col]),
+                    score=float(value),
+                    rank=rank,
+                )
+                for rank, (col, value) in enumerate(zip(cols, values), start=1)
+            )
+
+        for start in range(0, len(user_ids), USER_CHUNK_SIZE):
+            owned = matrix[start:start + USER_CHUNK_SIZE]
+            user_scores = (owned @ similarity).tocsr()
+            for row, cols, values in top_k_per_row(user_scores, user_top_k, allowed, owned):
+                user_rows.extend(
+                    UserRecommendation(
+                        user_id=int(user_ids[start + row]),
+                        course_id=int(course_ids[col]),
+                        score=float(value),
+                        rank=rank,
+                    )
+                    for rank, (col, value) in enumerate(zip(cols, values), start=1)
+                )
+
+    with transaction.atomic():
+        CourseRecommendation.objects.all().delete()
+        UserRecommendation.objects.all().delete()
+        CourseRecommendation.objects.bulk_create(course_rows, batch_size=1000)
+        UserRecommendation.objects.bulk_create(user_rows, batch_size=1000)
+    return len(course_rows), len(user_rows)
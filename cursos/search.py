@@ -0,0 +1,157 @@
+# cursos/search.py
+"""
+Búsqueda full-text del catálogo de cursos con facetas.
+
+El texto indexado de cada curso (título, descripción, categoría y etiquetas)
+se guarda en ``Course.search_vector`` con un índice GIN. Los conteos de las
+facetas se calculan en una única consulta de agregación.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import Count, F, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+from .catalog import get_catalog_snapshot
+from .models import Category, Course, Tag
+
+# Configuración de text search de PostgreSQL (stemming en español)
+SEARCH_CONFIG = "spanish"
+
+# Tramos de precio para la faceta (clave, etiqueta, mínimo, máximo inclusive)
+PRICE_BUCKETS = [
+    ("gratis", "Gratis", 0, 0),
+    ("hasta_20000", "Hasta $20.000", 1, 20000),
+    ("20000_50000", "$20.001 - $50.000", 20001, 50000),
+    ("mas_50000", "Más de $50.000", 50001, None),
+]
+
+
+def _price_bucket_q(minimum, maximum):
+    q = Q(base_price__gte=minimum)
+    if maximum is not None:
+        q &= Q(base_price__lte=maximum)
+    return q
+
+
+def update_search_vectors(course_ids):
+    """
+    Recalcula el vector de búsqueda de los cursos indicados con un solo UPDATE.
+
+    ``course_ids`` puede ser una lista de IDs o un queryset ``values("id")``.
+    """
+    category_name = Category.objects.filter(pk=OuterRef("category_id")).values("name")
+    tag_names = (
+        Tag.objects.filter(courses=OuterRef("pk"))
+        .values("courses")
+        .annotate(names=StringAgg("name", delimiter=" "))
+        .values("names")
+    )
+    vector = (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(category_name), weight="C", config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(Subquery(tag_names), Value(""), output_field=TextField()),
+            weight="C",
+            config=SEARCH_CONFIG,
+        )
+    )
+    return Course.objects.filter(pk__in=course_ids).update(search_vector=vector)
+
+
+def get_facet_counts(queryset):
+    """
+    Cuenta los cursos del queryset por categoría, etiqueta, gratuito/pago,
+    membresía requerida y tramo de precio, todo en una sola consulta.
+    """
+    catalog = get_catalog_snapshot()
+    categories = catalog["categories"]
+    tags = catalog["tags"]
+
+    aggregates = {
+        "free": Count("id", filter=Q(is_free=True), distinct=True),
+        "paid": Count("id", filter=Q(is_free=False), distinct=True),
+        "membership": Count("id", filter=Q(membership_required=True), distinct=True),
+        "no_membership": Count("id", filter=Q(membership_required=False), distinct=True),
+    }
+    for category in categories:
+        aggregates[f"category_{category.id}"] = Count(
+            "id", filter=Q(category_id=category.id), distinct=True
+        )
+    for tag in tags:
+        aggregates[f"tag_{tag.id}"] = Count("id", filter=Q(tags__id=tag.id), distinct=True)
+    for key, _label, minimum, maximum in PRICE_BUCKETS:
+        aggregates[f"price_{key}"] = Count(
+            "id", filter=_price_bucket_q(minimum, maximum), distinct=True
+        )
+
+    # Aislar los filtros del queryset en un subquery para que sus joins no
+    # restrinjan los conteos por etiqueta
+    counts = Course.objects.filter(pk__in=queryset.values("pk")).aggregate(**aggregates)
+
+    return {
+        "category": [
+            {"id": category.id, "name": category.name, "count": counts[f"category_{category.id}"]}
+            for category in categories
+            if counts[f"category_{category.id}"]
+        ],
+        "tag": [
+            {"id": tag.id, "name": tag.name, "count": counts[f"tag_{tag.id}"]}
+            for tag in tags
+            if counts[f"tag_{tag.id}"]
+        ],
+        "is_free": {"true": counts["free"], "false": counts["paid"]},
+        "membership_required": {
+            "true": counts["membership"],
+            "false": counts["no_membership"],
+        },
+        "price_bucket": [
+            {"key": key, "label": label, "count": counts[f"price_{key}"]}
+            for key, label, _minimum, _maximum in PRICE_BUCKETS
+        ],
+    }
+
+
+def search_courses(query="", category=None, tag=None, is_free=None,
+                   membership_required=None, price_bucket=None, sort=None):
+    """
+    Busca cursos disponibles y retorna una tupla (resultados, facetas).
+
+    Los resultados vienen ordenados por relevancia cuando hay texto de
+    búsqueda (o por calificación con ``sort="rating"``); las facetas cuentan
+    los cursos que cumplen todos los filtros.
+    """
+    matched = Course.objects.filter(is_available=True)
+
+    search_query = None
+    if query:
+        search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+        matched = matched.filter(search_vector=search_query)
+
+    if category:
+        matched = matched.filter(category_id=category)
+    if tag:
+        matched = matched.filter(tags__id=tag)
+    if is_free is not None:
+        matched = matched.filter(is_free=is_free)
+    if membership_required is not None:
+        matched = matched.filter(membership_required=membership_required)
+    if price_bucket:
+        for key, _label, minimum, maximum in PRICE_BUCKETS:
+            if key == price_bucket:
+                matched = matched.filter(_price_bucket_q(minimum, maximum))
+                break
+
+    facets = get_facet_counts(matched)
+
+    results = matched.select_related("category").prefetch_related("tags")
+    if sort == "rating":
+        results = results.order_by("-rating", "id")
+    elif search_query is not None:
+        results = results.annotate(
+            rank=SearchRank(F("search_vector"), search_query)
+        ).order_by("-rank", "id")
+    else:
+        results = results.order_by("id")
+
+    return results, facets
@@ -0,0 +1,175 @@
+# cursos/signals.py
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from membresias.models import MembershipPlan
+from .catalog import bump_catalog_version, bump_ratings_version
+from .discounts import forget_code, release_redemptions
+from .models import Category, Course, CourseReview, DiscountCampaign, DiscountCode, Tag
+from .plan_access import rebuild_plan_access
+from .pricing import rebuild_price_book
+from .ratings import apply_review_change
+from .search import update_search_vectors
+
+RELEASED_PAYMENT_STATUSES = ("failed", "cancelled", "rejected", "timeout", "nullified", "error")
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=MembershipPlan)
+@receiver(post_delete, sender=MembershipPlan)
+def invalidate_catalog(sender, **kwargs):
+    """Invalida la caché del catálogo cuando cambia un curso, categoría, etiqueta o plan."""
+    # Esperar al commit para que nadie reconstruya la instantánea con datos sin confirmar
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(m2m_changed, sender=Course.tags.through)
+@receiver(m2m_changed, sender=Course.available_membership_plans.through)
+@receiver(m2m_changed, sender=Course.reward_for_plans.through)
+def invalidate_catalog_relations(sender, action, **kwargs):
+    """Invalida la caché del catálogo cuando cambian las relaciones de un curso."""
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Course)
+def update_course_search_vector(sender, instance, **kwargs):
+    """Mantiene actualizado el vector de búsqueda al guardar un curso."""
+    update_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def update_category_search_vectors(sender, instance, created, **kwargs):
+    """Reindexa los cursos de una categoría cuando esta cambia."""
+    if not created:
+        update_search_vectors(instance.courses.values("id"))
+
+
+@receiver(post_save, sender=Tag)
+def update_tag_search_vectors(sender, instance, created, **kwargs):
+    """Reindexa los cursos de una etiqueta cuando esta cambia."""
+    if not created:
+        update_search_vectors(instance.courses.values("id"))
+
+
+@receiver(m2m_changed, sender=Course.tags.through)
+def update_tagged_search_vectors(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindexa los cursos cuyas etiquetas cambiaron."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        update_search_vectors([instance.pk])
+    elif pk_set:
+        update_search_vectors(list(pk_set))
+
+
+@receiver(post_save, sender=Course)
+def rebuild_course_prices(sender, instance, **kwargs):
+    """Recalcula el libro de precios del curso guardado."""
+    rebuild_price_book(course_ids=[instance.pk])
+
+
+@receiver(post_save, sender=DiscountCode)
+@receiver(post_delete, sender=DiscountCode)
+def rebuild_discount_code_prices(sender, instance, **kwargs):
+    """Recalcula los precios del curso al que pertenece el código de descuento."""
+    if Course.objects.filter(pk=instance.course_id).exists():
+        rebuild_price_book(course_ids=[instance.course_id])
+
+
+@receiver(post_save, sender=DiscountCode)
+@receiver(post_save, sender=DiscountCampaign)
+def forget_missing_discount_code(sender, instance, **kwargs):
+    """Un código recién creado o renombrado deja de estar cacheado como inexistente."""
+    forget_code(instance.code)
+
+
+@receiver(post_save, sender="pagos.Payment")
+def release_failed_payment_redemptions(sender, instance, **kwargs):
+    """Devuelve al cupo de la campaña los canjes de un pago fallido, cancelado o vencido."""
+    if instance.payment_type == "cart" and instance.status in RELEASED_PAYMENT_STATUSES:
+        release_redemptions(instance)
+
+
+@receiver(post_save, sender=MembershipPlan)
+def rebuild_plan_prices(sender, instance, **kwargs):
+    """Recalcula los precios de todos los cursos para el plan guardado."""
+    rebuild_price_book(plan_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Course)
+def rebuild_course_plan_access(sender, instance, **kwargs):
+    """Recalcula los accesos por plan del curso guardado."""
+    rebuild_plan_access([instance.pk])
+
+
+@receiver(m2m_changed, sender=Course.available_membership_plans.through)
+@receiver(m2m_changed, sender=Course.reward_for_plans.through)
+def rebuild_plan_access_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    """Recalcula los accesos cuando cambian los planes de un curso (o los cursos de un plan)."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        rebuild_plan_access([instance.pk])
+    elif pk_set:
+        rebuild_plan_access(pk_set)
+    elif action == "post_clear":
+        # plan.<relación>.clear() no informa qué cursos se quitaron
+        rebuild_plan_access()
+
+
+@receiver(post_save, sender=MembershipPlan)
+def add_plan_to_unrestricted_courses(sender, instance, created, **kwargs):
+    """Un plan nuevo accede a los cursos de membresía que no restringen planes."""
+    if created:
+        rebuild_plan_access(
+            Course.objects.filter(
+                membership_required=True, available_membership_plans__isnull=True
+            ).values_list("id", flat=True)
+        )
+
+
+@receiver(pre_save, sender=CourseReview)
+def remember_previous_review(sender, instance, **kwargs):
+    """Guarda la calificación y curso previos para ajustar los agregados."""
+    instance._previous = None
+    if instance.pk:
+        instance._previous = (
+            CourseReview.objects.filter(pk=instance.pk)
+            .values_list("course_id", "score")
+            .first()
+        )
+
+
+@receiver(post_save, sender=CourseReview)
+def update_ratings_on_review_save(sender, instance, created, **kwargs):
+    """Ajusta los agregados de calificación del curso al crear o editar una reseña."""
+    previous = getattr(instance, "_previous", None)
+    if previous is None:
+        apply_review_change(instance.course_id, new_score=instance.score)
+        return
+    previous_course_id, previous_score = previous
+    if previous_course_id != instance.course_id:
+        apply_review_change(previous_course_id, old_score=previous_score)
+        apply_review_change(instance.course_id, new_score=instance.score)
+    else:
+        apply_review_change(instance.course_id, previous_score, instance.score)
+
+
+@receiver(post_delete, sender=CourseReview)
+def update_ratings_on_review_delete(sender, instance, **kwargs):
+    """Descuenta la reseña eliminada de los agregados del curso."""
+    apply_review_change(instance.course_id, old_score=instance.score)
+
+
+@receiver(post_save, sender=CourseReview)
+@receiver(post_delete, sender=CourseReview)
+def invalidate_ratings(sender, **kwargs):
+    """La calificación forma parte de los ETags de la API (no del catálogo cacheado)."""
+    transaction.on_commit(bump_ratings_version)
@@ -0,0 +1,395 @@
+# cursos/transfer.py
+"""
+Importación y exportación masiva del catálogo de cursos (CSV / JSONL).
+
+Los registros se leen y escriben en streaming, por bloques de tamaño fijo,
+así la memoria no crece con el tamaño del archivo. Cada bloque se escribe en
+una transacción: categorías y etiquetas con ``bulk_create``, cursos con
+``bulk_create``/``bulk_update`` (clave: título + categoría), relaciones M2M
+insertando directamente en las tablas intermedias y recursos por
+(curso, título). Como las operaciones masivas no disparan signals, al final
+de cada bloque se actualizan el libro de precios y los vectores de búsqueda,
+y se invalida la caché del catálogo.
+
+Formato de un registro (JSONL; en CSV las listas van separadas por ``|`` y
+``resources`` como JSON)::
+
+    {"title": "...", "category": "...", "description": "...",
+     "base_price": 15000, "is_free": false, "tags": ["a", "b"],
+     "available_membership_plans": ["basico"], "reward_for_plans": [],
+     "resources": [{"title": "Clase 1", "type": "video", "url": "https://..."}]}
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from membresias.models import MembershipPlan
+from .catalog import bump_catalog_version
+from .ingest import ingest_resource
+from .models import Category, Course, CourseResource, Tag
+from .plan_access import rebuild_plan_access
+from .pricing import rebuild_price_book
+from .search import update_search_vectors
+
+FORMATS = ("csv", "jsonl")
+
+COURSE_FIELDS = [
+    "description",
+    "base_price",
+    "is_free",
+    "is_membership_reward",
+    "is_available",
+    "is_visible",
+    "duration_minutes",
+    "special_discount_percentage",
+    "membership_required",
+]
+BOOLEAN_FIELDS = {
+    "is_free",
+    "is_membership_reward",
+    "is_available",
+    "is_visible",
+    "membership_required",
+}
+# Campo del registro -> atributo M2M de Course
+M2M_FIELDS = {
+    "tags": "tags",
+    "available_membership_plans": "available_membership_plans",
+    "reward_for_plans": "reward_for_plans",
+}
+CSV_COLUMNS = ["title", "category"] + COURSE_FIELDS + list(M2M_FIELDS) + ["resources"]
+
+
+class RecordError(ValueError):
+    pass
+
+
+# --------------------------
+# Lectura y escritura de registros
+# --------------------------
+
+
+def read_records(stream, fmt):
+    """Itera los registros (dict) de un archivo CSV o JSONL abierto."""
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            record = {key: value for key, value in row.items() if value not in (None, "")}
+            for field in M2M_FIELDS:
+                if field in record:
+                    record[field] = [item.strip() for item in record[field].split("|") if item.strip()]
+            if "resources" in record:
+                try:
+                    record["resources"] = json.loads(record["resources"])
+                except json.JSONDecodeError as e:
+                    record = {"_invalid": f"resources no es JSON válido ({e})"}
+            yield record
+    else:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                # Se reporta como error de la fila sin detener la importación
+                yield {"_invalid": f"JSON inválido ({e})"}
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "si", "sí", "yes", "y")
+
+
+def clean_record(record):
+    """Valida y normaliza un registro; lanza RecordError si no es válido."""
+    if not isinstance(record, dict):
+        raise RecordError("el registro debe ser un objeto")
+    if "_invalid" in record:
+        raise RecordError(record["_invalid"])
+    title = (record.get("title") or "").strip()
+    category = (record.get("category") or "").strip()
+    if not title or not category:
+        raise RecordError("title y category son obligatorios")
+
+    values = {}
+    try:
+        for field in COURSE_FIELDS:
+            if field not in record:
+                continue
+            value = record[field]
+            if field in BOOLEAN_FIELDS:
+                value = _parse_bool(value)
+            elif field == "special_discount_percentage":
+                value = Decimal(str(value))
+            elif field in ("base_price", "duration_minutes"):
+                value = int(value)
+            values[field] = value
+    except (TypeError, ValueError, InvalidOperation) as e:
+        raise RecordError(f"valor inválido: {e}")
+
+    # Mismas reglas que Course.clean
+    if values.get("is_free"):
+        values["base_price"] = 0
+    elif "base_price" in values and values["base_price"] <= 0:
+        raise RecordError("un curso no gratuito debe tener precio base mayor a 0")
+    discount = values.get("special_discount_percentage")
+    if discount is not None and not 0 <= discount <= 15:
+        raise RecordError("el descuento especial debe estar entre 0% y 15%")
+
+    cleaned = {"title": title, "category": category, "values": values}
+    for field in M2M_FIELDS:
+        if field in record:
+            cleaned[field] = [str(item).strip() for item in record[field] or [] if str(item).strip()]
+    if "resources" in record:
+        resources = record["resources"] or []
+        for resource in resources:
+            if not resource.get("title") or not resource.get("url"):
+                raise RecordError("cada recurso requiere title y url")
+            if resource.get("type", "link") not in dict(CourseResource.RESOURCE_TYPES):
+                raise RecordError(f"tipo de recurso inválido: {resource.get('type')}")
+        cleaned["resources"] = resources
+    return cleaned
+
+
+def serialize_course(course):
+    """Registro exportable de un curso (con relaciones ya precargadas)."""
+    return {
+        "title": course.title,
+        "category": course.category.name,
+        "description": course.description,
+        "base_price": course.base_price,
+        "is_free": course.is_free,
+        "is_membership_reward": course.is_membership_reward,
+        "is_available": course.is_available,
+        "is_visible": course.is_visible,
+        "duration_minutes": course.duration_minutes,
+        "special_discount_percentage": str(course.special_discount_percentage),
+        "membership_required": course.membership_required,
+        "tags": [tag.name for tag in course.tags.all()],
+        "available_membership_plans": [plan.slug for plan in course.available_membership_plans.all()],
+        "reward_for_plans": [plan.slug for plan in course.reward_for_plans.all()],
+        "resources": [
+            {"title": resource.title, "type": resource.type, "url": resource.url}
+            for resource in course.resources.all()
+            if resource.url
+        ],
+    }
+
+
+def export_courses(stream, fmt, chunk_size=500):
+    """Escribe todos los cursos en ``stream``; retorna la cantidad exportada."""
+    courses = (
+        Course.objects.select_related("category")
+        .prefetch_related("tags", "available_membership_plans", "reward_for_plans", "resources")
+        .order_by("id")
+    )
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+
+    count = 0
+    for course in courses.iterator(chunk_size=chunk_size):
+        record = serialize_course(course)
+        if writer:
+            for field in M2M_FIELDS:
+                record[field] = "|".join(record[field])
+            record["resources"] = json.dumps(record["resources"], ensure_ascii=False)
+            writer.writerow(record)
+        else:
+            stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+# --------------------------
+# Importación
+# --------------------------
+
+
+class CourseImporter:
+    """
+    Importa registros por bloques. Lleva los contadores para el reporte de
+    progreso; con ``dry_run`` cada bloque se revierte al terminar.
+    """
+
+    def __init__(self, chunk_size=500, dry_run=False, created_by=None):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.created_by = created_by
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.processed = 0
+        self.plan_ids = dict(MembershipPlan.objects.values_list("slug", "id"))
+
+    def run(self, records, on_chunk=None):
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+            if on_chunk:
+                on_chunk(self)
+
+    def _clean_chunk(self, chunk):
+        cleaned = {}
+        for record in chunk:
+            self.processed += 1
+            try:
+                item = clean_record(record)
+                item["line"] = self.processed
+                for field in ("available_membership_plans", "reward_for_plans"):
+                    unknown = [slug for slug in item.get(field, []) if slug not in self.plan_ids]
+                    if unknown:
+                        raise RecordError(f"planes desconocidos: {', '.join(unknown)}")
+            except (RecordError, AttributeError, TypeError) as e:
+                self.errors.append((self.processed, str(e)))
+                continue
+            # Si la clave se repite en el bloque, gana el último registro
+            cleaned[(item["title"], item["category"])] = item
+        return list(cleaned.values())
+
+    def _upsert_by_name(self, model, names):
+        names = set(names)
+        existing = dict(model.objects.filter(name__in=names).values_list("name", "id"))
+        missing = [model(name=name) for name in names if name not in existing]
+        if missing:
+            model.objects.bulk_create(missing, ignore_conflicts=True)
+            existing = dict(model.objects.filter(name__in=names).values_list("name", "id"))
+        return existing
+
+    def import_chunk(self, chunk):
+        items = self._clean_chunk(chunk)
+        if not items:
+            return
+
+        with transaction.atomic():
+            category_ids = self._upsert_by_name(Category, (item["category"] for item in items))
+            tag_ids = self._upsert_by_name(
+                Tag, (name for item in items for name in item.get("tags", []))
+            )
+
+            existing = {
+                (course.title, course.category_id): course
+                for course in Course.objects.filter(
+                    title__in=[item["title"] for item in items],
+                    category_id__in=category_ids.values(),
+                )
+            }
+
+            to_create, to_update = [], []
+            courses = []
+            now = timezone.now()
+            for item in items:
+                key = (item["title"], category_ids[item["category"]])
+                course = existing.get(key)
+                if course is None:
+                    course = Course(
+                        title=item["title"],
+                        category_id=key[1],
+                        created_by=self.created_by,
+                        **item["values"],
+                    )
+                    if not course.is_free and course.base_price <= 0:
+                        self.errors.append(
+                            (item["line"], "un curso no gratuito debe tener precio base mayor a 0")
+                        )
+                        continue
+                    to_create.append(course)
+                else:
+                    for field, value in item["values"].items():
+                        setattr(course, field, value)
+                    # bulk_update no aplica auto_now
+                    course.updated_at = now
+                    to_update.append(course)
+                courses.append((course, item))
+
+            Course.objects.bulk_create(to_create, batch_size=self.chunk_size)
+            if to_update:
+                Course.objects.bulk_update(
+                    to_update, COURSE_FIELDS + ["updated_at"], batch_size=self.chunk_size
+                )
+            self.created += len(to_create)
+            self.updated += len(to_update)
+
+            lookups = {
+                "tags": tag_ids,
+                "available_membership_plans": self.plan_ids,
+                "reward_for_plans": self.plan_ids,
+            }
+            for field, attribute in M2M_FIELDS.items():
+                self._replace_m2m(courses, field, attribute, lookups[field])
+            self._upsert_resources(courses)
+
+            course_ids = [course.id for course, _item in courses]
+            rebuild_price_book(course_ids=course_ids)
+            rebuild_plan_access(course_ids)
+            update_search_vectors(course_ids)
+            transaction.on_commit(bump_catalog_version)
+
+            if self.dry_run:
+                transaction.set_rollback(True)
+
+    def _replace_m2m(self, courses, field, attribute, ids_by_key):
+        """Reemplaza la relación M2M de los cursos cuyo registro la incluye."""
+        descriptor = getattr(Course, attribute)
+        through = descriptor.through
+        source = descriptor.field.m2m_field_name()
+        target = descriptor.field.m2m_reverse_field_name()
+
+        touched = [(course, item[field]) for course, item in courses if field in item]
+        if not touched:
+            return
+        through.objects.filter(
+            **{f"{source}__in": [course.id for course, _keys in touched]}
+        ).delete()
+        through.objects.bulk_create(
+            [
+                through(**{f"{source}_id": course.id, f"{target}_id": ids_by_key[key]})
+                for course, keys in touched
+                for key in set(keys)
+            ],
+            batch_size=self.chunk_size,
+            ignore_conflicts=True,
+        )
+
+    def _upsert_resources(self, courses):
+        """Crea o actualiza recursos por (curso, título)."""
+        touched = {course.id: item["resources"] for course, item in courses if "resources" in item}
+        if not touched:
+            return
+        existing = {
+            (resource.course_id, resource.title): resource
+            for resource in CourseResource.objects.filter(course_id__in=touched)
+        }
+        to_create, to_update = [], []
+        for course_id, resources in touched.items():
+            for data in resources:
+                resource = existing.get((course_id, data["title"]))
+                if resource is None:
+                    resource = CourseResource(course_id=course_id, title=data["title"])
+                    to_create.append(resource)
+                elif resource.file:
+                    # No reemplazar un archivo subido por una URL
+                    continue
+                else:
+                    to_update.append(resource)
+                resource.type = data.get("type", "link")
+                resource.url = data["url"]
+                # Los recursos importados son URLs: extraer metadatos es barato
+                ingest_resource(resource)
+
+        CourseResource.objects.bulk_create(to_create, batch_size=self.chunk_size)
+        if to_update:
+            CourseResource.objects.bulk_update(
+                to_update,
+                ["type", "url", "youtube_id", "thumbnail_url", "processed_at"],
+                batch_size=self.chunk_size,
+            )
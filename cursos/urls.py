@@ -7,8 +7,12 @@ app_name = 'cursos'
 urlpatterns = [
     # Vistas públicas
     path('', views.course_list, name='course_list'),
+    path('buscar/', views.course_search, name='course_search'),
     path('course/<int:pk>/', views.course_detail, name='course_detail'),
     path('course/<int:course_id>/resource/<int:resource_id>/', views.access_resource, name='access_resource'),
+    path('course/<int:course_id>/progress/', views.course_progress, name='course_progress'),
+    path('course/<int:course_id>/review/', views.course_review, name='course_review'),
+    path('course/<int:course_id>/review/delete/', views.course_review_delete, name='course_review_delete'),
     # Vistas de administración
     path('admin/courses/', views.course_list_admin, name='course_list_admin'),
     path('admin/course/create/', views.course_create_or_update, name='course_create_admin'),
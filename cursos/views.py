@@ -1,59 +1,41 @@
 # cursos/views.py
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponseRedirect
-from .models import Course, UserCourse, DiscountCode, CourseResource
-from .forms import CourseForm, CourseResourceForm, DiscountCodeForm
-from decimal import Decimal
-from membresias.models import MembershipPlan
+from django.http import HttpResponseRedirect, JsonResponse
+from django.core.paginator import Paginator
+from django.views.decorators.http import require_POST
+from .models import Course, UserCourse, CourseResource, CourseReview
+from .forms import CourseForm, CourseResourceForm, DiscountCodeForm, CourseReviewForm
+from .entitlements import CourseEntitlements
+from plataforma_cursos.middleware.user_context import get_user_context
+from .catalog import get_catalog_snapshot, live_ratings
+from .search import search_courses
+from .pricing import get_price, get_prices
+from .delivery import serve_protected_file
+from .ingest import find_duplicates
+from .progress import record_progress
+from .admin_listing import admin_course_page
+import json
 
 # --------------------------
 # Funciones auxiliares
 # --------------------------
 
 
-def extract_youtube_id(url):
-    if url:
-        if "youtube.com" in url and "v=" in url:
-            return url.split("v=")[1].split("&")[0]
-        elif "youtu.be/" in url:
-            return url.split("youtu.be/")[1].split("?")[0]
-    return None
-
-
-def check_course_access(user, course):
+def check_course_access(user, course, entitlements=None):
     """
     Verifica si un usuario puede acceder a un curso y sus recursos.
     Retorna una tupla (puede_acceder, razon_denegacion)
-    """
-    # Si el curso es gratuito, cualquiera puede acceder
-    if course.is_free:
-        return True, None
-
-    # Si el usuario ya compró este curso específico
-    user_course = UserCourse.objects.filter(user=user, course=course).first()
-    if user_course:
-        return True, None
-
-    # Si el curso requiere membresía, verificar membresía activa
-    if course.membership_required:
-        active_membership = user.get_active_membership()
-        if not active_membership:
-            return False, "membership_required"
-
-        # Verificar si la membresía puede acceder a este curso
-        if course.available_membership_plans.exists():
-            if not course.available_membership_plans.filter(
-                id=active_membership.plan.id
-            ).exists():
-                return False, "membership_plan_insufficient"
 
-        return True, None
-
-    # Para cursos de pago sin membresía requerida, necesita haberlo comprado
-    return False, "payment_required"
+    Para verificar varios cursos, pasar un mismo ``CourseEntitlements`` y así
+    reutilizar los datos ya cargados del usuario.
+    """
+    if entitlements is None:
+        entitlements = CourseEntitlements(user)
+    return entitlements.check(course)
 
 
 # --------------------------
@@ -66,48 +48,59 @@ def course_detail(request, pk):
     course = get_object_or_404(Course, pk=pk, is_available=True)
     user_course = UserCourse.objects.filter(user=request.user, course=course).first()
 
-    # Verificar si el curso fue reclamado como recompensa
-    is_claimed_reward = False
-    active_membership = request.user.get_active_membership()
-    if active_membership:
-        is_claimed_reward = active_membership.welcome_courses_claimed.filter(id=course.id).exists()
-
-    final_price = Decimal("0.00") if course.is_free else course.base_price
-
-    if not course.is_free:
-        # Aplicar el mayor descuento disponible (solo código por ahora)
-        max_discount = Decimal("0.00")
-
-        # Descuento por código
-        code = request.GET.get("discount_code")
-        if code:
-            try:
-                discount_code = DiscountCode.objects.get(
-                    course=course, code__iexact=code
-                )
-                max_discount = max(max_discount, discount_code.discount_percentage)
-            except DiscountCode.DoesNotExist:
-                messages.error(request, "El código de descuento no es válido.")
+    entitlements = get_user_context(request).entitlements
 
-        if max_discount > 0:
-            final_price *= 1 - max_discount / 100
+    # Verificar si el curso fue reclamado como recompensa
+    is_claimed_reward = course.id in entitlements.claimed_course_ids
+
+    # Precio desde el libro de precios: mayor descuento entre el especial del
+    # curso, el del plan del usuario y el del código ingresado
+    active_membership = entitlements.active_membership
+    plan = active_membership.plan if active_membership else None
+    price = None
+    code = request.GET.get("discount_code")
+    if code and not course.is_free:
+        price = get_price(course, plan, code)
+        if price is None:
+            messages.error(request, "El código de descuento no es válido.")
+    if price is None:
+        price = get_price(course, plan)
+    final_price = price[1]
 
     # Verificar acceso al curso y recursos
-    can_access, denial_reason = check_course_access(request.user, course)
+    can_access, denial_reason = check_course_access(request.user, course, entitlements)
 
-    # Preprocesar recursos con sus youtube_ids
+    # Recursos de video con su youtube_id ya extraído al guardarlos
     resources_with_youtube = [
-        (resource, extract_youtube_id(resource.url))
-        for resource in course.resources.filter(type="video")
-        if extract_youtube_id(resource.url)
+        (resource, resource.youtube_id)
+        for resource in course.resources.filter(type="video").exclude(youtube_id="")
     ]
 
+    # Reseñas: la calificación y el histograma vienen de columnas agregadas de Course
+    reviews = course.reviews.select_related("user").order_by("-created_at")[:10]
+    user_review = CourseReview.objects.filter(user=request.user, course=course).first()
+    review_form = CourseReviewForm(instance=user_review) if can_access else None
+
+    # "Los estudiantes también tomaron" (precalculado por build_recommendations)
+    owned_course_ids = entitlements.owned_course_ids
+    recommended_courses = [
+        recommendation.recommended
+        for recommendation in course.recommendations.filter(
+            recommended__is_available=True
+        ).select_related("recommended").order_by("rank")[:8]
+        if recommendation.recommended_id not in owned_course_ids
+    ][:4]
+
     return render(
         request,
         "cursos/course_detail.html",
         {
             "course": course,
             "final_price": final_price,
+            "reviews": reviews,
+            "user_review": user_review,
+            "review_form": review_form,
+            "recommended_courses": recommended_courses,
             "resources_with_youtube": resources_with_youtube,
             "user_course": user_course,
             "is_claimed_reward": is_claimed_reward,
@@ -124,7 +117,9 @@ def access_resource(request, course_id, resource_id):
     resource = get_object_or_404(CourseResource, id=resource_id, course=course)
 
     # Verificar acceso al curso
-    can_access, denial_reason = check_course_access(request.user, course)
+    can_access, denial_reason = check_course_access(
+        request.user, course, get_user_context(request).entitlements
+    )
 
     if not can_access:
         if denial_reason == "membership_required":
@@ -151,43 +146,133 @@ def access_resource(request, course_id, resource_id):
     if resource.url:
         return HttpResponseRedirect(resource.url)
     elif resource.file:
-        # Aquí podrías implementar descarga segura del archivo
-        return HttpResponseRedirect(resource.file.url)
+        # Servir el archivo tras validar el acceso, sin exponer la URL pública de media
+        return serve_protected_file(request, resource.file)
     else:
         messages.error(request, "El recurso no está disponible.")
         return redirect('cursos:course_detail', pk=course.id)
 
 
+@login_required
+@require_POST
+def course_review(request, course_id):
+    """Crea o actualiza la reseña del usuario para un curso al que tiene acceso."""
+    course = get_object_or_404(Course, pk=course_id, is_available=True)
+    can_access, _denial_reason = check_course_access(
+        request.user, course, get_user_context(request).entitlements
+    )
+    if not can_access:
+        messages.error(request, "Solo puedes reseñar cursos a los que tienes acceso.")
+        return redirect("cursos:course_detail", pk=course.id)
+
+    review = CourseReview.objects.filter(user=request.user, course=course).first()
+    form = CourseReviewForm(request.POST, instance=review)
+    if form.is_valid():
+        review = form.save(commit=False)
+        review.user = request.user
+        review.course = course
+        review.save()
+        messages.success(request, "¡Gracias por tu reseña!")
+    else:
+        messages.error(request, "La calificación debe estar entre 1 y 5 estrellas.")
+    return redirect("cursos:course_detail", pk=course.id)
+
+
+@login_required
+@require_POST
+def course_review_delete(request, course_id):
+    """Elimina la reseña del usuario para un curso."""
+    review = CourseReview.objects.filter(user=request.user, course_id=course_id).first()
+    if review:
+        review.delete()
+        messages.success(request, "Tu reseña fue eliminada.")
+    return redirect("cursos:course_detail", pk=course_id)
+
+
+def _parse_float(value):
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+@login_required
+@require_POST
+def course_progress(request, course_id):
+    """
+    Endpoint de heartbeats de progreso (JSON o formulario).
+
+    Acepta ``resource_id``, ``position`` y ``percent``; el evento queda en el
+    buffer de ``cursos.progress`` y se escribe en lote, sin tocar la base de
+    datos en cada petición.
+    """
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "JSON inválido"}, status=400)
+    else:
+        data = request.POST
+
+    percent = _parse_float(data.get("percent"))
+    if percent is not None:
+        percent = min(max(percent, 0.0), 100.0)
+    try:
+        resource_id = int(data["resource_id"]) if data.get("resource_id") else None
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "resource_id inválido"}, status=400)
+
+    record_progress(
+        request.user.id,
+        course_id,
+        resource_id=resource_id,
+        position=_parse_float(data.get("position")),
+        percent=percent,
+    )
+    return JsonResponse({"status": "ok"}, status=202)
+
+
 def course_list(request):
-    # Obtener todos los cursos disponibles inicialmente
-    free_courses = Course.objects.filter(is_available=True, is_free=True)
-    general_courses = Course.objects.filter(is_available=True, is_free=False)
-    plans = MembershipPlan.objects.filter(is_active=True)
+    # Obtener el catálogo público desde la caché compartida
+    catalog = get_catalog_snapshot()
+    free_courses = catalog["free_courses"]
+    general_courses = catalog["general_courses"]
+    plans = catalog["plans"]
     
     # Obtener membresía activa del usuario si está autenticado
     active_membership = None
+    prices = catalog["prices"]
     
-    # Si el usuario está autenticado, filtrar cursos que ya posee
+    # Si el usuario está autenticado, filtrar sobre la instantánea los cursos que ya posee
     if request.user.is_authenticated:
-        active_membership = request.user.get_active_membership()
-        
-        # Obtener IDs de cursos que el usuario ya tiene (comprados)
-        user_course_ids = request.user.user_courses.values_list('course_id', flat=True)
+        entitlements = get_user_context(request).entitlements
+        active_membership = entitlements.active_membership
         
-        # Obtener IDs de cursos reclamados como recompensa
-        claimed_course_ids = []
         if active_membership:
-            claimed_course_ids = active_membership.welcome_courses_claimed.values_list('id', flat=True)
             # Filtrar el plan que ya tiene activo para que no se muestre
-            plans = plans.exclude(id=active_membership.plan.id)
+            plans = [plan for plan in plans if plan.id != active_membership.plan_id]
+            # Precios con el descuento del plan del usuario, en una sola consulta
+            prices = get_prices(
+                free_courses + general_courses, active_membership.plan
+            )
         
-        # Combinar ambos tipos de cursos que ya posee (eliminar duplicados usando set)
-        owned_course_ids = list(set(list(user_course_ids) + list(claimed_course_ids)))
+        # Cursos comprados y reclamados como recompensa
+        owned_course_ids = entitlements.owned_course_ids
         
         # Filtrar cursos que ya posee del listado
         if owned_course_ids:
-            free_courses = free_courses.exclude(id__in=owned_course_ids)
-            general_courses = general_courses.exclude(id__in=owned_course_ids)
+            free_courses = [c for c in free_courses if c.id not in owned_course_ids]
+            general_courses = [c for c in general_courses if c.id not in owned_course_ids]
+    
+    for course in free_courses + general_courses:
+        course.discount_applied, course.final_price = prices[course.id]
+    
+    # Ordenar por calificación usando la columna agregada (sin consultar reseñas),
+    # leída en vivo: la instantánea del catálogo no se invalida con cada reseña
+    if request.GET.get("sort") == "rating":
+        ratings = live_ratings([c.id for c in free_courses + general_courses])
+        free_courses = sorted(free_courses, key=lambda c: (-ratings.get(c.id, 0), c.id))
+        general_courses = sorted(general_courses, key=lambda c: (-ratings.get(c.id, 0), c.id))
     
     return render(
         request,
@@ -195,12 +280,70 @@ def course_list(request):
         {
             "free_courses": free_courses,
             "general_courses": general_courses,
+            "categories": catalog["categories"],
+            "tags": catalog["tags"],
             "plans": plans,
             "active_membership": active_membership,  # Pasar la membresía activa al template
         },
     )
 
 
+def _parse_bool(value):
+    """Convierte parámetros GET tipo 'true'/'false' a booleano (None si no aplica)."""
+    if value is None or value == "":
+        return None
+    return value.lower() in ("1", "true", "si", "sí")
+
+
+def _parse_int(value):
+    """Convierte un ID recibido por GET a entero (None si falta o no es válido)."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def course_search(request):
+    """Búsqueda del catálogo con resultados ordenados por relevancia y facetas (JSON)."""
+    results, facets = search_courses(
+        query=request.GET.get("q", "").strip(),
+        category=_parse_int(request.GET.get("category")),
+        tag=_parse_int(request.GET.get("tag")),
+        is_free=_parse_bool(request.GET.get("is_free")),
+        membership_required=_parse_bool(request.GET.get("membership_required")),
+        price_bucket=request.GET.get("price") or None,
+        sort=request.GET.get("sort") or None,
+    )
+
+    paginator = Paginator(results, 20)
+    page_obj = paginator.get_page(request.GET.get("page"))
+
+    return JsonResponse({
+        "query": request.GET.get("q", ""),
+        "count": paginator.count,
+        "page": page_obj.number,
+        "num_pages": paginator.num_pages,
+        "results": [
+            {
+                "id": course.id,
+                "title": course.title,
+                "description": course.description[:200],
+                "category": course.category.name,
+                "tags": [tag.name for tag in course.tags.all()],
+                "base_price": course.base_price,
+                "is_free": course.is_free,
+                "membership_required": course.membership_required,
+                "rating": course.rating,
+                "rating_count": course.rating_count,
+                "rank": getattr(course, "rank", None),
+                "url": reverse("cursos:course_detail", args=[course.id]),
+            }
+            for course in page_obj
+        ],
+        "facets": facets,
+    })
+
+
 # --------------------------
 # Vistas de administración
 # --------------------------
@@ -208,8 +351,21 @@ def course_list(request):
 
 @staff_member_required
 def course_list_admin(request):
-    courses = Course.objects.all()
-    return render(request, "cursos/course_list_admin.html", {"courses": courses})
+    context = admin_course_page(request.GET)
+    context["categories"] = get_catalog_snapshot()["categories"]
+    context["sort_options"] = [
+        ("created", "Más recientes"),
+        ("title", "Título"),
+        ("enrollments", "Inscripciones"),
+        ("completion", "Tasa de finalización"),
+        ("resources", "Recursos"),
+        ("revenue", "Ingresos"),
+    ]
+    # Parámetros actuales sin el cursor, para los enlaces de paginación
+    params = request.GET.copy()
+    params.pop("cursor", None)
+    context["query_string"] = params.urlencode()
+    return render(request, "cursos/course_list_admin.html", context)
 
 
 @staff_member_required
@@ -284,6 +440,13 @@ def course_resource_create(request, course_pk):
             resource.course = course
             resource.save()
             messages.success(request, "Recurso creado exitosamente.")
+            duplicate = find_duplicates(resource).first()
+            if duplicate:
+                messages.warning(
+                    request,
+                    f"El archivo subido es idéntico al recurso '{duplicate.title}' "
+                    f"del curso '{duplicate.course.title}'.",
+                )
             return redirect("cursos:course_list_admin")
 
     return render(
@@ -1,7 +1,7 @@
 # membresias/admin.py
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import MembershipPlan, Membership, MembershipHistory, ConsultationType, ConsultationRequest
+from .models import MembershipPlan, Membership, MembershipHistory, MembershipHistoryArchive, ConsultationType, ConsultationAvailability, ConsultationRequest
 
 
 @admin.register(MembershipPlan)
@@ -76,6 +76,33 @@ class MembershipHistoryAdmin(admin.ModelAdmin):
         (None, {"fields": ("membership", "action", "details")}),
         (_("Fechas"), {"fields": ("created_at",), "classes": ("collapse",)}),
     )
+    list_select_related = ("membership__user", "membership__plan")
+    show_full_result_count = False
+
+    def has_change_permission(self, request, obj=None):
+        # Registro de solo inserción
+        return False
+
+
+@admin.register(MembershipHistoryArchive)
+class MembershipHistoryArchiveAdmin(admin.ModelAdmin):
+    list_display = ("membership", "action", "created_at", "month")
+    list_filter = ("action", "month")
+    search_fields = ("membership__user__email",)
+    readonly_fields = ("membership", "action", "details", "created_at", "month", "archived_at")
+    list_select_related = ("membership__user", "membership__plan")
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class ConsultationAvailabilityInline(admin.TabularInline):
+    model = ConsultationAvailability
+    extra = 1
 
 
 @admin.register(ConsultationType)
@@ -84,6 +111,7 @@ class ConsultationTypeAdmin(admin.ModelAdmin):
         "name",
         "is_individual",
         "duration_minutes",
+        "capacity",
         "is_active",
         "get_membership_plans",
     )
@@ -92,6 +120,7 @@ class ConsultationTypeAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("name",)}
     readonly_fields = ("created_at",)
     filter_horizontal = ("membership_plans",)
+    inlines = [ConsultationAvailabilityInline]
     fieldsets = (
         (None, {"fields": ("name", "slug", "description", "is_active")}),
         (
@@ -100,6 +129,7 @@ class ConsultationTypeAdmin(admin.ModelAdmin):
                 "fields": (
                     "is_individual",
                     "duration_minutes",
+                    "capacity",
                     "membership_plans",
                 )
             },
@@ -122,17 +152,18 @@ class ConsultationRequestAdmin(admin.ModelAdmin):
         "user",
         "consultation_type",
         "requested_date",
+        "ends_at",
         "status",
         "created_at",
     )
     list_filter = ("status", "consultation_type", "created_at")
     search_fields = ("user__email", "user__username", "consultation_type__name")
-    readonly_fields = ("created_at",)
+    readonly_fields = ("ends_at", "created_at")
     fieldsets = (
         (None, {"fields": ("user", "membership", "consultation_type")}),
         (
             _("Programación"),
-            {"fields": ("requested_date", "status", "notes")},
+            {"fields": ("requested_date", "ends_at", "status", "notes")},
         ),
         (
             _("Fechas"),
@@ -0,0 +1,68 @@
+# membresias/expiry.py
+"""
+Barrido de membresías vencidas.
+
+``Membership.is_active`` compara ``end_date`` con la hora actual, pero el
+campo ``status`` quedaba en ``"active"`` para siempre y todas las consultas
+``filter(status="active")`` arrastraban membresías vencidas. Este barrido
+pasa a ``"expired"`` las activas con ``end_date`` vencida usando ``UPDATE``
+por lotes (índice ``(status, end_date)``) y registra su ``MembershipHistory``
+con ``bulk_create``, sin cargar modelos ni disparar señales por fila.
+
+Cada lote toma sus filas con ``SELECT ... FOR UPDATE SKIP LOCKED``, por lo que
+dos ejecuciones simultáneas (cron cada minuto) no procesan la misma membresía.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Membership, MembershipHistory
+
+BATCH_SIZE = 1000
+
+
+def _expire_batch(now, batch_size):
+    with transaction.atomic():
+        rows = list(
+            Membership.objects.filter(status="active", end_date__lte=now)
+            .order_by("end_date")
+            .select_for_update(skip_locked=True)
+            .values("id", "end_date", "courses_remaining", "consultations_remaining")[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        Membership.objects.filter(id__in=[row["id"] for row in rows]).update(
+            status="expired", updated_at=now
+        )
+        MembershipHistory.objects.bulk_create(
+            [
+                MembershipHistory(
+                    membership_id=row["id"],
+                    action="expired",
+                    details={
+                        "status": "expired",
+                        "courses_remaining": row["courses_remaining"],
+                        "consultations_remaining": row["consultations_remaining"],
+                        "end_date": row["end_date"].isoformat(),
+                        "source": "expire_memberships",
+                    },
+                )
+                for row in rows
+            ],
+            batch_size=batch_size,
+        )
+    return len(rows)
+
+
+def expire_memberships(now=None, batch_size=BATCH_SIZE):
+    """
+    Marca como expiradas las membresías activas vencidas a ``now``.
+    Cada lote es una transacción corta. Retorna la cantidad expirada.
+    """
+    now = now or timezone.now()
+    total = 0
+    while True:
+        expired = _expire_batch(now, batch_size)
+        total += expired
+        if expired < batch_size:
+            return total
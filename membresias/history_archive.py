@@ -0,0 +1,99 @@
+# membresias/history_archive.py
+"""
+Archivado del historial de membresías.
+
+``MembershipHistory`` recibe una fila por cada curso usado, consulta o
+recompensa y crecía sin límite. Ahora es un registro de solo inserción que
+conserva únicamente la ventana activa (``MEMBERSHIP_HISTORY_HOT_DAYS``); el
+admin y las vistas solo leen esa tabla. Los eventos más antiguos se mueven por
+lotes a ``MembershipHistoryArchive`` (con su mes, para consultarlos por
+periodo) o, con ``export_dir``, a archivos JSONL comprimidos por mes
+(``membership-history-AAAA-MM.jsonl.gz``).
+
+Cada lote es una transacción corta que toma sus filas con
+``SELECT ... FOR UPDATE SKIP LOCKED`` sobre el índice ``created_at``, las copia
+y las borra con un único ``DELETE``.
+"""
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MembershipHistory, MembershipHistoryArchive
+
+CHUNK_SIZE = 5000
+
+
+def _month(created_at):
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def _archive_rows(rows):
+    MembershipHistoryArchive.objects.bulk_create(
+        [
+            MembershipHistoryArchive(
+                membership_id=row["membership_id"],
+                action=row["action"],
+                details=row["details"],
+                created_at=row["created_at"],
+                month=_month(row["created_at"]),
+            )
+            for row in rows
+        ],
+        batch_size=len(rows),
+    )
+
+
+def _export_rows(rows, export_dir):
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(_month(row["created_at"]), []).append(row)
+    for month, month_rows in by_month.items():
+        path = os.path.join(export_dir, f"membership-history-{month:%Y-%m}.jsonl.gz")
+        # "at" agrega un miembro gzip nuevo; gzip/zcat leen el archivo completo
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for row in month_rows:
+                f.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n")
+
+
+def _archive_chunk(cutoff, chunk_size, export_dir):
+    with transaction.atomic():
+        rows = list(
+            MembershipHistory.objects.filter(created_at__lt=cutoff)
+            .order_by("created_at")
+            .select_for_update(skip_locked=True)
+            .values("id", "membership_id", "action", "details", "created_at")[:chunk_size]
+        )
+        if not rows:
+            return 0
+
+        if export_dir:
+            # Si el DELETE falla, el lote se reexporta en la próxima ejecución
+            _export_rows(rows, export_dir)
+        else:
+            _archive_rows(rows)
+        MembershipHistory.objects.filter(id__in=[row["id"] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_membership_history(before=None, chunk_size=CHUNK_SIZE, export_dir=None):
+    """
+    Mueve los eventos anteriores a ``before`` (por defecto, fuera de la
+    ventana activa) al archivo. Retorna la cantidad de eventos movidos.
+    """
+    if before is None:
+        before = timezone.now() - timedelta(days=settings.MEMBERSHIP_HISTORY_HOT_DAYS)
+    if export_dir:
+        os.makedirs(export_dir, exist_ok=True)
+
+    total = 0
+    while True:
+        moved = _archive_chunk(before, chunk_size, export_dir)
+        total += moved
+        if moved < chunk_size:
+            return total
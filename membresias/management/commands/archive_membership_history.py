@@ -0,0 +1,42 @@
+# membresias/management/commands/archive_membership_history.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from membresias.history_archive import CHUNK_SIZE, archive_membership_history
+
+
+class Command(BaseCommand):
+    help = 'Mueve el historial de membresías fuera de la ventana activa a la tabla de archivo o a JSONL comprimido'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.MEMBERSHIP_HISTORY_HOT_DAYS,
+            help='Días de historial que se conservan en la tabla activa'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Eventos movidos por transacción'
+        )
+        parser.add_argument(
+            '--export-dir',
+            help='Directorio donde escribir membership-history-AAAA-MM.jsonl.gz en lugar de la tabla de archivo'
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        moved = archive_membership_history(
+            before=before,
+            chunk_size=options['chunk_size'],
+            export_dir=options['export_dir'],
+        )
+        destination = options['export_dir'] or 'tabla de archivo'
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Eventos archivados: {moved} (anteriores a {before:%Y-%m-%d}, destino: {destination})')
+        )
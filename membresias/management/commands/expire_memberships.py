@@ -0,0 +1,19 @@
+# membresias/management/commands/expire_memberships.py
+from django.core.management.base import BaseCommand
+from membresias.expiry import BATCH_SIZE, expire_memberships
+
+
+class Command(BaseCommand):
+    help = 'Marca como expiradas las membresías activas cuya fecha de fin ya pasó (apto para cron cada minuto)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Membresías actualizadas por transacción'
+        )
+
+    def handle(self, *args, **options):
+        expired = expire_memberships(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Membresías expiradas: {expired}'))
@@ -48,6 +48,7 @@ class Command(BasePopulateCommand):
                 "description": "Sesión de asesoría en grupo con otros miembros de la comunidad",
                 "duration_minutes": 60,
                 "is_individual": False,
+                "capacity": 20,
                 "membership_plans": [plan_basico, plan_intermedio, plan_premium],
                 "is_active": True,
             },
@@ -75,6 +76,7 @@ class Command(BasePopulateCommand):
                 "description": "Sesión grupal para análisis de mercado y estrategias de trading",
                 "duration_minutes": 75,
                 "is_individual": False,
+                "capacity": 20,
                 "membership_plans": [plan_intermedio, plan_premium],
                 "is_active": True,
             },
@@ -84,6 +86,7 @@ class Command(BasePopulateCommand):
                 "description": "Webinar mensual exclusivo para miembros premium",
                 "duration_minutes": 120,
                 "is_individual": False,
+                "capacity": 20,
                 "membership_plans": [plan_premium],
                 "is_active": True,
             },
@@ -113,6 +113,8 @@ class Membership(models.Model):
         indexes = [
             models.Index(fields=["user", "status"]),
             models.Index(fields=["end_date"]),
+            # Barrido de vencidas (membresias.expiry)
+            models.Index(fields=["status", "end_date"]),
         ]
 
     def __str__(self):
@@ -169,14 +171,9 @@ class Membership(models.Model):
     def get_available_courses(self):
         """Retorna los cursos disponibles para esta membresía."""
         from cursos.models import Course
+        from cursos.plan_access import plan_course_ids
 
-        return Course.objects.filter(
-            models.Q(membership_required=True)
-            & (
-                models.Q(available_membership_plans=self.plan)
-                | ~models.Q(available_membership_plans__isnull=False)
-            )
-        ).distinct()
+        return Course.objects.filter(id__in=plan_course_ids(self.plan_id))
 
     def can_access_specific_course(self, course):
         """Verifica si la membresía puede acceder a un curso específico."""
@@ -234,12 +231,11 @@ class Membership(models.Model):
 
     def get_available_reward_courses(self):
         """Retorna los cursos de recompensa disponibles para este plan."""
-        from cursos.models import Course
-        
+        from cursos.models import Course, PlanCourseAccess
+        from cursos.plan_access import plan_course_ids
+
         return Course.objects.filter(
-            is_membership_reward=True,
-            reward_for_plans=self.plan,
-            is_available=True
+            id__in=plan_course_ids(self.plan_id, PlanCourseAccess.ACCESS_REWARD)
         ).exclude(
             id__in=self.welcome_courses_claimed.values_list('id', flat=True)
         )
@@ -271,54 +267,17 @@ class Membership(models.Model):
             return 0  # Por defecto, sin cursos de bienvenida
     
     def claim_reward_course(self, course):
-        """Reclama un curso de recompensa con validaciones completas y transacción atómica."""
-        from django.db import transaction
-        
-        # Usar transacción atómica para evitar problemas de concurrencia
-        with transaction.atomic():
-            # Recargar el objeto desde la base de datos para evitar datos obsoletos
-            fresh_membership = Membership.objects.select_for_update().get(id=self.id)
-            
-            # Validaciones completas
-            if not fresh_membership.can_claim_reward_course():
-                return False, "No tienes cursos de recompensa disponibles"
-            
-            if not course.is_membership_reward:
-                return False, "Este curso no es una recompensa"
-            
-            # Verificar si ya fue reclamado (doble verificación)
-            if fresh_membership.welcome_courses_claimed.filter(id=course.id).exists():
-                return False, "Ya has reclamado este curso anteriormente"
-            
-            # Verificar que está disponible para el plan
-            if not course.reward_for_plans.filter(id=fresh_membership.plan.id).exists():
-                return False, "Este curso no está disponible para tu plan"
-            
-            # Verificar que aún tiene cursos disponibles
-            if fresh_membership.welcome_courses_remaining <= 0:
-                return False, "Ya has reclamado todos tus cursos de recompensa"
-            
-            # Reclamar el curso atómicamente
-            fresh_membership.welcome_courses_claimed.add(course)
-            fresh_membership.welcome_courses_remaining -= 1
-            fresh_membership.save(update_fields=['welcome_courses_remaining'])
-            
-            # Registrar en el historial
-            MembershipHistory.objects.create(
-                membership=fresh_membership,
-                action="reward_claimed",
-                details={
-                    "course_id": course.id,
-                    "course_title": course.title,
-                    "remaining_rewards": fresh_membership.welcome_courses_remaining,
-                },
-            )
-            
-            # Actualizar el objeto actual con los nuevos valores
-            self.welcome_courses_remaining = fresh_membership.welcome_courses_remaining
-            self.refresh_from_db()
-            
-            return True, "Curso de recompensa reclamado exitosamente"
+        """
+        Reclama un curso de recompensa (ver ``membresias.rewards``).
+        Retorna una tupla (exito, mensaje).
+        """
+        from .rewards import RewardClaimError, claim_reward_course
+
+        try:
+            self.welcome_courses_remaining = claim_reward_course(self.user, course.id)
+        except RewardClaimError as e:
+            return False, e.message
+        return True, "Curso de recompensa reclamado exitosamente"
 
 
 class MembershipHistory(models.Model):
@@ -350,10 +309,56 @@ class MembershipHistory(models.Model):
         verbose_name = _("historial de membresía")
         verbose_name_plural = _("historiales de membresías")
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["membership", "-created_at"]),
+            # Archivado por antigüedad (membresias.history_archive)
+            models.Index(fields=["created_at"]),
+        ]
 
     def __str__(self):
         return f"{self.membership} - {self.action}"
 
+    def save(self, *args, **kwargs):
+        # El historial es un registro de eventos: solo se agregan filas
+        if not self._state.adding:
+            raise ValueError("El historial de membresías no se modifica, solo se agregan eventos.")
+        super().save(*args, **kwargs)
+
+
+class MembershipHistoryArchive(models.Model):
+    """
+    Eventos de ``MembershipHistory`` más antiguos que la ventana activa,
+    movidos por ``manage.py archive_membership_history``.
+    """
+
+    membership = models.ForeignKey(
+        Membership,
+        on_delete=models.CASCADE,
+        related_name="archived_history",
+        verbose_name=_("membresía"),
+    )
+    action = models.CharField(
+        _("acción"),
+        max_length=50,
+        choices=MembershipHistory._meta.get_field("action").choices,
+    )
+    details = models.JSONField(_("detalles"), default=dict)
+    created_at = models.DateTimeField(_("creado en"))
+    month = models.DateField(_("mes"), help_text=_("Primer día del mes del evento"))
+    archived_at = models.DateTimeField(_("archivado en"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("historial archivado de membresía")
+        verbose_name_plural = _("historiales archivados de membresías")
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["month"]),
+            models.Index(fields=["membership", "-created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.membership} - {self.action} ({self.month:%Y-%m})"
+
 
 class ConsultationType(models.Model):
     """Modelo para tipos de consultas disponibles por membresía."""
@@ -363,6 +368,11 @@ class ConsultationType(models.Model):
     description = models.TextField(_("descripción"))
     is_individual = models.BooleanField(_("es individual"), default=False)
     duration_minutes = models.IntegerField(_("duración en minutos"), default=30)
+    capacity = models.PositiveIntegerField(
+        _("cupos por turno"),
+        default=1,
+        help_text=_("Participantes simultáneos por turno (1 para consultas individuales)")
+    )
     membership_plans = models.ManyToManyField(
         MembershipPlan,
         related_name="consultation_types",
@@ -381,6 +391,45 @@ class ConsultationType(models.Model):
         return f"{self.name} ({'Individual' if self.is_individual else 'Grupal'})"
 
 
+class ConsultationAvailability(models.Model):
+    """Franja semanal en la que se puede reservar un tipo de consulta."""
+
+    WEEKDAYS = [
+        (0, _("Lunes")),
+        (1, _("Martes")),
+        (2, _("Miércoles")),
+        (3, _("Jueves")),
+        (4, _("Viernes")),
+        (5, _("Sábado")),
+        (6, _("Domingo")),
+    ]
+
+    consultation_type = models.ForeignKey(
+        ConsultationType,
+        on_delete=models.CASCADE,
+        related_name="availability_windows",
+        verbose_name=_("tipo de consulta")
+    )
+    weekday = models.PositiveSmallIntegerField(_("día de la semana"), choices=WEEKDAYS)
+    start_time = models.TimeField(_("hora de inicio"))
+    end_time = models.TimeField(_("hora de fin"))
+    is_active = models.BooleanField(_("activa"), default=True)
+
+    class Meta:
+        verbose_name = _("disponibilidad de consulta")
+        verbose_name_plural = _("disponibilidades de consultas")
+        ordering = ["consultation_type", "weekday", "start_time"]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(end_time__gt=models.F("start_time")),
+                name="consultation_availability_end_after_start",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.consultation_type.name} - {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
 class ConsultationRequest(models.Model):
     """Modelo para solicitudes de consultas."""
     
@@ -403,6 +452,7 @@ class ConsultationRequest(models.Model):
         verbose_name=_("tipo de consulta")
     )
     requested_date = models.DateTimeField(_("fecha solicitada"))
+    ends_at = models.DateTimeField(_("termina en"), null=True, editable=False)
     status = models.CharField(
         _("estado"),
         max_length=20,
@@ -417,10 +467,22 @@ class ConsultationRequest(models.Model):
     notes = models.TextField(_("notas"), blank=True)
     created_at = models.DateTimeField(_("creado en"), auto_now_add=True)
     
+    ACTIVE_STATUSES = ("pending", "confirmed")
+
     class Meta:
         verbose_name = _("solicitud de consulta")
         verbose_name_plural = _("solicitudes de consultas")
         ordering = ["-created_at"]
+        indexes = [
+            # Turnos ocupados por tipo (membresias.scheduling)
+            models.Index(fields=["consultation_type", "requested_date"]),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.consultation_type.name}"
+
+    def save(self, *args, **kwargs):
+        self.ends_at = self.requested_date + timezone.timedelta(
+            minutes=self.consultation_type.duration_minutes
+        )
+        super().save(*args, **kwargs)
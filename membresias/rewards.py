@@ -0,0 +1,86 @@
+# membresias/rewards.py
+"""
+Reclamo de cursos de recompensa sin bloqueos previos.
+
+El flujo anterior tomaba ``select_for_update`` sobre la membresía y luego
+hacía varias consultas de validación con la fila bloqueada, serializando
+todos los reclamos. Ahora:
+
+1. Una sola consulta obtiene la membresía activa y, con ``EXISTS``, si el
+   curso es una recompensa disponible para su plan.
+2. Se insertan la relación membresía↔curso y el ``UserCourse``; sus
+   restricciones únicas rechazan los reclamos duplicados, también los
+   concurrentes.
+3. ``UPDATE ... SET welcome_courses_remaining = welcome_courses_remaining - 1
+   WHERE welcome_courses_remaining > 0`` descuenta el cupo. Si no quedaba
+   cupo no se actualiza ninguna fila y la transacción completa se revierte.
+
+La fila de la membresía solo queda bloqueada desde ese ``UPDATE`` hasta el
+``COMMIT``.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+
+from cursos.models import Course, UserCourse
+from .models import Membership, MembershipHistory
+
+
+class RewardClaimError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def claim_reward_course(user, course_id):
+    """
+    Reclama ``course_id`` como recompensa de la membresía activa de ``user``.
+    Retorna los cursos de recompensa restantes o lanza ``RewardClaimError``.
+    """
+    eligible_course = Course.objects.filter(
+        id=course_id,
+        is_membership_reward=True,
+        is_available=True,
+        reward_for_plans=OuterRef("plan_id"),
+    )
+    membership = (
+        Membership.objects.filter(user=user, status="active")
+        .order_by("-end_date")
+        .annotate(eligible=Exists(eligible_course))
+        .values("id", "eligible")
+        .first()
+    )
+    if not membership:
+        raise RewardClaimError("No tienes una membresía activa.")
+    if not membership["eligible"]:
+        raise RewardClaimError("Este curso no está disponible para tu plan.")
+
+    claimed = Membership.welcome_courses_claimed.through
+    with transaction.atomic():
+        # Las restricciones únicas resuelven los reclamos repetidos o simultáneos;
+        # cualquier error revierte toda la transacción
+        try:
+            claimed.objects.create(membership_id=membership["id"], course_id=course_id)
+        except IntegrityError:
+            raise RewardClaimError("Ya has reclamado este curso anteriormente.")
+        try:
+            UserCourse.objects.create(user=user, course_id=course_id)
+        except IntegrityError:
+            raise RewardClaimError("Ya tienes acceso a este curso.")
+
+        updated = Membership.objects.filter(
+            id=membership["id"], status="active", welcome_courses_remaining__gt=0
+        ).update(welcome_courses_remaining=F("welcome_courses_remaining") - 1)
+        if not updated:
+            raise RewardClaimError(
+                "Ya has reclamado todos tus cursos de recompensa disponibles."
+            )
+
+        remaining = Membership.objects.filter(id=membership["id"]).values_list(
+            "welcome_courses_remaining", flat=True
+        ).get()
+        MembershipHistory.objects.create(
+            membership_id=membership["id"],
+            action="reward_claimed",
+            details={"course_id": course_id, "remaining_rewards": remaining},
+        )
+    return remaining
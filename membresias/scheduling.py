@@ -0,0 +1,202 @@
+# membresias/scheduling.py
+"""
+Agenda de consultas.
+
+``ConsultationRequest`` solo guardaba una fecha libre: nada impedía reservar
+dos veces el mismo turno ni respetaba ``duration_minutes`` o el cupo del tipo.
+Aquí:
+
+- Los turnos salen de las franjas semanales (``ConsultationAvailability``)
+  cortadas cada ``duration_minutes``.
+- ``IntervalIndex`` guarda las reservas activas ordenadas por inicio; contar
+  las que se superponen con un turno es una búsqueda binaria más las pocas
+  reservas cercanas (nunca más largas que la duración máxima).
+- ``free_slots`` calcula todos los turnos libres de los próximos días con dos
+  consultas (franjas y reservas del rango), sin una consulta por turno.
+- ``book_consultation`` reserva con la fila del tipo de consulta bloqueada,
+  así dos reservas simultáneas del mismo tipo no superan el cupo.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import DateTimeField, ExpressionWrapper, F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    ConsultationAvailability,
+    ConsultationRequest,
+    ConsultationType,
+    Membership,
+    MembershipHistory,
+)
+
+DEFAULT_DAYS = 30
+
+
+class SlotUnavailableError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class IntervalIndex:
+    """Intervalos ``[inicio, fin)`` ordenados por inicio."""
+
+    def __init__(self, intervals=()):
+        intervals = sorted(intervals)
+        self.starts = [start for start, _end in intervals]
+        self.ends = [end for _start, end in intervals]
+        self.max_length = max(
+            (end - start for start, end in intervals), default=timedelta(0)
+        )
+
+    def overlapping(self, start, end):
+        """Cantidad de intervalos que se superponen con ``[start, end)``."""
+        # Solo pueden superponerse los que empiezan en (start - max_length, end)
+        low = bisect_right(self.starts, start - self.max_length)
+        high = bisect_left(self.starts, end)
+        return sum(1 for i in range(low, high) if self.ends[i] > start)
+
+
+def _active_requests(consultation_type, start, end):
+    """Reservas activas del tipo que se superponen con ``[start, end)``, con su fin en ``until``."""
+    duration = timedelta(minutes=consultation_type.duration_minutes)
+    return (
+        ConsultationRequest.objects.filter(
+            consultation_type=consultation_type,
+            status__in=ConsultationRequest.ACTIVE_STATUSES,
+            requested_date__lt=end,
+        )
+        # Las solicitudes anteriores a la agenda no tienen ends_at: duran lo que su tipo
+        .annotate(
+            until=Coalesce(
+                "ends_at",
+                ExpressionWrapper(
+                    F("requested_date") + Value(duration), output_field=DateTimeField()
+                ),
+            )
+        )
+        .filter(until__gt=start)
+    )
+
+
+def _day_slots(windows, day, duration):
+    """Turnos ``(inicio, fin)`` del día según las franjas de su día de la semana."""
+    for window in windows.get(day.weekday(), []):
+        slot_start = timezone.make_aware(datetime.combine(day, window.start_time))
+        window_end = timezone.make_aware(datetime.combine(day, window.end_time))
+        while slot_start + duration <= window_end:
+            yield slot_start, slot_start + duration
+            slot_start += duration
+
+
+def _windows_by_weekday(consultation_type):
+    windows = {}
+    for window in ConsultationAvailability.objects.filter(
+        consultation_type=consultation_type, is_active=True
+    ):
+        windows.setdefault(window.weekday, []).append(window)
+    return windows
+
+
+def free_slots(consultation_type, days=DEFAULT_DAYS, now=None):
+    """
+    Turnos con cupo de los próximos ``days`` días:
+    lista de ``{"start", "end", "remaining"}`` ordenada por inicio.
+    """
+    now = now or timezone.now()
+    duration = timedelta(minutes=consultation_type.duration_minutes)
+    first_day = timezone.localdate(now)
+    range_start = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+    range_end = range_start + timedelta(days=days + 1)
+
+    windows = _windows_by_weekday(consultation_type)
+    booked = IntervalIndex(
+        _active_requests(consultation_type, range_start, range_end).values_list(
+            "requested_date", "until"
+        )
+    )
+
+    slots = []
+    for offset in range(days + 1):
+        for start, end in _day_slots(windows, first_day + timedelta(days=offset), duration):
+            if start <= now:
+                continue
+            remaining = consultation_type.capacity - booked.overlapping(start, end)
+            if remaining > 0:
+                slots.append({"start": start, "end": end, "remaining": remaining})
+    return slots
+
+
+def _is_offered_slot(consultation_type, start):
+    duration = timedelta(minutes=consultation_type.duration_minutes)
+    day = timezone.localdate(start)
+    return any(
+        slot_start == start
+        for slot_start, _end in _day_slots(_windows_by_weekday(consultation_type), day, duration)
+    )
+
+
+def book_consultation(user, consultation_type_id, start, notes=""):
+    """
+    Reserva el turno que empieza en ``start`` con la membresía activa de
+    ``user`` y descuenta una consulta. Retorna la ``ConsultationRequest`` o
+    lanza ``SlotUnavailableError``.
+    """
+    if start <= timezone.now():
+        raise SlotUnavailableError("El turno seleccionado ya pasó.")
+
+    membership = (
+        Membership.objects.filter(
+            user=user, status="active", plan__consultation_types=consultation_type_id
+        )
+        .order_by("-end_date")
+        .first()
+    )
+    if not membership:
+        raise SlotUnavailableError("Tu membresía no incluye este tipo de consulta.")
+
+    with transaction.atomic():
+        # Serializa las reservas del tipo: el conteo y la inserción no se intercalan
+        consultation_type = (
+            ConsultationType.objects.select_for_update()
+            .filter(id=consultation_type_id, is_active=True)
+            .first()
+        )
+        if not consultation_type:
+            raise SlotUnavailableError("Este tipo de consulta no está disponible.")
+        if not _is_offered_slot(consultation_type, start):
+            raise SlotUnavailableError("El horario seleccionado no es un turno disponible.")
+
+        end = start + timedelta(minutes=consultation_type.duration_minutes)
+        taken = _active_requests(consultation_type, start, end)
+        if taken.filter(user=user).exists():
+            raise SlotUnavailableError("Ya tienes una reserva en este horario.")
+        if taken.count() >= consultation_type.capacity:
+            raise SlotUnavailableError("El turno seleccionado ya no tiene cupos.")
+
+        updated = Membership.objects.filter(
+            id=membership.id, consultations_remaining__gt=0
+        ).update(consultations_remaining=F("consultations_remaining") - 1)
+        if not updated:
+            raise SlotUnavailableError("No te quedan consultas disponibles.")
+
+        consultation = ConsultationRequest.objects.create(
+            user=user,
+            membership=membership,
+            consultation_type=consultation_type,
+            requested_date=start,
+            notes=notes,
+        )
+        MembershipHistory.objects.create(
+            membership=membership,
+            action="consultation_used",
+            details={
+                "consultation_request_id": consultation.id,
+                "consultation_type": consultation_type.slug,
+                "requested_date": start.isoformat(),
+            },
+        )
+    return consultation
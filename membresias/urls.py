@@ -18,4 +18,7 @@ urlpatterns = [
     path("cursos-bienvenida/", views.welcome_courses, name="welcome_courses"),
     path("reclamar-curso/<int:course_id>/", views.claim_reward_course, name="claim_reward_course"),
     path("saltar-bienvenida/", views.skip_welcome_courses, name="skip_welcome_courses"),
+    # Agenda de consultas
+    path("consultas/<slug:slug>/turnos/", views.consultation_slots, name="consultation_slots"),
+    path("consultas/<slug:slug>/reservar/", views.book_consultation, name="book_consultation"),
 ]
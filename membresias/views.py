@@ -4,11 +4,14 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 from django.utils import timezone
-from .models import MembershipPlan, Membership
-from cursos.models import Course
+from django.utils.dateparse import parse_datetime
+from .models import ConsultationType, MembershipPlan, Membership
 from pagos.utils import create_payment
+from plataforma_cursos.middleware.user_context import get_user_context
+from .rewards import RewardClaimError, claim_reward_course as claim_reward
+from .scheduling import SlotUnavailableError, book_consultation as book_slot, free_slots
 
 
 def plan_list(request):
@@ -25,9 +28,7 @@ def plan_list(request):
 def plan_detail(request, slug):
     """Vista para mostrar los detalles de un plan específico."""
     plan = get_object_or_404(MembershipPlan, slug=slug, is_active=True)
-    user_membership = Membership.objects.filter(
-        user=request.user, status="active"
-    ).first()
+    user_membership = get_user_context(request).active_membership
 
     context = {
         "plan": plan,
@@ -43,9 +44,7 @@ def purchase_membership(request, plan_id):
     plan = get_object_or_404(MembershipPlan, id=plan_id, is_active=True)
 
     # Verificar si el usuario ya tiene una membresía activa
-    active_membership = Membership.objects.filter(
-        user=request.user, status="active"
-    ).first()
+    active_membership = get_user_context(request).active_membership
 
     if active_membership:
         messages.warning(
@@ -109,9 +108,7 @@ def cancel_membership(request, membership_id):
 def welcome_courses(request):
     """Vista para mostrar los cursos de bienvenida disponibles para reclamar."""
     # Obtener la membresía activa del usuario
-    membership = Membership.objects.filter(
-        user=request.user, status="active"
-    ).first()
+    membership = get_user_context(request).active_membership
     
     if not membership:
         messages.error(request, _("No tienes una membresía activa."))
@@ -175,116 +172,23 @@ def welcome_courses(request):
 @require_POST
 def claim_reward_course(request, course_id):
     """Vista para reclamar un curso de recompensa."""
-    from django.db import transaction
-    
-    with transaction.atomic():
-        course = get_object_or_404(Course, id=course_id)
-        
-        # Obtener la membresía activa del usuario con lock
-        membership = Membership.objects.select_for_update().filter(
-            user=request.user, status="active"
-        ).first()
-        
-        if not membership:
-            return JsonResponse({
-                "success": False,
-                "message": _("No tienes una membresía activa.")
-            })
-        
-        # VALIDACIÓN CRÍTICA: Verificar si ya tiene un UserCourse para este curso
-        from cursos.models import UserCourse
-        if UserCourse.objects.filter(user=request.user, course=course).exists():
-            return JsonResponse({
-                "success": False,
-                "message": _("Ya tienes acceso a este curso.")
-            })
-        
-        # VALIDACIONES ADICIONALES ANTES DE RECLAMAR
-        # 1. Verificar que aún puede reclamar cursos
-        if membership.welcome_courses_remaining <= 0:
-            return JsonResponse({
-                "success": False,
-                "message": _("Ya has reclamado todos tus cursos de recompensa disponibles.")
-            })
-        
-        # 2. Verificar que el curso no fue reclamado anteriormente
-        if membership.welcome_courses_claimed.filter(id=course.id).exists():
-            return JsonResponse({
-                "success": False,
-                "message": _("Ya has reclamado este curso anteriormente.")
-            })
-        
-        # 3. Verificar que el curso está disponible para su plan
-        available_courses = membership.get_available_reward_courses()
-        if course not in available_courses:
-            return JsonResponse({
-                "success": False,
-                "message": _("Este curso no está disponible para tu plan.")
-            })
-        
-        # 4. Verificar que es un curso de recompensa
-        if not course.is_membership_reward:
-            return JsonResponse({
-                "success": False,
-                "message": _("Este curso no es una recompensa.")
-            })
-        
-        # 5. Verificar que el plan del usuario puede reclamar este curso
-        if not course.reward_for_plans.filter(id=membership.plan.id).exists():
-            return JsonResponse({
-                "success": False,
-                "message": _("Tu plan no puede reclamar este curso.")
-            })
-        
-        # Intentar reclamar el curso (con todas las validaciones internas)
-        success, message = membership.claim_reward_course(course)
-        
-        if success:
-            # Crear registro de acceso al curso para el usuario SOLO si no existe
-            user_course, created = UserCourse.objects.get_or_create(
-                user=request.user,
-                course=course,
-                defaults={
-                    'access_start': timezone.now(),
-                    'progress': 0.0,
-                    'completed': False
-                }
-            )
-            
-            if not created:
-                # Si ya existía el UserCourse, esto es un error - debemos revertir el reclamo
-                # Esto no debería pasar, pero es una medida de seguridad
-                membership.welcome_courses_claimed.remove(course)
-                membership.welcome_courses_remaining += 1
-                membership.save()
-                
-                return JsonResponse({
-                    "success": False,
-                    "message": _("Error: Ya tienes acceso a este curso.")
-                })
-            
-            # Recargar membership para obtener los datos actualizados
-            membership.refresh_from_db()
-            
-            return JsonResponse({
-                "success": True,
-                "message": message,
-                "courses_remaining": membership.welcome_courses_remaining,
-                "redirect_url": "/usuarios/dashboard/" if membership.welcome_courses_remaining == 0 else None
-            })
-        else:
-            return JsonResponse({
-                "success": False,
-                "message": message
-            })
+    try:
+        remaining = claim_reward(request.user, course_id)
+    except RewardClaimError as e:
+        return JsonResponse({"success": False, "message": e.message})
+
+    return JsonResponse({
+        "success": True,
+        "message": _("Curso de recompensa reclamado exitosamente"),
+        "courses_remaining": remaining,
+        "redirect_url": "/usuarios/dashboard/" if remaining == 0 else None
+    })
 
 
 @login_required
 def skip_welcome_courses(request):
     """Vista para saltar la selección de cursos de bienvenida."""
-    membership = Membership.objects.filter(
-        user=request.user, status="active"
-    ).first()
+    membership = get_user_context(request).active_membership
     
     if membership:
         messages.info(request, _(
@@ -299,9 +203,7 @@ def skip_welcome_courses(request):
 def welcome_courses_debug(request):
     """Vista de debug para probar botones sin problemas de CSS."""
     # Obtener la membresía activa del usuario
-    membership = Membership.objects.filter(
-        user=request.user, status="active"
-    ).first()
+    membership = get_user_context(request).active_membership
     
     if not membership:
         messages.error(request, _("No tienes una membresía activa."))
@@ -353,4 +255,57 @@ def welcome_courses_debug(request):
         "courses_remaining": membership.welcome_courses_remaining,
     }
     
-    return render(request, "membresias/welcome_courses_debug.html", context)
\ No newline at end of file
+    return render(request, "membresias/welcome_courses_debug.html", context)
+
+
+@login_required
+@require_GET
+def consultation_slots(request, slug):
+    """Turnos libres de un tipo de consulta para los próximos días (JSON)."""
+    consultation_type = get_object_or_404(ConsultationType, slug=slug, is_active=True)
+    try:
+        days = min(max(int(request.GET.get("days", 30)), 1), 60)
+    except ValueError:
+        days = 30
+
+    slots = free_slots(consultation_type, days=days)
+    return JsonResponse({
+        "consultation_type": consultation_type.slug,
+        "duration_minutes": consultation_type.duration_minutes,
+        "slots": [
+            {
+                "start": slot["start"].isoformat(),
+                "end": slot["end"].isoformat(),
+                "remaining": slot["remaining"],
+            }
+            for slot in slots
+        ],
+    })
+
+
+@login_required
+@require_POST
+def book_consultation(request, slug):
+    """Reserva un turno de consulta (``start`` en ISO 8601)."""
+    consultation_type = get_object_or_404(ConsultationType, slug=slug, is_active=True)
+    start = parse_datetime(request.POST.get("start", ""))
+    if start is None:
+        return JsonResponse({"success": False, "message": _("Fecha de turno inválida.")}, status=400)
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start)
+
+    try:
+        consultation = book_slot(
+            request.user, consultation_type.id, start, notes=request.POST.get("notes", "")
+        )
+    except SlotUnavailableError as e:
+        return JsonResponse({"success": False, "message": e.message}, status=409)
+
+    get_user_context(request).invalidate()
+    return JsonResponse({
+        "success": True,
+        "message": _("Consulta reservada exitosamente"),
+        "consultation_id": consultation.id,
+        "start": consultation.requested_date.isoformat(),
+        "end": consultation.ends_at.isoformat(),
+    })
@@ -0,0 +1,61 @@
+# pagos/expiry.py
+"""
+Barrido de pagos del carrito abandonados.
+
+Un pago del carrito queda ``"pending"`` hasta que Webpay vuelve al sitio; si
+el usuario cierra la pestaña, nunca vuelve y el pago queda pendiente para
+siempre, junto con el cupo de campaña reservado al crearlo
+(``cursos.discounts``). Este barrido pasa a ``"timeout"`` los pagos del
+carrito pendientes hace más de ``PAYMENT_PENDING_TIMEOUT_MINUTES`` minutos,
+con ``UPDATE`` por lotes (índice ``(status, created_at)``), y devuelve sus
+canjes al cupo en la misma transacción.
+
+Cada lote toma sus filas con ``SELECT ... FOR UPDATE SKIP LOCKED``, igual que
+``membresias.expiry``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from cursos.discounts import release_payment_redemptions
+from .models import Payment
+
+BATCH_SIZE = 1000
+
+
+def _expire_batch(cutoff, now, batch_size):
+    with transaction.atomic():
+        payment_ids = list(
+            Payment.objects.filter(status="pending", payment_type="cart", created_at__lte=cutoff)
+            .order_by("created_at")
+            .select_for_update(skip_locked=True)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not payment_ids:
+            return 0
+
+        Payment.objects.filter(id__in=payment_ids).update(
+            status="timeout",
+            transbank_status="TIMEOUT",
+            error_message="Pago pendiente vencido sin respuesta de Webpay",
+            updated_at=now,
+        )
+        release_payment_redemptions(payment_ids)
+    return len(payment_ids)
+
+
+def expire_pending_payments(now=None, batch_size=BATCH_SIZE):
+    """
+    Vence los pagos del carrito pendientes más antiguos que
+    ``PAYMENT_PENDING_TIMEOUT_MINUTES``. Retorna la cantidad vencida.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(minutes=settings.PAYMENT_PENDING_TIMEOUT_MINUTES)
+    total = 0
+    while True:
+        expired = _expire_batch(cutoff, now, batch_size)
+        total += expired
+        if expired < batch_size:
+            return total
@@ -0,0 +1,236 @@
+# pagos/fulfillment.py
+"""
+Entrega de una compra del carrito.
+
+La entrega estaba copiada en cuatro vistas (``confirm_cart_payment``,
+``webpay_return``, ``process_free_payment`` y ``_process_successful_payment``
+en ``views`` y ``views_enhanced``): cada una recorría los ítems con un
+``UserCourse.get_or_create`` y una búsqueda de membresía por ítem, fuera de
+toda transacción, y ``check_payment_status`` podía entregar dos veces el
+mismo pago.
+
+``fulfill_order`` hace la entrega en una sola transacción con el pago
+bloqueado (``select_for_update``) y la marca en ``Payment.fulfilled_at``; una
+segunda llamada con el mismo pago, simultánea o posterior, ve la marca y no
+repite nada. Los cursos se otorgan con un solo ``bulk_create`` y la membresía
+se crea o actualiza una vez.
+
+El carrito se toma del pago (``content_object``, asignado en
+``initiate_cart_payment``); los pagos anteriores sin carrito asociado usan el
+carrito activo del usuario. El carrito sigue editable mientras el usuario
+está en Webpay, así que el pago guarda su versión (``cart_version``): si al
+volver el carrito cambió, o el total de sus ítems ya no coincide con el
+monto pagado, no se entrega nada, el pago queda marcado en
+``error_message`` para revisión manual y se lanza ``FulfillmentError``.
+
+Un pago reemplazado por otro intento o vencido por ``pagos.expiry`` ya
+devolvió su cupo de campaña; si Webpay lo aprueba igual (otra pestaña, un
+retorno tardío), la entrega vuelve a descontarlo (``reclaim_redemptions``) y,
+si ya no queda cupo, no entrega nada y lo deja para revisión manual.
+
+Solo ``fulfill_order`` pasa un pago a ``"completed"``. Los demás cambios de
+estado (rechazo, falla, cancelación, error) usan ``fail_pending_payment``, un
+``UPDATE`` condicionado a ``status="pending"``: una respuesta tardía o una
+consulta de estado nunca degradan un pago ya entregado ni borran su
+``fulfilled_at``.
+"""
+import logging
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from carrito.models import Cart
+from cursos.discounts import DiscountError, reclaim_redemptions, release_redemptions
+from cursos.models import UserCourse
+from membresias.models import Membership
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+CART_CHANGED_MESSAGE = (
+    "Tu carrito cambió mientras completabas el pago. "
+    "Contacta con soporte para completar tu compra."
+)
+
+
+class FulfillmentError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class Fulfillment:
+    """Resultado de la entrega: ítems comprados y qué se otorgó."""
+
+    def __init__(self, payment, items, created):
+        self.payment = payment
+        self.items = items
+        # False si el pago ya se había entregado antes
+        self.created = created
+        self.has_new_courses = any(item.item_type == "course" for item in items)
+        self.has_new_membership = any(item.item_type == "membership" for item in items)
+
+    def session_data(self):
+        """Datos para la página de confirmación (``purchase_success``)."""
+        return {
+            "payment_id": self.payment.id,
+            "purchased_items": [
+                {
+                    "item_type": item.item_type,
+                    "course_title": item.course.title if item.course else None,
+                    "membership_name": item.membership_plan.name if item.membership_plan else None,
+                    "price_applied": float(item.price_applied),
+                }
+                for item in self.items
+            ],
+            "has_new_membership": self.has_new_membership,
+            "has_new_courses": self.has_new_courses,
+            "total_amount": float(self.payment.amount),
+        }
+
+
+def fail_pending_payment(payment, status="failed", **fields):
+    """
+    Pasa el pago a ``status`` (y guarda ``fields``) solo si sigue pendiente,
+    sin reescribir la fila completa: un pago ya entregado nunca se degrada.
+    Libera su cupo de campaña (el ``UPDATE`` no dispara la señal
+    ``post_save``). Retorna True si el pago cambió.
+    """
+    if not Payment.objects.filter(pk=payment.pk, status="pending").update(
+        status=status, updated_at=timezone.now(), **fields
+    ):
+        return False
+    payment.status = status
+    for name, value in fields.items():
+        setattr(payment, name, value)
+    release_redemptions(payment)
+    return True
+
+
+def record_transbank_response(payment, resp):
+    """Guarda los datos de la respuesta de Transbank sin tocar el estado del pago."""
+    fields = {
+        "transbank_status": resp.get("status"),
+        "response_code": str(resp.get("response_code", "")),
+        "authorization_code": resp.get("authorization_code") or "",
+    }
+    Payment.objects.filter(pk=payment.pk, fulfilled_at__isnull=True).update(
+        updated_at=timezone.now(), **fields
+    )
+    for name, value in fields.items():
+        setattr(payment, name, value)
+
+
+def _payment_cart(payment):
+    # El bloqueo del carrito espera a cualquier cambio de ítems en curso (bump_version)
+    carts = Cart.objects.select_for_update()
+    if payment.object_id and payment.content_type_id == ContentType.objects.get_for_model(Cart).id:
+        return carts.filter(pk=payment.object_id, user_id=payment.user_id).first()
+    if payment.fulfilled_at:
+        # El carrito activo actual no es el de este pago
+        return None
+    return carts.filter(user_id=payment.user_id, is_active=True).first()
+
+
+def _snapshot_problem(payment, cart, items):
+    """Motivo por el que el carrito ya no es el que se pagó, o None."""
+    if cart and payment.cart_version is not None and cart.version != payment.cart_version:
+        return "El carrito cambió durante el pago; la compra requiere revisión manual."
+    discount = cart.discount_amount if cart else 0
+    total = max(sum(item.price_applied for item in items) - discount, 0)
+    if total != payment.amount:
+        return (
+            f"El total del carrito (${total:,.0f}) no coincide con el monto pagado "
+            f"(${payment.amount:,.0f}); la compra requiere revisión manual."
+        )
+    return None
+
+
+def _upsert_membership(user_id, plan):
+    membership = (
+        Membership.objects.select_for_update().filter(user_id=user_id, status="active").first()
+    )
+    if membership:
+        # Actualizar membresía existente
+        membership.plan = plan
+        membership.courses_remaining = plan.courses_per_month
+        membership.consultations_remaining = plan.consultations
+        membership.save()
+    else:
+        Membership.objects.create(
+            user_id=user_id,
+            plan=plan,
+            status="active",
+            courses_remaining=plan.courses_per_month,
+            consultations_remaining=plan.consultations,
+        )
+
+
+def fulfill_order(payment):
+    """
+    Otorga los cursos y la membresía del carrito pagado con ``payment``,
+    marca el pago como completado y entregado y cierra el carrito. Es
+    idempotente: retorna un ``Fulfillment`` con ``created=False`` si el pago
+    ya se había entregado. Lanza ``FulfillmentError`` si el carrito no es el
+    que se pagó.
+    """
+    problem = None
+    with transaction.atomic():
+        locked = Payment.objects.select_for_update().get(pk=payment.pk)
+        cart = _payment_cart(locked)
+        items = []
+        if cart:
+            items = list(
+                cart.items.select_related("course", "membership_plan").order_by("added_at")
+            )
+        if locked.fulfilled_at:
+            return Fulfillment(locked, items, created=False)
+
+        now = timezone.now()
+        problem = _snapshot_problem(locked, cart, items)
+        if not problem:
+            try:
+                reclaim_redemptions(locked)
+            except DiscountError as e:
+                problem = (
+                    f"{e.message} El pago se aprobó después de liberar su cupo de campaña; "
+                    "la compra requiere revisión manual."
+                )
+        if problem:
+            # Se guarda la marca para revisión sin entregar nada
+            Payment.objects.filter(pk=locked.pk).update(error_message=problem, updated_at=now)
+            fail_pending_payment(locked, status="error")
+        else:
+            UserCourse.objects.bulk_create(
+                [
+                    UserCourse(user_id=locked.user_id, course_id=item.course_id)
+                    for item in items
+                    if item.item_type == "course" and item.course_id
+                ],
+                ignore_conflicts=True,
+            )
+
+            # Solo se permite una membresía por carrito
+            plans = [item.membership_plan for item in items if item.item_type == "membership"]
+            if plans and plans[0]:
+                _upsert_membership(locked.user_id, plans[0])
+
+            if cart and cart.is_active:
+                Cart.objects.filter(pk=cart.pk).update(is_active=False, updated_at=now)
+
+            Payment.objects.filter(pk=locked.pk).update(
+                status="completed", fulfilled_at=now, updated_at=now
+            )
+            locked.status = "completed"
+            locked.fulfilled_at = now
+
+    if problem:
+        logger.error("Pago %s sin entregar: %s", locked.pk, problem)
+        payment.status = locked.status
+        payment.error_message = problem
+        raise FulfillmentError(problem)
+
+    payment.status = locked.status
+    payment.fulfilled_at = locked.fulfilled_at
+    return Fulfillment(locked, items, created=True)
@@ -0,0 +1,19 @@
+# pagos/management/commands/expire_pending_payments.py
+from django.core.management.base import BaseCommand
+from pagos.expiry import BATCH_SIZE, expire_pending_payments
+
+
+class Command(BaseCommand):
+    help = 'Vence los pagos del carrito pendientes abandonados y libera sus cupos de descuento (apto para cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Pagos actualizados por transacción'
+        )
+
+    def handle(self, *args, **options):
+        expired = expire_pending_payments(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Pagos pendientes vencidos: {expired}'))
@@ -0,0 +1,32 @@
+# pagos/management/commands/run_renewals.py
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from pagos.renewals import CHUNK_SIZE, run_renewals
+
+
+class Command(BaseCommand):
+    help = 'Cobra y renueva las membresías con renovación automática próximas a vencer (se puede reanudar)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Membresías procesadas por lote'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Cobros simultáneos (por defecto RENEWAL_WORKERS)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            totals = run_renewals(chunk_size=options['chunk_size'], workers=options['workers'])
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Membresías renovadas: {totals['renewed']} (cobros rechazados: {totals['failed']})"
+            )
+        )
@@ -73,6 +73,15 @@ class Payment(models.Model):
     session_id = models.CharField(
         _("ID de sesión"), max_length=100, null=True, blank=True
     )
+    # Cobros automáticos (pagos.renewals): evita duplicar el cobro al reintentar
+    idempotency_key = models.CharField(
+        _("clave de idempotencia"), max_length=100, unique=True, null=True, blank=True
+    )
+
+    # Entrega de la compra (pagos.fulfillment): marca que evita entregar dos veces
+    fulfilled_at = models.DateTimeField(_("entregado en"), null=True, blank=True)
+    # Versión del carrito al iniciar el pago: la entrega rechaza un carrito modificado
+    cart_version = models.PositiveIntegerField(_("versión del carrito"), null=True, blank=True)
 
     # Campos para la relación genérica
     content_type = models.ForeignKey(
@@ -88,6 +97,10 @@ class Payment(models.Model):
         verbose_name = _("pago")
         verbose_name_plural = _("pagos")
         ordering = ["-created_at"]
+        indexes = [
+            # Barrido de pagos pendientes abandonados (pagos.expiry)
+            models.Index(fields=["status", "created_at"]),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.amount} - {self.get_status_display()}"
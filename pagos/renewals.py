@@ -0,0 +1,277 @@
+# pagos/renewals.py
+"""
+Renovación automática de membresías.
+
+``Membership.auto_renew`` no tenía efecto: cada renovación era un checkout
+manual. ``run_renewals`` recorre por lotes (keyset sobre ``id``) las
+membresías activas con renovación automática que vencen dentro de
+``RENEWAL_LEAD_HOURS`` y, por lote:
+
+1. Crea sus ``Payment`` pendientes con un solo ``bulk_create``. Cada pago
+   lleva una ``idempotency_key`` única por membresía y periodo
+   (``renewal:<id>:<end_date>``), así una ejecución repetida reutiliza el pago
+   existente en lugar de crear otro.
+2. Cobra los pagos pendientes en un pool acotado de hilos. Los hilos solo
+   hablan con la pasarela (E/S de red); no tocan la base de datos.
+3. Registra cada resultado en una transacción corta: marca el pago y, si se
+   aprobó, extiende la membresía con un ``UPDATE`` condicionado a su
+   ``end_date`` original, por lo que nunca se extiende dos veces.
+
+Si el proceso muere entre el cobro y el registro, el pago queda pendiente y
+la siguiente ejecución vuelve a cobrarlo con la misma clave: la pasarela debe
+devolver el resultado original sin cobrar de nuevo. Esos pagos pendientes se
+concilian aunque la membresía ya no esté en la ventana de renovación (por
+ejemplo, si ``expire_memberships`` la expiró entretanto): un cobro aprobado
+reactiva la membresía expirada y la extiende desde su ``end_date`` original.
+
+La pasarela se elige con ``RENEWAL_GATEWAY`` (ruta a una subclase de
+``RenewalGateway``); ``FakeGateway`` aprueba todo localmente.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from membresias.models import Membership, MembershipHistory
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 200
+RENEWAL_DAYS = 30
+
+
+class ChargeResult:
+    """Respuesta de la pasarela a un cobro."""
+
+    def __init__(self, success, transaction_id=None, authorization_code=None, error_message=None):
+        self.success = success
+        self.transaction_id = transaction_id
+        self.authorization_code = authorization_code
+        self.error_message = error_message
+
+
+class RenewalGateway:
+    """
+    Interfaz de cobro recurrente. ``charge`` recibe un dict con ``user_id``,
+    ``amount``, ``description`` e ``idempotency_key``, y debe ser idempotente
+    por clave. Se llama desde varios hilos a la vez.
+    """
+
+    def charge(self, charge):
+        raise NotImplementedError
+
+
+class FakeGateway(RenewalGateway):
+    """Pasarela local para desarrollo y pruebas: aprueba salvo los usuarios en ``decline_user_ids``."""
+
+    def __init__(self, decline_user_ids=()):
+        self.decline_user_ids = set(decline_user_ids)
+        self.charges = {}
+
+    def charge(self, charge):
+        key = charge["idempotency_key"]
+        if charge["user_id"] in self.decline_user_ids:
+            result = ChargeResult(False, error_message="Tarjeta rechazada")
+        else:
+            result = ChargeResult(True, transaction_id=f"fake-{key}", authorization_code="000000")
+        # setdefault es atómico: un cobro repetido con la misma clave ve el resultado original
+        return self.charges.setdefault(key, result)
+
+
+def get_gateway():
+    if not settings.RENEWAL_GATEWAY:
+        raise ImproperlyConfigured("RENEWAL_GATEWAY no está configurado.")
+    return import_string(settings.RENEWAL_GATEWAY)()
+
+
+def renewal_key(membership_id, end_date):
+    return f"renewal:{membership_id}:{end_date:%Y%m%d%H%M%S}"
+
+
+MEMBERSHIP_FIELDS = (
+    "id",
+    "user_id",
+    "end_date",
+    "plan__name",
+    "plan__price",
+    "plan__courses_per_month",
+    "plan__consultations",
+)
+PAYMENT_FIELDS = ("id", "user_id", "amount", "description", "idempotency_key")
+
+
+def _due_filter(now):
+    return Q(
+        status="active",
+        auto_renew=True,
+        end_date__lte=now + timedelta(hours=settings.RENEWAL_LEAD_HOURS),
+    )
+
+
+def _due_memberships(now, after_id, chunk_size):
+    return list(
+        Membership.objects.filter(_due_filter(now), id__gt=after_id)
+        .order_by("id")
+        .values(*MEMBERSHIP_FIELDS)[:chunk_size]
+    )
+
+
+def _outstanding_renewals(now, content_type, after_id, chunk_size):
+    """
+    Pagos de renovación pendientes cuya membresía ya no está en la ventana
+    (expirada, sin renovación automática, etc.), con los datos de la
+    membresía, por lotes sobre el ``id`` del pago. Las membresías en la
+    ventana los reintentan en ``_pending_payments``.
+    """
+    payments = list(
+        Payment.objects.filter(
+            id__gt=after_id,
+            status="pending",
+            content_type=content_type,
+            idempotency_key__startswith="renewal:",
+        )
+        .exclude(object_id__in=Membership.objects.filter(_due_filter(now)).values("id"))
+        .order_by("id")
+        .values("object_id", *PAYMENT_FIELDS)[:chunk_size]
+    )
+    memberships = {
+        m["id"]: m
+        for m in Membership.objects.filter(
+            id__in=[payment["object_id"] for payment in payments]
+        ).values(*MEMBERSHIP_FIELDS)
+    }
+    return payments, [
+        (payment, memberships[payment["object_id"]])
+        for payment in payments
+        if payment["object_id"] in memberships
+    ]
+
+
+def _charge(gateway, payment):
+    try:
+        return gateway.charge(payment)
+    except Exception:
+        # Error transitorio: el pago queda pendiente para la próxima ejecución
+        logger.exception("Error al cobrar la renovación %s", payment["idempotency_key"])
+        return None
+
+
+def _pending_payments(memberships, content_type):
+    """Crea los pagos que falten y retorna los pendientes por clave."""
+    by_key = {renewal_key(m["id"], m["end_date"]): m for m in memberships}
+    Payment.objects.bulk_create(
+        [
+            Payment(
+                user_id=m["user_id"],
+                amount=m["plan__price"],
+                description=f"Renovación membresía {m['plan__name']}",
+                payment_type="membership",
+                content_type=content_type,
+                object_id=m["id"],
+                idempotency_key=key,
+            )
+            for key, m in by_key.items()
+        ],
+        ignore_conflicts=True,
+    )
+    payments = Payment.objects.filter(
+        idempotency_key__in=list(by_key), status="pending"
+    ).values(*PAYMENT_FIELDS)
+    return [(payment, by_key[payment["idempotency_key"]]) for payment in payments]
+
+
+def _apply_result(payment, membership, result, now):
+    with transaction.atomic():
+        updated = Payment.objects.filter(id=payment["id"], status="pending").update(
+            status="completed" if result.success else "failed",
+            transaction_id=result.transaction_id,
+            authorization_code=result.authorization_code,
+            error_message=result.error_message,
+            updated_at=now,
+        )
+        if not updated or not result.success:
+            return False
+
+        # Una membresía expirada mientras el cobro estaba pendiente se reactiva
+        extended = Membership.objects.filter(
+            id=membership["id"],
+            end_date=membership["end_date"],
+            status__in=("active", "expired"),
+        ).update(
+            status="active",
+            end_date=F("end_date") + timedelta(days=RENEWAL_DAYS),
+            courses_remaining=membership["plan__courses_per_month"],
+            consultations_remaining=membership["plan__consultations"],
+            updated_at=now,
+        )
+        if extended:
+            MembershipHistory.objects.create(
+                membership_id=membership["id"],
+                action="renewed",
+                details={
+                    "payment_id": payment["id"],
+                    "previous_end_date": membership["end_date"].isoformat(),
+                    "source": "run_renewals",
+                },
+            )
+        else:
+            # Cobrado, pero la membresía cambió (cancelada o renovada por otra vía)
+            logger.warning(
+                "Renovación %s cobrada sin extender la membresía %s",
+                payment["idempotency_key"],
+                membership["id"],
+            )
+        return bool(extended)
+
+
+def _charge_and_apply(executor, gateway, pending, now, totals):
+    results = executor.map(
+        lambda payment: _charge(gateway, payment), [payment for payment, _m in pending]
+    )
+    for (payment, membership), result in zip(pending, results):
+        if result is None:
+            continue
+        if _apply_result(payment, membership, result, now):
+            totals["renewed"] += 1
+        elif not result.success:
+            totals["failed"] += 1
+
+
+def run_renewals(gateway=None, now=None, chunk_size=CHUNK_SIZE, workers=None):
+    """
+    Renueva las membresías que vencen pronto y concilia los cobros de
+    renovación que quedaron pendientes. Retorna un dict con ``renewed`` y
+    ``failed``.
+    """
+    gateway = gateway or get_gateway()
+    now = now or timezone.now()
+    workers = workers or settings.RENEWAL_WORKERS
+    content_type = ContentType.objects.get_for_model(Membership)
+    totals = {"renewed": 0, "failed": 0}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        after_id = 0
+        while True:
+            payments, pending = _outstanding_renewals(now, content_type, after_id, chunk_size)
+            if not payments:
+                break
+            after_id = payments[-1]["id"]
+            _charge_and_apply(executor, gateway, pending, now, totals)
+
+        after_id = 0
+        while True:
+            memberships = _due_memberships(now, after_id, chunk_size)
+            if not memberships:
+                return totals
+            after_id = memberships[-1]["id"]
+            _charge_and_apply(
+                executor, gateway, _pending_payments(memberships, content_type), now, totals
+            )
@@ -4,9 +4,19 @@ from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 from django.utils import timezone
+from django.db import transaction
+from django.contrib.contenttypes.models import ContentType
 from .models import Payment
-from carrito.models import Cart, CartItem
+from .fulfillment import (
+    CART_CHANGED_MESSAGE,
+    FulfillmentError,
+    fail_pending_payment,
+    fulfill_order,
+    record_transbank_response,
+)
+from cursos.discounts import DiscountError, redeem_campaign, release_payment_redemptions
 from membresias.models import MembershipPlan
+from plataforma_cursos.middleware.user_context import get_user_context
 from .webpay_config import crear_transaccion, confirmar_transaccion
 import logging
 
@@ -70,29 +80,58 @@ def cancel_payment(request, payment_id):
 
 @login_required
 def initiate_cart_payment(request):
-    cart = Cart.objects.filter(user=request.user, is_active=True).first()
-    if not cart or not cart.items.exists():
+    # Total (con el cupón aplicado) y descripción desde el resumen del carrito
+    summary = get_user_context(request).cart_summary
+    if not summary or not summary.item_count:
         messages.error(request, "Tu carrito está vacío.")
-        return redirect("carrito:cart_detail")    # Calcular el total
-    total = sum(item.price_applied for item in cart.items.all())
-    description = "Compra de "
-    items_desc = []
-    for item in cart.items.all():
-        if item.item_type == "course" and item.course:
-            items_desc.append(f"Curso: {item.course.title}")
-        elif item.item_type == "membership" and item.membership_plan:
-            items_desc.append(f"Membresía: {item.membership_plan.name}")
-
-    description += ", ".join(items_desc)    # Crear el pago
-    payment = Payment.objects.create(
-        amount=total,
-        description=description,
-        status="pending",
-        payment_type="cart",
-        user=request.user,
-        buy_order=f"ORDER_{request.user.id}_{int(timezone.now().timestamp())}",
-        session_id=str(request.user.id),
-    )
+        return redirect("carrito:cart_detail")
+    total = summary.total
+    cart = get_user_context(request).cart
+
+    try:
+        with transaction.atomic():
+            # Un nuevo intento reemplaza a los pagos pendientes del mismo carrito
+            # (pestaña de Webpay cerrada, doble clic): se cancelan y su reserva
+            # de cupo se libera. El bloqueo espera a una entrega en curso.
+            superseded = list(
+                Payment.objects.select_for_update()
+                .filter(
+                    user=request.user,
+                    payment_type="cart",
+                    status="pending",
+                    content_type=ContentType.objects.get_for_model(cart),
+                    object_id=cart.id,
+                )
+                .values_list("id", flat=True)
+            )
+            if superseded:
+                Payment.objects.filter(id__in=superseded).update(
+                    status="cancelled",
+                    error_message="Reemplazado por un nuevo intento de pago",
+                    updated_at=timezone.now(),
+                )
+                release_payment_redemptions(superseded)
+            payment = Payment.objects.create(
+                amount=total,
+                description=summary.description[:255],
+                status="pending",
+                payment_type="cart",
+                user=request.user,
+                buy_order=f"ORDER_{request.user.id}_{int(timezone.now().timestamp())}",
+                session_id=str(request.user.id),
+                # Carrito que se entrega al aprobarse el pago (pagos.fulfillment)
+                content_object=cart,
+                cart_version=cart.version,
+            )
+            # Reservar el cupo de la campaña junto con el pago; se libera si el pago falla
+            if cart.applied_campaign_id:
+                redeem_campaign(
+                    cart.applied_campaign_id, request.user, payment, summary.coupon_discount
+                )
+    except DiscountError as e:
+        cart.remove_discount()
+        messages.error(request, e.message)
+        return redirect("carrito:cart_detail")
 
     # Si el total es 0, procesar como pago gratuito
     if total == 0:
@@ -118,8 +157,7 @@ def initiate_cart_payment(request):
         return redirect(resp["url"] + "?token_ws=" + resp["token"])
     except Exception as e:
         logger.error(f"Error al iniciar pago Webpay: {e}", exc_info=True)
-        payment.status = "failed"
-        payment.save()
+        fail_pending_payment(payment)
         messages.error(request, f"Error al iniciar el pago: {e}")
         return redirect("carrito:cart_detail")
 
@@ -127,6 +165,9 @@ def initiate_cart_payment(request):
 @login_required
 def confirm_cart_payment(request, payment_id):
     payment = get_object_or_404(Payment, id=payment_id, user=request.user)
+    if payment.fulfilled_at:
+        # Recarga de la URL de retorno: el token ya se confirmó
+        return _process_successful_payment(request, payment)
     token = request.GET.get("token_ws") or payment.transaction_id
     if not token:
         messages.error(request, "Token de pago no recibido.")
@@ -134,82 +175,14 @@ def confirm_cart_payment(request, payment_id):
     try:
         resp = confirmar_transaccion(token)
         if resp.get("status") == "AUTHORIZED":
-            payment.status = "completed"
-            payment.save()
-            
-            # Procesar los items del carrito
-            cart = Cart.objects.filter(user=request.user, is_active=True).first()
-            purchased_items = []
-            has_new_membership = False
-            has_new_courses = False
-            
-            if cart:
-                # Guardar items para mostrar en confirmación
-                purchased_items = list(cart.items.all())
-                
-                for item in cart.items.all():
-                    if item.item_type == "course" and item.course:
-                        from cursos.models import UserCourse
-                        UserCourse.objects.get_or_create(
-                            user=request.user, 
-                            course=item.course,
-                            defaults={'progress': 0.0, 'completed': False}
-                        )
-                        has_new_courses = True
-                    elif item.item_type == "membership" and item.membership_plan:
-                        from membresias.models import Membership
-                        # Verificar si ya existe una membresía activa
-                        existing_membership = Membership.objects.filter(
-                            user=request.user, 
-                            status='active'
-                        ).first()
-                        
-                        if existing_membership:
-                            # Actualizar membresía existente
-                            existing_membership.plan = item.membership_plan
-                            existing_membership.courses_remaining = item.membership_plan.courses_per_month
-                            existing_membership.consultations_remaining = item.membership_plan.consultations
-                            existing_membership.save()
-                        else:
-                            # Crear nueva membresía
-                            Membership.objects.create(
-                                user=request.user,
-                                plan=item.membership_plan,
-                                status="active",
-                                courses_remaining=item.membership_plan.courses_per_month,
-                                consultations_remaining=item.membership_plan.consultations
-                            )
-                        has_new_membership = True
-                
-                cart.is_active = False
-                cart.save()
-            
-            # Guardar información en sesión para la página de confirmación
-            request.session['purchase_success_data'] = {
-                'payment_id': payment.id,
-                'purchased_items': [
-                    {
-                        'item_type': item.item_type,
-                        'course_title': item.course.title if item.course else None,
-                        'membership_name': item.membership_plan.name if item.membership_plan else None,
-                        'price_applied': float(item.price_applied)
-                    } for item in purchased_items
-                ],
-                'has_new_membership': has_new_membership,
-                'has_new_courses': has_new_courses,
-                'total_amount': float(payment.amount)
-            }
-            
-            return redirect("pagos:purchase_success")
+            return _process_successful_payment(request, payment)
         else:
-            payment.status = "failed"
-            payment.save()
+            fail_pending_payment(payment)
             messages.error(request, "El pago no pudo ser procesado.")
             return redirect("carrito:cart_detail")
     except Exception as e:
         logger.error(f"Error al confirmar el pago: {e}", exc_info=True)
-        payment.status = "failed"
-        payment.save()
+        fail_pending_payment(payment)
         messages.error(request, f"Error al confirmar el pago: {e}")
         return redirect("carrito:cart_detail")
 
@@ -225,87 +198,22 @@ def webpay_return(request):
         return redirect("carrito:cart_detail")
 
     payment = get_object_or_404(Payment, id=payment_id, user=request.user)
+    if payment.fulfilled_at:
+        # Recarga de la URL de retorno: el token ya se confirmó
+        return _process_successful_payment(request, payment)
 
     try:
         result = confirmar_transaccion(token)
 
         if result.get("status") == "AUTHORIZED":
-            payment.status = "completed"
-            payment.save()
-
-            # Procesar los ítems del carrito
-            cart = Cart.objects.filter(user=request.user, is_active=True).first()
-            purchased_items = []
-            has_new_membership = False
-            has_new_courses = False
-            
-            if cart:
-                # Guardar items para mostrar en confirmación
-                purchased_items = list(cart.items.all())
-                
-                for item in cart.items.all():
-                    if item.item_type == "course" and item.course:
-                        from cursos.models import UserCourse
-                        UserCourse.objects.get_or_create(
-                            user=request.user, 
-                            course=item.course,
-                            defaults={'progress': 0.0, 'completed': False}
-                        )
-                        has_new_courses = True
-                    elif item.item_type == "membership" and item.membership_plan:
-                        from membresias.models import Membership
-                        # Verificar si ya existe una membresía activa
-                        existing_membership = Membership.objects.filter(
-                            user=request.user, 
-                            status='active'
-                        ).first()
-                        
-                        if existing_membership:
-                            # Actualizar membresía existente
-                            existing_membership.plan = item.membership_plan
-                            existing_membership.courses_remaining = item.membership_plan.courses_per_month
-                            existing_membership.consultations_remaining = item.membership_plan.consultations
-                            existing_membership.save()
-                        else:
-                            # Crear nueva membresía
-                            Membership.objects.create(
-                                user=request.user,
-                                plan=item.membership_plan,
-                                status="active",
-                                courses_remaining=item.membership_plan.courses_per_month,
-                                consultations_remaining=item.membership_plan.consultations
-                            )
-                        has_new_membership = True
-                
-                cart.is_active = False
-                cart.save()
-
-            # Guardar información en sesión para la página de confirmación
-            request.session['purchase_success_data'] = {
-                'payment_id': payment.id,
-                'purchased_items': [
-                    {
-                        'item_type': item.item_type,
-                        'course_title': item.course.title if item.course else None,
-                        'membership_name': item.membership_plan.name if item.membership_plan else None,
-                        'price_applied': float(item.price_applied)
-                    } for item in purchased_items
-                ],
-                'has_new_membership': has_new_membership,
-                'has_new_courses': has_new_courses,
-                'total_amount': float(payment.amount)
-            }
-            
-            return redirect("pagos:purchase_success")
+            return _process_successful_payment(request, payment)
         else:
-            payment.status = "failed"
-            payment.save()
+            fail_pending_payment(payment)
             messages.error(request, "El pago fue rechazado.")
 
     except Exception as e:
         logger.error(f"Error al confirmar el pago: {e}", exc_info=True)
-        payment.status = "failed"
-        payment.save()
+        fail_pending_payment(payment)
         messages.error(request, f"Error al confirmar el pago: {str(e)}")
 
     return redirect("carrito:cart_detail")
@@ -362,81 +270,16 @@ def purchase_success(request):
 def process_free_payment(request, payment):
     """Procesa un pago gratuito (monto = 0) sin pasar por Webpay."""
     try:
-        # Marcar el pago como completado
-        payment.status = "completed"
-        payment.save()
-        
-        # Procesar los items del carrito igual que en confirm_cart_payment
-        cart = Cart.objects.filter(user=request.user, is_active=True).first()
-        purchased_items = []
-        has_new_membership = False
-        has_new_courses = False
-        
-        if cart:
-            # Guardar items para mostrar en confirmación
-            purchased_items = list(cart.items.all())
-            
-            for item in cart.items.all():
-                if item.item_type == "course" and item.course:
-                    from cursos.models import UserCourse
-                    UserCourse.objects.get_or_create(
-                        user=request.user, 
-                        course=item.course,
-                        defaults={'progress': 0.0, 'completed': False}
-                    )
-                    has_new_courses = True
-                elif item.item_type == "membership" and item.membership_plan:
-                    from membresias.models import Membership
-                    # Verificar si ya existe una membresía activa
-                    existing_membership = Membership.objects.filter(
-                        user=request.user, 
-                        status='active'
-                    ).first()
-                    
-                    if existing_membership:
-                        # Actualizar membresía existente
-                        existing_membership.plan = item.membership_plan
-                        existing_membership.courses_remaining = item.membership_plan.courses_per_month
-                        existing_membership.consultations_remaining = item.membership_plan.consultations
-                        existing_membership.save()
-                    else:
-                        # Crear nueva membresía
-                        Membership.objects.create(
-                            user=request.user,
-                            plan=item.membership_plan,
-                            status="active",
-                            courses_remaining=item.membership_plan.courses_per_month,
-                            consultations_remaining=item.membership_plan.consultations
-                        )
-                    has_new_membership = True
-            
-            cart.is_active = False
-            cart.save()
-
-        # Guardar información en sesión para la página de confirmación
-        request.session['purchase_success_data'] = {
-            'payment_id': payment.id,
-            'purchased_items': [
-                {
-                    'item_type': item.item_type,
-                    'course_title': item.course.title if item.course else None,
-                    'membership_name': item.membership_plan.name if item.membership_plan else None,
-                    'price_applied': float(item.price_applied)
-                } for item in purchased_items
-            ],
-            'has_new_membership': has_new_membership,
-            'has_new_courses': has_new_courses,
-            'total_amount': float(payment.amount)
-        }
-        
+        fulfillment = fulfill_order(payment)
+        request.session['purchase_success_data'] = fulfillment.session_data()
+
         logger.info(f"Pago gratuito procesado exitosamente para pago {payment.id}")
         messages.success(request, "¡Curso gratuito agregado exitosamente!")
         return redirect("pagos:purchase_success")
         
     except Exception as e:
         logger.error(f"Error al procesar pago gratuito: {e}", exc_info=True)
-        payment.status = "failed"
-        payment.save()
+        fail_pending_payment(payment)
         messages.error(request, f"Error al procesar el curso gratuito: {e}")
         return redirect("carrito:cart_detail")
 
@@ -486,59 +329,61 @@ def webpay_return_enhanced(request):
     except Exception as e:
         logger.error(f"Error inesperado en webpay_return_enhanced: {e}", exc_info=True)
         if payment:
-            payment.status = "error"
-            payment.error_message = str(e)
-            payment.save()
+            fail_pending_payment(payment, status="error", error_message=str(e))
         messages.error(request, "Error inesperado en el proceso de pago.")
         return redirect("carrito:cart_detail")
 
 
 def _handle_normal_flow(request, payment, token):
     """Maneja el flujo normal donde el usuario completó o fue rechazado el pago."""
+    if payment.fulfilled_at:
+        # Recarga de la URL de retorno: el token ya se confirmó
+        return _process_successful_payment(request, payment)
     try:
         resp = confirmar_transaccion(token)
         logger.info(f"Respuesta de confirmación: {resp}")
         
         # Actualizar campos de respuesta de Transbank
-        payment.transbank_status = resp.get("status")
-        payment.response_code = resp.get("response_code")
-        payment.authorization_code = resp.get("authorization_code")
+        record_transbank_response(payment, resp)
         
         if resp.get("status") == "AUTHORIZED" and resp.get("response_code") == 0:
-            payment.status = "completed"
-            payment.save()
+            # fulfill_order marca el pago como completado al entregarlo
             logger.info(f"Pago {payment.id} autorizado exitosamente")
             return _process_successful_payment(request, payment)
         
         elif resp.get("status") == "REJECTED":
-            payment.status = "rejected"
-            payment.transbank_status = "REJECTED"
-            payment.error_message = "Transacción rechazada por el banco emisor"
-            payment.save()
+            fail_pending_payment(
+                payment,
+                status="rejected",
+                error_message="Transacción rechazada por el banco emisor",
+            )
             logger.info(f"Pago {payment.id} rechazado por el banco")
             return _handle_rejected_payment(request, payment)
         
         elif resp.get("status") == "FAILED":
-            payment.status = "failed"
-            payment.transbank_status = "FAILED"
-            payment.error_message = "Transacción fallida durante el procesamiento"
-            payment.save()
+            fail_pending_payment(
+                payment,
+                status="failed",
+                error_message="Transacción fallida durante el procesamiento",
+            )
             logger.info(f"Pago {payment.id} falló durante el procesamiento")
             return _handle_failed_payment(request, payment)
         
         else:
             # Estado desconocido
-            payment.status = "error"  
-            payment.error_message = f"Estado desconocido: {resp.get('status')}"
-            payment.save()
+            fail_pending_payment(
+                payment,
+                status="error",
+                error_message=f"Estado desconocido: {resp.get('status')}",
+            )
             logger.warning(f"Estado desconocido para pago {payment.id}: {resp.get('status')}")
             return _handle_unknown_status(request, payment, resp)
             
     except Exception as e:
         logger.error(f"Error al confirmar transacción {token}: {e}", exc_info=True)
-        payment.status = "error"
-        payment.error_message = f"Error al confirmar transacción: {str(e)}"
-        payment.save()
+        fail_pending_payment(
+            payment, status="error", error_message=f"Error al confirmar transacción: {str(e)}"
+        )
         return _handle_transaction_error(request, payment, str(e))
 
 
@@ -548,10 +393,12 @@ def _handle_aborted_payment(request, payment, tbk_token):
         # Consultar estado sin confirmar (usando el método status)
         resp = confirmar_transaccion(tbk_token)  # También podríamos usar status() del SDK
         
-        payment.status = "cancelled"
-        payment.transbank_status = "ABORTED"
-        payment.error_message = "Pago cancelado por el usuario"
-        payment.save()
+        fail_pending_payment(
+            payment,
+            status="cancelled",
+            transbank_status="ABORTED",
+            error_message="Pago cancelado por el usuario",
+        )
         
         logger.info(f"Pago {payment.id} cancelado por el usuario")
         
@@ -560,19 +407,21 @@ def _handle_aborted_payment(request, payment, tbk_token):
         
     except Exception as e:
         logger.error(f"Error al consultar transacción abortada {tbk_token}: {e}", exc_info=True)
-        payment.status = "cancelled"
-        payment.error_message = "Pago cancelado por el usuario"
-        payment.save()
+        fail_pending_payment(
+            payment, status="cancelled", error_message="Pago cancelado por el usuario"
+        )
         messages.warning(request, "Has cancelado el pago. Puedes intentar nuevamente cuando desees.")
         return redirect("carrito:cart_detail")
 
 
 def _handle_timeout(request, payment):
     """Maneja el caso donde se agotó el tiempo en el formulario de Webpay."""
-    payment.status = "timeout"
-    payment.transbank_status = "TIMEOUT"
-    payment.error_message = "Tiempo agotado en el formulario de pago"
-    payment.save()
+    fail_pending_payment(
+        payment,
+        status="timeout",
+        transbank_status="TIMEOUT",
+        error_message="Tiempo agotado en el formulario de pago",
+    )
     
     logger.info(f"Timeout para pago {payment.id}")
     
@@ -581,70 +430,14 @@ def _handle_timeout(request, payment):
 
 
 def _process_successful_payment(request, payment):
-    """Procesa un pago exitoso - lógica existente."""
-    # ... aquí va toda la lógica actual de confirm_cart_payment para pagos exitosos
-    cart = Cart.objects.filter(user=request.user, is_active=True).first()
-    purchased_items = []
-    has_new_membership = False
-    has_new_courses = False
-    
-    if cart:
-        # Guardar items para mostrar en confirmación
-        purchased_items = list(cart.items.all())
-        
-        for item in cart.items.all():
-            if item.item_type == "course" and item.course:
-                from cursos.models import UserCourse
-                UserCourse.objects.get_or_create(
-                    user=request.user, 
-                    course=item.course,
-                    defaults={'progress': 0.0, 'completed': False}
-                )
-                has_new_courses = True
-            elif item.item_type == "membership" and item.membership_plan:
-                from membresias.models import Membership
-                # Verificar si ya existe una membresía activa
-                existing_membership = Membership.objects.filter(
-                    user=request.user, 
-                    status='active'
-                ).first()
-                
-                if existing_membership:
-                    # Actualizar membresía existente
-                    existing_membership.plan = item.membership_plan
-                    existing_membership.courses_remaining = item.membership_plan.courses_per_month
-                    existing_membership.consultations_remaining = item.membership_plan.consultations
-                    existing_membership.save()
-                else:
-                    # Crear nueva membresía
-                    Membership.objects.create(
-                        user=request.user,
-                        plan=item.membership_plan,
-                        status="active",
-                        courses_remaining=item.membership_plan.courses_per_month,
-                        consultations_remaining=item.membership_plan.consultations
-                    )
-                has_new_membership = True
-        
-        cart.is_active = False
-        cart.save()
-
-    # Guardar información en sesión para la página de confirmación
-    request.session['purchase_success_data'] = {
-        'payment_id': payment.id,
-        'purchased_items': [
-            {
-                'item_type': item.item_type,
-                'course_title': item.course.title if item.course else None,
-                'membership_name': item.membership_plan.name if item.membership_plan else None,
-                'price_applied': float(item.price_applied)
-            } for item in purchased_items
-        ],
-        'has_new_membership': has_new_membership,
-        'has_new_courses': has_new_courses,
-        'total_amount': float(payment.amount)
-    }
-    
+    """Entrega la compra (pagos.fulfillment) y muestra la confirmación."""
+    try:
+        fulfillment = fulfill_order(payment)
+    except FulfillmentError:
+        messages.error(request, CART_CHANGED_MESSAGE)
+        return redirect("carrito:cart_detail")
+    request.session['purchase_success_data'] = fulfillment.session_data()
+
     return redirect("pagos:purchase_success")
 
 
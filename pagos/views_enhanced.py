@@ -7,8 +7,15 @@ from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 from django.http import JsonResponse
+from django.utils import timezone
 from .models import Payment
-from carrito.models import Cart, CartItem
+from .fulfillment import (
+    CART_CHANGED_MESSAGE,
+    FulfillmentError,
+    fail_pending_payment,
+    fulfill_order,
+    record_transbank_response,
+)
 from .webpay_config import confirmar_transaccion
 import logging
 
@@ -60,69 +67,73 @@ def webpay_return_enhanced(request):
     except Exception as e:
         logger.error(f"Error inesperado en webpay_return_enhanced: {e}", exc_info=True)
         if payment:
-            payment.status = "error"
-            payment.error_message = str(e)
-            payment.save()
+            fail_pending_payment(payment, status="error", error_message=str(e))
         messages.error(request, "Error inesperado en el proceso de pago.")
         return redirect("carrito:cart_detail")
 
 
 def _handle_normal_flow(request, payment, token):
     """Maneja el flujo normal donde el usuario completó o fue rechazado el pago."""
+    if payment.fulfilled_at:
+        # Recarga de la URL de retorno: el token ya se confirmó
+        return _process_successful_payment(request, payment)
     try:
         resp = confirmar_transaccion(token)
         logger.info(f"Respuesta de confirmación: {resp}")
         
         # Actualizar campos de respuesta de Transbank
-        payment.transbank_status = resp.get("status")
-        payment.response_code = str(resp.get("response_code", ""))
-        payment.authorization_code = resp.get("authorization_code", "")
+        record_transbank_response(payment, resp)
         
         if resp.get("status") == "AUTHORIZED" and resp.get("response_code") == 0:
-            payment.status = "completed"
-            payment.save()
+            # fulfill_order marca el pago como completado al entregarlo
             logger.info(f"Pago {payment.id} autorizado exitosamente")
             return _process_successful_payment(request, payment)
         
         elif resp.get("status") == "REJECTED":
-            payment.status = "rejected"
-            payment.transbank_status = "REJECTED"
-            payment.error_message = "Transacción rechazada por el banco emisor"
-            payment.save()
+            fail_pending_payment(
+                payment,
+                status="rejected",
+                error_message="Transacción rechazada por el banco emisor",
+            )
             logger.info(f"Pago {payment.id} rechazado por el banco")
             return _handle_rejected_payment(request, payment)
         
         elif resp.get("status") == "FAILED":
-            payment.status = "failed"
-            payment.transbank_status = "FAILED"
-            payment.error_message = "Transacción fallida durante el procesamiento"
-            payment.save()
+            fail_pending_payment(
+                payment,
+                status="failed",
+                error_message="Transacción fallida durante el procesamiento",
+            )
             logger.info(f"Pago {payment.id} falló durante el procesamiento")
             return _handle_failed_payment(request, payment)
         
         else:
             # Estado desconocido
-            payment.status = "error"
-            payment.error_message = f"Estado desconocido: {resp.get('status')}"
-            payment.save()
+            fail_pending_payment(
+                payment,
+                status="error",
+                error_message=f"Estado desconocido: {resp.get('status')}",
+            )
             logger.warning(f"Estado desconocido para pago {payment.id}: {resp.get('status')}")
             return _handle_unknown_status(request, payment, resp)
             
     except Exception as e:
         logger.error(f"Error al confirmar transacción {token}: {e}", exc_info=True)
-        payment.status = "error"
-        payment.error_message = f"Error al confirmar transacción: {str(e)}"
-        payment.save()
+        fail_pending_payment(
+            payment, status="error", error_message=f"Error al confirmar transacción: {str(e)}"
+        )
         return _handle_transaction_error(request, payment, str(e))
 
 
 def _handle_aborted_payment(request, payment, tbk_token):
     """Maneja el caso donde el usuario abortó el pago en el formulario de Webpay."""
     try:
-        payment.status = "cancelled"
-        payment.transbank_status = "ABORTED"
-        payment.error_message = "Pago cancelado por el usuario"
-        payment.save()
+        fail_pending_payment(
+            payment,
+            status="cancelled",
+            transbank_status="ABORTED",
+            error_message="Pago cancelado por el usuario",
+        )
         
         logger.info(f"Pago {payment.id} cancelado por el usuario")
         
@@ -134,19 +145,21 @@ def _handle_aborted_payment(request, payment, tbk_token):
         
     except Exception as e:
         logger.error(f"Error al procesar transacción abortada {tbk_token}: {e}", exc_info=True)
-        payment.status = "cancelled"
-        payment.error_message = "Pago cancelado por el usuario"
-        payment.save()
+        fail_pending_payment(
+            payment, status="cancelled", error_message="Pago cancelado por el usuario"
+        )
         messages.warning(request, "Has cancelado el pago. Puedes intentar nuevamente cuando desees.")
         return redirect("carrito:cart_detail")
 
 
 def _handle_timeout(request, payment):
     """Maneja el caso donde se agotó el tiempo en el formulario de Webpay."""
-    payment.status = "timeout"
-    payment.transbank_status = "TIMEOUT"
-    payment.error_message = "Tiempo agotado en el formulario de pago"
-    payment.save()
+    fail_pending_payment(
+        payment,
+        status="timeout",
+        transbank_status="TIMEOUT",
+        error_message="Tiempo agotado en el formulario de pago",
+    )
     
     logger.info(f"Timeout para pago {payment.id}")
     
@@ -158,69 +171,14 @@ def _handle_timeout(request, payment):
 
 
 def _process_successful_payment(request, payment):
-    """Procesa un pago exitoso - reutiliza lógica existente."""
-    cart = Cart.objects.filter(user=request.user, is_active=True).first()
-    purchased_items = []
-    has_new_membership = False
-    has_new_courses = False
-    
-    if cart:
-        # Guardar items para mostrar en confirmación
-        purchased_items = list(cart.items.all())
-        
-        for item in cart.items.all():
-            if item.item_type == "course" and item.course:
-                from cursos.models import UserCourse
-                UserCourse.objects.get_or_create(
-                    user=request.user, 
-                    course=item.course,
-                    defaults={'progress': 0.0, 'completed': False}
-                )
-                has_new_courses = True
-            elif item.item_type == "membership" and item.membership_plan:
-                from membresias.models import Membership
-                # Verificar si ya existe una membresía activa
-                existing_membership = Membership.objects.filter(
-                    user=request.user, 
-                    status='active'
-                ).first()
-                
-                if existing_membership:
-                    # Actualizar membresía existente
-                    existing_membership.plan = item.membership_plan
-                    existing_membership.courses_remaining = item.membership_plan.courses_per_month
-                    existing_membership.consultations_remaining = item.membership_plan.consultations
-                    existing_membership.save()
-                else:
-                    # Crear nueva membresía
-                    Membership.objects.create(
-                        user=request.user,
-                        plan=item.membership_plan,
-                        status="active",
-                        courses_remaining=item.membership_plan.courses_per_month,
-                        consultations_remaining=item.membership_plan.consultations
-                    )
-                has_new_membership = True
-        
-        cart.is_active = False
-        cart.save()
+    """Entrega la compra (pagos.fulfillment) y muestra la confirmación."""
+    try:
+        fulfillment = fulfill_order(payment)
+    except FulfillmentError:
+        messages.error(request, CART_CHANGED_MESSAGE)
+        return redirect("carrito:cart_detail")
+    request.session['purchase_success_data'] = fulfillment.session_data()
 
-    # Guardar información en sesión para la página de confirmación
-    request.session['purchase_success_data'] = {
-        'payment_id': payment.id,
-        'purchased_items': [
-            {
-                'item_type': item.item_type,
-                'course_title': item.course.title if item.course else None,
-                'membership_name': item.membership_plan.name if item.membership_plan else None,
-                'price_applied': float(item.price_applied)
-            } for item in purchased_items
-        ],
-        'has_new_membership': has_new_membership,
-        'has_new_courses': has_new_courses,
-        'total_amount': float(payment.amount)
-    }
-    
     return redirect("pagos:purchase_success")
 
 
@@ -285,43 +243,52 @@ def payment_status(request, payment_id):
     })
 
 
+def _complete_authorized_payment(payment):
+    """
+    Completa un pago que Transbank reporta autorizado: los pagos del carrito
+    se entregan con ``fulfill_order`` (no hace nada si ya se entregó); los
+    demás pasan a ``"completed"`` solo si siguen pendientes. Lanza
+    ``FulfillmentError`` si el carrito no es el que se pagó.
+    """
+    if payment.payment_type == "cart":
+        fulfill_order(payment)
+    elif Payment.objects.filter(pk=payment.pk, status="pending").update(
+        status="completed", updated_at=timezone.now()
+    ):
+        payment.status = "completed"
+
+
 @login_required
 def check_payment_status(request, payment_id):
     """API endpoint para verificar el estado actual de un pago via AJAX."""
     payment = get_object_or_404(Payment, id=payment_id, user=request.user)
+    error = None
     
     # Si el pago está pendiente y tiene token, verificar estado en Transbank
     if payment.status == "pending" and payment.transaction_id:
         try:
             from .webpay_config import confirmar_transaccion
             resp = confirmar_transaccion(payment.transaction_id)
+            record_transbank_response(payment, resp)
             
             # Actualizar estado según respuesta
             if resp.get("status") == "AUTHORIZED" and resp.get("response_code") == 0:
-                payment.status = "completed"
-                payment.transbank_status = "AUTHORIZED"
-                payment.response_code = str(resp.get("response_code", ""))
-                payment.authorization_code = resp.get("authorization_code", "")
-                payment.save()
-                
-                # Procesar pago exitoso si aún no se ha procesado
-                if payment.payment_type == "cart":
-                    _process_successful_payment(request, payment)
-                    
+                _complete_authorized_payment(payment)
             elif resp.get("status") == "REJECTED":
-                payment.status = "rejected"
-                payment.transbank_status = "REJECTED"
-                payment.response_code = str(resp.get("response_code", ""))
-                payment.save()
+                fail_pending_payment(payment, status="rejected")
                 
+        except FulfillmentError:
+            error = CART_CHANGED_MESSAGE
         except Exception as e:
             logger.error(f"Error al verificar estado del pago {payment_id}: {e}")
+        payment.refresh_from_db()
     
     return JsonResponse({
         'status': payment.status,
         'transbank_status': payment.transbank_status,
         'display_status': payment.get_status_display(),
-        'updated_at': payment.updated_at.isoformat() if payment.updated_at else None
+        'updated_at': payment.updated_at.isoformat() if payment.updated_at else None,
+        'error': error,
     })
 
 
@@ -341,23 +308,23 @@ def payment_status_check(request, payment_id):
             resp = tx.status(payment.transaction_id)
             
             # Actualizar el estado basado en la respuesta
-            payment.transbank_status = resp.get("status")
-            payment.response_code = str(resp.get("response_code", ""))
-            payment.authorization_code = resp.get("authorization_code", "")
+            record_transbank_response(payment, resp)
             
             if resp.get("status") == "AUTHORIZED" and resp.get("response_code") == 0:
-                payment.status = "completed"
+                _complete_authorized_payment(payment)
             elif resp.get("status") == "REJECTED":
-                payment.status = "rejected"
+                fail_pending_payment(payment, status="rejected")
             elif resp.get("status") == "FAILED":
-                payment.status = "failed"
+                fail_pending_payment(payment, status="failed")
                 
-            payment.save()
             logger.info(f"Estado de pago {payment.id} actualizado a {payment.status}")
             
+        except FulfillmentError:
+            messages.error(request, CART_CHANGED_MESSAGE)
         except Exception as e:
             logger.error(f"Error al consultar estado de pago {payment.id}: {e}")
             messages.warning(request, "No se pudo consultar el estado actualizado del pago.")
+        payment.refresh_from_db()
     
     return render(request, "pagos/payment_status.html", {
         'payment': payment
@@ -0,0 +1,217 @@
+# plataforma_cursos/image_derivatives.py
+"""
+Derivados responsivos de imágenes (blog y boletines).
+
+Al subir una imagen destacada se generan versiones WebP y JPEG en varios
+anchos con Pillow. El trabajo corre en un pool de procesos para no bloquear
+la petición; cada derivado se guarda en disco con el hash SHA-256 del
+original en el nombre (``derivatives/ab/<hash>-640.webp``), así que volver a
+subir la misma imagen o reprocesarla reutiliza los archivos existentes.
+
+El resultado (manifiesto) se guarda en un ``JSONField`` del modelo y lo usan
+los tags de ``blogs.templatetags.responsive_images`` para emitir ``srcset``.
+Mientras el manifiesto no existe, las plantillas muestran el original.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "derivatives"
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# --------------------------
+# Generación (se ejecuta en los procesos del pool, sin ORM)
+# --------------------------
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _save_atomic(image, path, fmt, **options):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    image.save(tmp_path, fmt, **options)
+    os.replace(tmp_path, path)
+
+
+def _flatten(image):
+    """JPEG no admite transparencia: se compone sobre fondo blanco."""
+    from PIL import Image
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def render_derivatives(source_path, source_name, media_root, widths, quality):
+    """
+    Genera los derivados de ``source_path`` y retorna el manifiesto:
+    ``{"source", "hash", "width", "height", "webp": [[ancho, nombre]...], "jpeg": [...]}``.
+    Los nombres son relativos a ``media_root``. Los GIF animados no se
+    procesan (el manifiesto queda sin variantes y se sirve el original).
+    """
+    from PIL import Image, ImageOps
+
+    digest = _file_digest(source_path)
+    manifest = {"source": source_name, "hash": digest, "webp": [], "jpeg": []}
+
+    with Image.open(source_path) as original:
+        if getattr(original, "is_animated", False):
+            manifest.update(width=original.width, height=original.height)
+            return manifest
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    manifest.update(width=image.width, height=image.height)
+    # Nunca se agranda: los anchos mayores al original se reemplazan por él
+    targets = sorted({min(width, image.width) for width in widths})
+
+    directory = f"{DERIVATIVES_DIR}/{digest[:2]}"
+    os.makedirs(os.path.join(media_root, directory), exist_ok=True)
+    for width in targets:
+        resized = None
+        for key, (fmt, _mime) in FORMATS.items():
+            name = f"{directory}/{digest}-{width}.{'jpg' if key == 'jpeg' else key}"
+            path = os.path.join(media_root, name)
+            if not os.path.exists(path):
+                if resized is None:
+                    height = max(1, round(image.height * width / image.width))
+                    resized = (
+                        image if width == image.width
+                        else image.resize((width, height), Image.LANCZOS)
+                    )
+                if key == "jpeg":
+                    _save_atomic(
+                        _flatten(resized), path, fmt,
+                        quality=quality, optimize=True, progressive=True,
+                    )
+                else:
+                    _save_atomic(resized, path, fmt, quality=quality, method=4)
+            manifest[key].append([width, name])
+    return manifest
+
+
+# --------------------------
+# Programación desde el proceso web
+# --------------------------
+
+
+def get_executor():
+    """Pool de procesos compartido, creado al primer uso."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # "spawn": hacer fork de un servidor con hilos no es seguro
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVES_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def job_args(field_file):
+    return (
+        field_file.path,
+        field_file.name,
+        str(settings.MEDIA_ROOT),
+        tuple(settings.IMAGE_DERIVATIVE_WIDTHS),
+        settings.IMAGE_DERIVATIVE_QUALITY,
+    )
+
+
+def store_manifest(model, pk, field_name, manifest_field, manifest):
+    """
+    Guarda el manifiesto con ``update()`` (sin disparar señales). Si la
+    imagen cambió mientras se procesaba, el resultado viejo se descarta.
+    """
+    return model._default_manager.filter(
+        pk=pk, **{field_name: manifest["source"]}
+    ).update(**{manifest_field: manifest})
+
+
+def _on_done(model, pk, field_name, manifest_field, future):
+    # Corre en un hilo del pool: usa su propia conexión y la cierra al final
+    try:
+        store_manifest(model, pk, field_name, manifest_field, future.result())
+    except Exception:
+        logger.exception("Error al generar derivados de %s #%s", model.__name__, pk)
+    finally:
+        connection.close()
+
+
+def generate_for_instance(instance, field_name="imagen_destacada",
+                          manifest_field="imagen_derivadas", background=None):
+    """
+    Genera los derivados de la imagen de ``instance``. En segundo plano
+    (por defecto ``IMAGE_DERIVATIVES_ASYNC``) retorna el ``Future``; en
+    línea retorna el manifiesto ya guardado.
+    """
+    field_file = getattr(instance, field_name)
+    args = job_args(field_file)
+    if background is None:
+        background = settings.IMAGE_DERIVATIVES_ASYNC
+    if background:
+        future = get_executor().submit(render_derivatives, *args)
+        future.add_done_callback(
+            partial(_on_done, type(instance), instance.pk, field_name, manifest_field)
+        )
+        return future
+    manifest = render_derivatives(*args)
+    store_manifest(type(instance), instance.pk, field_name, manifest_field, manifest)
+    setattr(instance, manifest_field, manifest)
+    return manifest
+
+
+def schedule_derivatives(instance, field_name="imagen_destacada",
+                         manifest_field="imagen_derivadas"):
+    """
+    Handler de ``post_save``: si la imagen cambió respecto del manifiesto,
+    programa la generación al confirmar la transacción; si se quitó la
+    imagen, limpia el manifiesto.
+    """
+    field_file = getattr(instance, field_name)
+    manifest = getattr(instance, manifest_field) or {}
+    if not field_file:
+        if manifest:
+            type(instance)._default_manager.filter(pk=instance.pk).update(
+                **{manifest_field: {}}
+            )
+            setattr(instance, manifest_field, {})
+        return
+    if manifest.get("source") == field_file.name:
+        return
+
+    def run():
+        try:
+            generate_for_instance(instance, field_name, manifest_field)
+        except Exception:
+            # Sin derivados la plantilla usa el original; no romper el guardado
+            logger.exception(
+                "No se pudieron generar derivados de %s #%s",
+                type(instance).__name__, instance.pk,
+            )
+
+    transaction.on_commit(run)
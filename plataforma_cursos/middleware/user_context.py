@@ -0,0 +1,105 @@
+"""
+Contexto del usuario por request.
+
+``UserContextMiddleware`` adjunta a cada request un ``UserContext`` perezoso
+con la membresía activa (con su plan), los cursos que posee el usuario y el
+resumen de su carrito (``carrito.summary``; el de la sesión para anónimos). Cada dato se consulta como máximo una vez por
+request y solo si algo lo lee; vistas, plantillas (``user_context`` vía el
+context processor) y tags comparten la misma instancia.
+"""
+from django.utils.functional import cached_property
+
+from cursos.entitlements import CourseEntitlements
+
+
+class UserContext:
+    """Datos del usuario cacheados durante un request."""
+
+    def __init__(self, user, session=None):
+        self.user = user
+        self.session = session
+
+    @cached_property
+    def entitlements(self):
+        """Índice de accesos a cursos (ver ``cursos.entitlements``)."""
+        return CourseEntitlements(self.user)
+
+    @property
+    def active_membership(self):
+        return self.entitlements.active_membership
+
+    @property
+    def active_plan(self):
+        membership = self.active_membership
+        return membership.plan if membership else None
+
+    @property
+    def owned_course_ids(self):
+        return self.entitlements.owned_course_ids
+
+    @cached_property
+    def cart(self):
+        """Carrito activo del usuario (sin crearlo)."""
+        if not self.user.is_authenticated:
+            return None
+        from carrito.models import Cart
+
+        return Cart.objects.filter(user=self.user, is_active=True).first()
+
+    @cached_property
+    def session_cart(self):
+        """Carrito anónimo guardado en la sesión (``carrito.session_cart``)."""
+        from carrito.session_cart import SessionCart
+
+        return SessionCart(self.session if self.session is not None else {})
+
+    @cached_property
+    def cart_summary(self):
+        """Resumen del carrito: el activo (cacheado) o, sin sesión iniciada, el de la sesión."""
+        if not self.user.is_authenticated:
+            return self.session_cart.summary() if len(self.session_cart) else None
+        if self.cart is None:
+            return None
+        from carrito.summary import get_cart_summary
+
+        return get_cart_summary(self.cart, self.active_plan)
+
+    @property
+    def cart_item_count(self):
+        summary = self.cart_summary
+        return summary.item_count if summary else 0
+
+    def invalidate(self):
+        """Descarta lo cacheado (p. ej. tras comprar o modificar el carrito)."""
+        for name in ("entitlements", "cart", "session_cart", "cart_summary"):
+            self.__dict__.pop(name, None)
+
+
+def get_user_context(request):
+    """
+    ``UserContext`` del request; lo crea si el middleware no corrió
+    (p. ej. requests de ``RequestFactory`` en pruebas).
+    """
+    context = getattr(request, "user_context", None)
+    if context is None:
+        context = request.user_context = UserContext(
+            request.user, getattr(request, "session", None)
+        )
+    return context
+
+
+class UserContextMiddleware:
+    """Adjunta ``request.user_context``. Debe ir después de AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # request.user es perezoso: crear el contexto no consulta nada
+        request.user_context = UserContext(request.user, getattr(request, "session", None))
+        return self.get_response(request)
+
+
+def user_context(request):
+    """Context processor: expone ``user_context`` a todas las plantillas."""
+    return {"user_context": get_user_context(request)}
@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.sites",  # Requerido por Allauth
+    "django.contrib.postgres",  # Búsqueda full-text del catálogo
     "allauth",
     "allauth.account",
     "allauth.socialaccount",    "usuarios.apps.UsuariosConfig",
@@ -31,7 +32,7 @@ INSTALLED_APPS = [
     "blogs.apps.BlogsConfig",  # App para contacto y blogs
     "boletines.apps.BoletinesConfig",  # App para boletines informativos
     "widget_tweaks",
-    "carrito",
+    "carrito.apps.CarritoConfig",
 ]
 
 MIDDLEWARE = [
@@ -43,6 +44,8 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
+    # Membresía, cursos y carrito del usuario, cacheados por request
+    "plataforma_cursos.middleware.user_context.UserContextMiddleware",
     # Middleware de seguridad integral
     "plataforma_cursos.middleware.admin_security.AdminSecurityMiddleware",
     "plataforma_cursos.middleware.admin_security.AdminSessionSecurityMiddleware",
@@ -63,6 +66,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "plataforma_cursos.middleware.user_context.user_context",
             ],
         },
     },
@@ -118,6 +122,85 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Entrega de archivos protegidos de recursos de cursos (cursos.delivery)
+# Los archivos viven en PROTECTED_MEDIA_ROOT, fuera de MEDIA_ROOT, y no se
+# publican; la location "internal" de nginx debe apuntar (alias) a esta ruta.
+PROTECTED_MEDIA_ROOT = config("PROTECTED_MEDIA_ROOT", default=str(BASE_DIR / "protected_media"))
+# "" = Django transmite el archivo con soporte de Range
+# "nginx" = X-Accel-Redirect hacia PROTECTED_MEDIA_INTERNAL_URL (location "internal")
+# "apache" = X-Sendfile con la ruta absoluta del archivo (mod_xsendfile)
+PROTECTED_MEDIA_SERVER = config("PROTECTED_MEDIA_SERVER", default="")
+PROTECTED_MEDIA_INTERNAL_URL = config(
+    "PROTECTED_MEDIA_INTERNAL_URL", default="/protected-media/"
+)
+
+# Extraer metadatos de recursos (tamaño, SHA-256, páginas...) al guardarlos.
+# Con False se marcan como pendientes y los procesa el comando ingest_resources.
+RESOURCE_INGEST_ON_SAVE = config("RESOURCE_INGEST_ON_SAVE", default=True, cast=bool)
+
+# Caché compartida (catálogo de cursos, contadores, etc.)
+# En producción apuntar a un backend compartido entre procesos, por ejemplo:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="plataforma-cursos"),
+    }
+}
+
+# Tiempo de vida (segundos) de la instantánea cacheada del catálogo de cursos
+CATALOG_CACHE_TIMEOUT = config("CATALOG_CACHE_TIMEOUT", default=3600, cast=int)
+
+# Progreso de cursos (cursos.progress): cada cuántos segundos, o con cuántos
+# (usuario, curso) pendientes, se vuelcan los heartbeats a la base de datos
+PROGRESS_FLUSH_INTERVAL = config("PROGRESS_FLUSH_INTERVAL", default=10, cast=int)
+PROGRESS_BUFFER_MAX_SIZE = config("PROGRESS_BUFFER_MAX_SIZE", default=1000, cast=int)
+
+# Calificación bayesiana de cursos (cursos.ratings): un curso con pocas reseñas
+# se acerca a PRIOR_MEAN como si tuviera PRIOR_WEIGHT reseñas adicionales
+COURSE_RATING_PRIOR_MEAN = config("COURSE_RATING_PRIOR_MEAN", default=3.5, cast=float)
+COURSE_RATING_PRIOR_WEIGHT = config("COURSE_RATING_PRIOR_WEIGHT", default=5, cast=int)
+
+# Derivados responsivos de imágenes de blog y boletines
+# (plataforma_cursos.image_derivatives). Con ASYNC=False se generan en línea.
+IMAGE_DERIVATIVE_WIDTHS = config(
+    "IMAGE_DERIVATIVE_WIDTHS",
+    default="320,640,960,1280",
+    cast=lambda value: [int(width) for width in value.split(",") if width.strip()],
+)
+IMAGE_DERIVATIVE_QUALITY = config("IMAGE_DERIVATIVE_QUALITY", default=80, cast=int)
+IMAGE_DERIVATIVES_ASYNC = config("IMAGE_DERIVATIVES_ASYNC", default=True, cast=bool)
+IMAGE_DERIVATIVES_WORKERS = config("IMAGE_DERIVATIVES_WORKERS", default=2, cast=int)
+
+# Días de historial de membresías que se conservan en la tabla activa; el resto
+# lo mueve "manage.py archive_membership_history" (membresias.history_archive)
+MEMBERSHIP_HISTORY_HOT_DAYS = config("MEMBERSHIP_HISTORY_HOT_DAYS", default=180, cast=int)
+
+# Renovación automática de membresías (pagos.renewals): pasarela de cobro
+# recurrente, horas de anticipación al vencimiento e hilos de cobro simultáneos.
+# FakeGateway aprueba todo sin cobrar, por eso solo es el valor por defecto en DEBUG.
+RENEWAL_GATEWAY = config(
+    "RENEWAL_GATEWAY", default="pagos.renewals.FakeGateway" if DEBUG else ""
+)
+RENEWAL_LEAD_HOURS = config("RENEWAL_LEAD_HOURS", default=24, cast=int)
+RENEWAL_WORKERS = config("RENEWAL_WORKERS", default=4, cast=int)
+
+# Compactación de carritos (carrito.compaction): días tras los que un carrito
+# cerrado (comprado) o uno activo sin cambios (abandonado) se resume y se borra
+CART_ARCHIVE_AFTER_DAYS = config("CART_ARCHIVE_AFTER_DAYS", default=90, cast=int)
+CART_ABANDONED_AFTER_DAYS = config("CART_ABANDONED_AFTER_DAYS", default=60, cast=int)
+
+# Códigos de descuento (cursos.discounts): segundos que se recuerda un código
+# inexistente e intentos permitidos por usuario en cada ventana
+DISCOUNT_MISS_CACHE_TIMEOUT = config("DISCOUNT_MISS_CACHE_TIMEOUT", default=300, cast=int)
+DISCOUNT_MAX_ATTEMPTS = config("DISCOUNT_MAX_ATTEMPTS", default=20, cast=int)
+DISCOUNT_ATTEMPT_WINDOW = config("DISCOUNT_ATTEMPT_WINDOW", default=600, cast=int)
+# Minutos tras los que un pago del carrito pendiente se da por abandonado (pagos.expiry)
+PAYMENT_PENDING_TIMEOUT_MINUTES = config("PAYMENT_PENDING_TIMEOUT_MINUTES", default=30, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -24,6 +24,8 @@ urlpatterns = [
         "cursos/", include("cursos.urls", namespace="cursos")
     ),  # Prefijo para las URLs de cursos
     path("usuarios/", include("usuarios.urls", namespace="usuarios")),
+    # API JSON de solo lectura del catálogo
+    path("api/v1/", include("cursos.api_urls", namespace="api_v1")),
     # URL secreta para admin (cambiar por algo más seguro en producción)
     path("sistema-gestion-admin-2025/", admin.site.urls),
     path("pagos/", include("pagos.urls")),
@@ -0,0 +1,159 @@
+"""
+Pruebas de concurrencia y benchmark del reclamo de cursos de recompensa
+(membresias.rewards.claim_reward_course).
+
+Lanza reclamos simultáneos desde varios hilos, cada uno con su propia
+conexión, contra la base de datos de pruebas (PostgreSQL) y verifica que el
+cupo nunca quede negativo ni se entregue un curso dos veces.
+
+Ejecutar:
+    python manage.py test tests.test_reward_claim_concurrency
+    python -m tests.test_reward_claim_concurrency      (muestra el benchmark)
+"""
+import os
+import sys
+import threading
+import time
+from datetime import timedelta
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'plataforma_cursos.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from cursos.models import Category, Course, UserCourse
+from membresias.models import Membership, MembershipHistory, MembershipPlan
+from membresias.rewards import RewardClaimError, claim_reward_course
+
+User = get_user_model()
+
+
+def run_concurrently(jobs):
+    """
+    Ejecuta cada (usuario, course_id) en su propio hilo, todos liberados a la
+    vez por una barrera. Retorna (resultados, segundos).
+    """
+    barrier = threading.Barrier(len(jobs))
+    results = [None] * len(jobs)
+
+    def worker(index, user, course_id):
+        try:
+            barrier.wait()
+            results[index] = ('ok', claim_reward_course(user, course_id))
+        except RewardClaimError as e:
+            results[index] = ('error', e.message)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=worker, args=(index, user, course_id))
+        for index, (user, course_id) in enumerate(jobs)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+class RewardClaimConcurrencyTest(TransactionTestCase):
+    """Reclamos simultáneos sobre las mismas membresías."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            email='staff@test.com', password='Passw0rd!x', is_staff=True
+        )
+        self.plan = MembershipPlan.objects.create(
+            name='Intermedio', slug='intermedio', price=20000, courses_per_month=5,
+            discount_percentage=10, consultations=1, telegram_level='basic',
+            description='Plan de prueba',
+        )
+        category = Category.objects.create(name='Recompensas')
+        self.courses = []
+        for i in range(6):
+            course = Course.objects.create(
+                title=f'Recompensa {i}', description='Curso de recompensa',
+                category=category, base_price=10000, created_by=self.staff,
+                is_membership_reward=True,
+            )
+            course.reward_for_plans.add(self.plan)
+            self.courses.append(course)
+
+    def make_member(self, email):
+        user = User.objects.create_user(email=email, password='Passw0rd!x')
+        Membership.objects.create(
+            user=user, plan=self.plan, status='active',
+            end_date=timezone.now() + timedelta(days=30),
+        )
+        return user
+
+    def test_cupo_no_queda_negativo(self):
+        """Seis reclamos simultáneos de cursos distintos con cupo 2: solo 2 se aceptan."""
+        user = self.make_member('cupo@test.com')
+        results, _elapsed = run_concurrently([(user, course.id) for course in self.courses])
+
+        accepted = [result for result in results if result[0] == 'ok']
+        self.assertEqual(len(accepted), 2)
+        membership = Membership.objects.get(user=user)
+        self.assertEqual(membership.welcome_courses_remaining, 0)
+        self.assertEqual(membership.welcome_courses_claimed.count(), 2)
+        self.assertEqual(UserCourse.objects.filter(user=user).count(), 2)
+        self.assertEqual(
+            MembershipHistory.objects.filter(membership=membership, action='reward_claimed').count(), 2
+        )
+
+    def test_mismo_curso_una_sola_vez(self):
+        """Ocho reclamos simultáneos del mismo curso: se entrega una sola vez."""
+        user = self.make_member('doble@test.com')
+        results, _elapsed = run_concurrently([(user, self.courses[0].id)] * 8)
+
+        self.assertEqual(sum(result[0] == 'ok' for result in results), 1)
+        membership = Membership.objects.get(user=user)
+        self.assertEqual(membership.welcome_courses_remaining, 1)
+        self.assertEqual(UserCourse.objects.filter(user=user).count(), 1)
+
+    def test_sin_membresia_o_curso_no_elegible(self):
+        user = User.objects.create_user(email='sin@test.com', password='Passw0rd!x')
+        with self.assertRaises(RewardClaimError):
+            claim_reward_course(user, self.courses[0].id)
+
+        member = self.make_member('otro@test.com')
+        self.courses[1].reward_for_plans.clear()
+        with self.assertRaises(RewardClaimError):
+            claim_reward_course(member, self.courses[1].id)
+
+    def test_benchmark_reclamos_simultaneos(self):
+        """Muchos usuarios reclamando a la vez (tras un correo masivo)."""
+        users = [self.make_member(f'bench{i}@test.com') for i in range(20)]
+        jobs = [(user, course.id) for user in users for course in self.courses[:3]]
+        results, elapsed = run_concurrently(jobs)
+
+        accepted = sum(result[0] == 'ok' for result in results)
+        self.assertEqual(accepted, len(users) * 2)
+        self.assertFalse(Membership.objects.filter(welcome_courses_remaining__lt=0).exists())
+        if self.verbosity > 1:
+            print(
+                f"\n⏱️ {len(jobs)} reclamos simultáneos en {elapsed:.3f}s "
+                f"({len(jobs) / elapsed:.0f} reclamos/s, {accepted} aceptados)"
+            )
+
+    @property
+    def verbosity(self):
+        return int(os.environ.get('BENCHMARK_VERBOSITY', '1'))
+
+
+if __name__ == '__main__':
+    from django.conf import settings
+    from django.test.utils import get_runner
+
+    os.environ['BENCHMARK_VERBOSITY'] = '2'
+    runner = get_runner(settings)(verbosity=2)
+    failures = runner.run_tests(['tests.test_reward_claim_concurrency'])
+    sys.exit(bool(failures))
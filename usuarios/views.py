@@ -14,6 +14,7 @@ import datetime
 from .forms import CustomUserCreationForm, NewsletterPreferencesForm, UserProfileForm
 from allauth.account.models import EmailAddress
 from allauth.account.views import SignupView
+from plataforma_cursos.middleware.user_context import get_user_context
 
 logger = logging.getLogger(__name__)
 
@@ -94,12 +95,9 @@ def dashboard(request):
     logger.info(f"Acceso al dashboard por usuario: {request.user.email}")
     courses = Course.objects.all() if request.user.is_staff else []
     
-    # Obtener membresía activa del usuario
-    from membresias.models import Membership
-    active_membership = Membership.objects.filter(
-        user=request.user, 
-        status='active'
-    ).first()
+    # Membresía activa y carrito desde el contexto del request (cacheado)
+    user_context = get_user_context(request)
+    active_membership = user_context.active_membership
     
     # Información sobre cursos de recompensa
     reward_courses_info = None
@@ -111,10 +109,8 @@ def dashboard(request):
             'total_available': active_membership.get_available_reward_courses().count(),
         }
       # Contar cursos del usuario
-    user_courses_count = request.user.user_courses.count()    # Contar items en el carrito
-    from carrito.models import Cart, CartItem
-    active_cart = Cart.objects.filter(user=request.user, is_active=True).first()
-    cart_items_count = CartItem.objects.filter(cart=active_cart).count() if active_cart else 0
+    user_courses_count = request.user.user_courses.count()
+    cart_items_count = user_context.cart_item_count
       # Obtener estadísticas de boletines (solo para staff)
     newsletter_stats = {}
     if request.user.is_staff:
@@ -126,6 +122,18 @@ def dashboard(request):
             'programados': Boletin.objects.filter(estado='programado').count(),
         }
     
+    # Cursos recomendados (precalculados por build_recommendations)
+    from cursos.models import UserRecommendation
+    recommended_courses = [
+        recommendation.course
+        for recommendation in UserRecommendation.objects.filter(
+            user=request.user,
+            course__is_available=True,
+        ).exclude(
+            course__user_courses__user=request.user
+        ).select_related('course').order_by('rank')[:4]
+    ]
+    
     # Obtener pagos recientes del usuario
     from pagos.models import Payment
     recent_payments = Payment.objects.filter(
@@ -141,24 +149,26 @@ def dashboard(request):
         'cart_items_count': cart_items_count,
         'newsletter_stats': newsletter_stats,
         'recent_payments': recent_payments,
+        'recommended_courses': recommended_courses,
     })
 
 @login_required
 def my_courses(request):
     """Vista para mostrar los cursos del usuario (comprados + accesibles por membresía)."""
     from cursos.models import Course
-    from membresias.models import Membership
-    from cursos.views import check_course_access
     
     # Filtro de tipo
     filter_type = request.GET.get('filter', 'all')
     
+    # Índice de accesos del usuario (compras, membresía y planes) cargado una vez
+    entitlements = get_user_context(request).entitlements
+    
     # Obtener cursos comprados directamente
-    purchased_courses = request.user.user_courses.all()
+    purchased_courses = list(request.user.user_courses.select_related('course'))
     
     # Obtener cursos accesibles por membresía activa
-    accessible_course_ids = []
-    active_membership = request.user.get_active_membership()
+    accessible_courses = []
+    active_membership = entitlements.active_membership
     
     if active_membership:
         # Verificar qué cursos puede acceder con su membresía
@@ -167,20 +177,19 @@ def my_courses(request):
             is_available=True
         )
         
-        for course in membership_courses:
-            can_access, _ = check_course_access(request.user, course)
-            if can_access:
-                accessible_course_ids.append(course.id)
+        accessible_courses = [
+            course for course in membership_courses
+            if entitlements.can_access(course)
+        ]
     
     # Crear lista unificada evitando duplicados
     user_courses_list = list(purchased_courses)
     
     # Agregar cursos de membresía que no estén ya comprados
-    already_purchased_course_ids = [uc.course.id for uc in purchased_courses]
+    already_purchased_course_ids = {uc.course_id for uc in purchased_courses}
     
-    for course_id in accessible_course_ids:
-        if course_id not in already_purchased_course_ids:
-            course = Course.objects.get(id=course_id)
+    for course in accessible_courses:
+        if course.id not in already_purchased_course_ids:
             # Crear un objeto pseudo-UserCourse para cursos de membresía
             pseudo_user_course = type('obj', (object,), {
                 'course': course,